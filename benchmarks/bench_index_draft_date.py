@@ -0,0 +1,141 @@
+"""
+首頁 draft_date 查詢回歸基準測試
+對比舊的逐單查詢（N+1）與 get_first_reached_dates（讀 order_milestones）的單次查詢
+
+用法：python benchmarks/bench_index_draft_date.py [訂單數 ...]
+默認 10000 50000 200000；使用臨時數據庫
+"""
+import sys
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# 添加项目路径
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from order_tracking.db import pool
+from order_tracking.models import init_db, get_db, get_first_reached_dates, backfill_order_milestones
+from order_tracking.status_definitions import STATUS_KEYS
+
+# 每個訂單的歷史軌跡（約一半訂單已發圖）
+HISTORY_PATHS = [
+    ['NEW_ORDER', 'QUOTE_CONFIRMING'],
+    ['NEW_ORDER', 'DRAFT_MAKING', 'DRAFT_CONFIRMING', 'PENDING_SAMPLE'],
+    ['NEW_ORDER', 'DRAFT_CONFIRMING', 'DRAFT_REVISING', 'DRAFT_CONFIRMING', 'PENDING_PRODUCTION'],
+    ['NEW_ORDER'],
+]
+
+# 舊寫法中 list.index 是 O(n²)，只在小數據量下跑
+LEGACY_LIST_INDEX_LIMIT = 10000
+
+
+def seed(count):
+    """寫入訂單和狀態歷史"""
+    conn = get_db()
+    start = date.today() - timedelta(days=400)
+    orders = []
+    history = []
+    for i in range(count):
+        order_number = f'BENCH{i:07d}'
+        path = HISTORY_PATHS[i % len(HISTORY_PATHS)]
+        order_date = start + timedelta(days=i % 365)
+        orders.append((order_number, f'客戶{i % 800}', order_date.isoformat(), path[-1], order_date.isoformat()))
+        prev = None
+        for step, status in enumerate(path):
+            history.append((i + 1, order_number, prev, status, (order_date + timedelta(days=step * 3)).isoformat()))
+            prev = status
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', orders)
+    conn.executemany('''
+        INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator)
+        VALUES (?, ?, ?, ?, ?, 'bench')
+    ''', history)
+    conn.commit()
+    backfill_order_milestones(conn)
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def load_orders(cursor):
+    cursor.execute("SELECT * FROM orders ORDER BY status_light DESC, status_days DESC, order_date DESC")
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def legacy(conn, orders_list, with_list_index):
+    """舊寫法：每個訂單一次查詢"""
+    cursor = conn.cursor()
+    for pos, order in enumerate(orders_list):
+        order_dict = dict(order)
+        cursor.execute('''
+            SELECT action_date FROM status_history
+            WHERE order_number = ? AND to_status = ?
+            ORDER BY action_date ASC LIMIT 1
+        ''', (order_dict['order_number'], STATUS_KEYS['DRAFT_CONFIRMING']))
+        draft_row = cursor.fetchone()
+        order_dict['draft_date'] = draft_row['action_date'] if draft_row else None
+        if with_list_index:
+            pos = orders_list.index(order)
+        orders_list[pos] = order_dict
+    return orders_list
+
+
+def aggregated(conn, orders_list):
+    """新寫法：一次讀取里程碑表"""
+    first_dates = get_first_reached_dates(conn, [STATUS_KEYS['DRAFT_CONFIRMING']])
+    for order in orders_list:
+        order['draft_date'] = first_dates.get(order['order_number'], {}).get(STATUS_KEYS['DRAFT_CONFIRMING'])
+    return orders_list
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 50000, 200000]
+
+    print("=" * 84)
+    print("首頁 draft_date 查詢耗時（秒；後三列不含載入訂單）")
+    print("=" * 84)
+    print(f"{'訂單數':>8} {'僅載入訂單':>10} {'舊寫法(含list.index)':>20} {'逐單查詢(N+1)':>16} {'里程碑表':>10} {'日期查詢加速':>12}")
+    print("-" * 84)
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            pool.reconfigure(database_path=os.path.join(tmp, 'bench.db'))
+            init_db()
+            seed(size)
+            conn = get_db()
+
+            load_orders(conn.cursor())  # 預熱頁面緩存
+            load_only, orders_list = timed(load_orders, conn.cursor())
+            if size <= LEGACY_LIST_INDEX_LIMIT:
+                full_legacy = f"{timed(legacy, conn, list(orders_list), True)[0]:.3f}"
+            else:
+                full_legacy = '跳過'
+            n_plus_one, old_rows = timed(legacy, conn, list(orders_list), False)
+            grouped, new_rows = timed(aggregated, conn, [dict(o) for o in orders_list])
+
+            # 結果必須一致
+            old_dates = {o['order_number']: o['draft_date'] for o in old_rows}
+            new_dates = {o['order_number']: o['draft_date'] for o in new_rows}
+            assert old_dates == new_dates, 'draft_date 結果不一致'
+
+            conn.close()
+            pool.clear()
+
+        speedup = n_plus_one / grouped
+        print(f"{size:>8} {load_only:>10.3f} {full_legacy:>20} {n_plus_one:>16.3f} {grouped:>10.3f} {speedup:>11.1f}x")
+
+    print("=" * 84)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+訂單列表 JSON 序列化基準測試
+對比 jsonify（先複製成 dict 列表，默認轉義中文）和 fast_json 的各編碼器（直接編碼 sqlite3.Row）：
+每行序列化微秒數、響應字節數，以及 gzip / br 壓縮後的字節數
+
+用法：python benchmarks/bench_json.py [行數 ...]
+默認 100 250 500（全局搜索最近訂單為 250 行）；使用臨時數據庫
+"""
+import sys
+import os
+import gzip
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目路径
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from flask import Flask
+
+from order_tracking.db import pool
+from order_tracking.models import init_db, get_db, ORDERS_LIVE_VIEW
+from order_tracking.fast_json import ENCODERS
+from order_tracking.compression import HAS_BROTLI, compress
+from order_tracking.config import GZIP_LEVEL
+
+CUSTOMERS = ['深圳華強貿易', '廣州恒通五金', '東莞美嘉禮品', '佛山精密實業', '寧波宏達貿易', '義烏新意禮品']
+PRODUCTS = ['不鏽鋼保溫杯', '硅膠手機殼', 'PVC 鑰匙扣', '帆布袋', 'Enamel Pin', '金屬徽章', '亞克力立牌']
+REPEAT = 21
+
+
+def seed(count):
+    rng = random.Random(42)
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, product_name, product_code, factory, notes,
+                            order_date, current_status, last_status_change_date, expected_delivery_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'PRODUCING', ?, ?)
+    ''', [(f'KC{i:05d}', rng.choice(CUSTOMERS), rng.choice(PRODUCTS), f'P-{rng.randint(100, 999)}',
+           rng.choice(['一廠', '二廠', '三廠']), rng.choice([None, '加急 客戶要求提前', '返單']),
+           f'2026-{1 + i % 12:02d}-{1 + i % 28:02d}', '2026-01-01', '2026-12-31') for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def median_us(fn):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(times)
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 250, 500]
+    app = Flask(__name__)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool.reconfigure(database_path=os.path.join(tmp, 'bench.db'))
+        init_db()
+        seed(max(sizes))
+        conn = get_db()
+
+        print("=" * 86)
+        print(f"訂單列表 JSON 序列化（SELECT * FROM {ORDERS_LIVE_VIEW}，{REPEAT} 次取中位數）")
+        print("=" * 86)
+        header = f"{'編碼方式':<22} {'微秒/行':>10} {'字節':>10} {'gzip':>10}"
+        if HAS_BROTLI:
+            header += f" {'br':>10}"
+        for size in sizes:
+            rows = conn.execute(f'SELECT * FROM {ORDERS_LIVE_VIEW} ORDER BY order_date DESC LIMIT ?',
+                                (size,)).fetchall()
+            payload = {'success': True, 'orders': rows, 'total': len(rows)}
+
+            candidates = [('jsonify（dict 複製）',
+                           lambda: app.json.dumps(dict(payload, orders=[dict(row) for row in rows])).encode('utf-8'))]
+            candidates += [(f'fast_json {name}', lambda dumps=dumps: dumps(payload)) for name, dumps in ENCODERS.items()]
+
+            print(f"\n{len(rows)} 行")
+            print(header)
+            print("-" * 86)
+            with app.app_context():
+                for label, encode in candidates:
+                    body = encode()
+                    line = (f"{label:<22} {median_us(encode) / len(rows):>10.2f} {len(body):>10} "
+                            f"{len(gzip.compress(body, compresslevel=GZIP_LEVEL)):>10}")
+                    if HAS_BROTLI:
+                        line += f" {len(compress(body, 'br')):>10}"
+                    print(line)
+        print("=" * 86)
+        conn.close()
+        pool.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+登入吞吐量基準測試（單線程，即每核每秒）
+- 各密碼哈希方法下，完整登入請求（查庫 + 驗證密碼 + 簽發 JWT）每秒次數
+- 撞庫時被限流拒絕的請求（不驗證密碼）每秒次數
+
+用法：python benchmarks/bench_login.py [每項秒數] [哈希方法 ...]
+默認 3 秒；方法默認 scrypt:32768:8:1 scrypt:16384:8:1 pbkdf2:sha256:600000 pbkdf2:sha256:260000
+使用臨時數據庫，不會動到 data/tracking.db
+"""
+import sys
+import os
+import importlib
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目路径
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from flask import Flask
+
+from order_tracking import tracking_bp
+from order_tracking.db import pool
+from order_tracking.models import init_db, get_db
+from order_tracking.login_guard import login_guard, hash_password
+
+guard_module = importlib.import_module('order_tracking.login_guard')
+
+METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+
+
+def rate(fn, seconds):
+    """seconds 秒內 fn 能執行多少次（次 / 秒）"""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    methods = sys.argv[2:] or METHODS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool.reconfigure(database_path=os.path.join(tmp, 'bench.db'))
+        init_db()
+        app = Flask(__name__)
+        app.secret_key = 'bench'
+        app.register_blueprint(tracking_bp)
+        client = app.test_client()
+
+        # 限流對吞吐量測試不生效
+        limits = (login_guard.users.limit, login_guard.ips.limit)
+        login_guard.users.limit = login_guard.ips.limit = 0
+
+        def login(password='bench123'):
+            return client.post('/tracking/login', json={'username': 'bench', 'password': password})
+
+        print("=" * 70)
+        print(f"登入吞吐量（單線程，每項 {seconds:g} 秒）")
+        print("=" * 70)
+        print(f"{'哈希方法':<28} {'單次登入(ms)':>14} {'登入/秒/核':>14}")
+        print("-" * 70)
+        for method in methods:
+            guard_module.PASSWORD_HASH_METHOD = method
+            conn = get_db()
+            conn.execute('DELETE FROM users WHERE username = ?', ('bench',))
+            conn.execute('''
+                INSERT INTO users (username, password_hash, display_name, role) VALUES ('bench', ?, 'bench', 'viewer')
+            ''', (hash_password('bench123'),))
+            conn.commit()
+            conn.close()
+            assert login().status_code == 200
+            per_second = rate(login, seconds)
+            print(f"{method:<28} {1000 / per_second:>14.1f} {per_second:>14.1f}")
+
+        # 撞庫：同一用戶名連續失敗，超過上限後在驗證密碼之前拒絕
+        login_guard.users.limit, login_guard.ips.limit = limits
+        login_guard.clear()
+        while login(password='wrong').status_code != 429:
+            pass
+        rejected = rate(lambda: login(password='wrong'), seconds)
+        print("-" * 70)
+        print(f"{'限流拒絕（不驗證密碼）':<24} {1000 / rejected:>14.3f} {rejected:>14.1f}")
+        print("=" * 70)
+        login_guard.clear()
+        pool.clear()
+
+
+if __name__ == '__main__':
+    main()
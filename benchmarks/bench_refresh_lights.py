@@ -0,0 +1,103 @@
+"""
+全表燈號重算基準測試
+對比逐單 update_status_light（每筆一次 SELECT + UPDATE + 提交）與 refresh_all_status_lights（一次讀取 + 一個事務批量寫回）
+
+用法：python benchmarks/bench_refresh_lights.py [訂單數 ...]
+默認 10000 50000；使用臨時數據庫
+"""
+import sys
+import os
+import io
+import contextlib
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# 添加项目路径
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from order_tracking.db import pool
+from order_tracking.models import init_db, get_db, update_status_light, refresh_all_status_lights
+from order_tracking.status_definitions import STATUS_KEYS
+
+
+def seed(count):
+    """寫入停留天數隨機的訂單（燈號都是舊值）"""
+    rng = random.Random(1)
+    today = date.today()
+    statuses = list(STATUS_KEYS.values())
+    rows = []
+    for i in range(count):
+        changed = (today - timedelta(days=rng.randint(0, 30))).isoformat()
+        rows.append((f'BENCH{i:07d}', f'客戶{i % 500}', changed, rng.choice(statuses), changed))
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date,
+                            status_light, status_days)
+        VALUES (?, ?, ?, ?, ?, 'green', 0)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def per_order():
+    conn = get_db()
+    ids = [row['id'] for row in conn.execute('SELECT id FROM orders')]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for order_id in ids:
+            update_status_light(order_id, conn)
+    conn.close()
+
+
+def bulk():
+    conn = get_db()
+    stats = refresh_all_status_lights(conn)
+    conn.close()
+    return stats
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 50000]
+
+    print("=" * 72)
+    print("全表燈號重算耗時（秒）")
+    print("=" * 72)
+    print(f"{'訂單數':>8} {'逐單更新':>10} {'批量重算':>10} {'加速':>8} {'變紅':>6} {'變黃':>6} {'變綠':>6}")
+    print("-" * 72)
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, 'base.db')
+            pool.reconfigure(database_path=base)
+            init_db()
+            seed(size)
+            pool.clear()
+
+            for name in ('row.db', 'bulk.db'):
+                shutil.copyfile(base, os.path.join(tmp, name))
+
+            pool.reconfigure(database_path=os.path.join(tmp, 'row.db'))
+            row_time, _ = timed(per_order)
+            pool.reconfigure(database_path=os.path.join(tmp, 'bulk.db'))
+            bulk_time, stats = timed(bulk)
+            pool.clear()
+
+        changed = stats['changed']
+        print(f"{size:>8} {row_time:>10.3f} {bulk_time:>10.3f} {row_time / bulk_time:>7.1f}x "
+              f"{changed['red']:>6} {changed['yellow']:>6} {changed['green']:>6}")
+
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
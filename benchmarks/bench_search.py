@@ -0,0 +1,166 @@
+"""
+訂單搜索基準測試
+對比 LIKE '%關鍵字%'（全表掃描）和 FTS5 trigram 索引（orders_fts，bm25 排序）的查詢延遲；
+客戶自動完成另外對比 SQL 查詢（search_customer_names，基準）和進程內索引（customer_index）
+
+用法：python benchmarks/bench_search.py [訂單數 ...]
+默認 100000 1000000；使用臨時數據庫
+"""
+import sys
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目路径
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from order_tracking.db import pool
+from order_tracking import models
+from order_tracking.models import (init_db, get_db, search_orders, fill_search_keys, use_fts_search,
+                                   fts_match_expression, ORDERS_FTS_TABLE)
+from order_tracking.customer_index import CustomerNameIndex
+
+CUSTOMERS = [f'{city}{name}{suffix}'
+             for city in ('深圳', '廣州', '東莞', '佛山', '寧波', '義烏')
+             for name in ('華強', '恒通', '美嘉', '精密', '宏達', '新意', '利豐', '盛世')
+             for suffix in ('貿易', '五金', '禮品', '實業')]
+PRODUCTS = ['不鏽鋼保溫杯', '硅膠手機殼', 'PVC 鑰匙扣', '帆布袋', 'Enamel Pin', '金屬徽章', '亞克力立牌']
+
+# (說明, 關鍵字)
+QUERIES = [
+    ('單號片段', '0123'),
+    ('客戶名稱', '恒通貿易'),
+    ('產品名稱', '保溫杯'),
+    ('備註', '客戶要求提前'),
+    ('無結果', '不存在的關鍵字'),
+]
+REPEAT = 7
+
+
+def seed(count):
+    """寫入測試訂單（觸發器同時寫入全文索引；直接用 SQL 寫入，搜索鍵另外補算）"""
+    rng = random.Random(42)
+    conn = get_db()
+    batch = []
+    for i in range(count):
+        batch.append((
+            f'KC{2020 + i % 7}{i:07d}',
+            rng.choice(CUSTOMERS),
+            rng.choice(PRODUCTS),
+            f'P-{rng.randint(100, 999)}',
+            f'PT{rng.randint(10, 99)}',
+            rng.choice(['一廠', '二廠', '三廠']),
+            rng.choice([None, None, None, '加急 客戶要求提前', '返單']),
+            f'2026-{1 + i % 12:02d}-{1 + i % 28:02d}'
+        ))
+        if len(batch) == 50000:
+            insert(conn, batch)
+            batch = []
+    if batch:
+        insert(conn, batch)
+    fill_search_keys(conn)
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def insert(conn, rows):
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, product_name, product_code, pattern_code,
+                            factory, notes, order_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+
+
+def search_customer_names(conn, keyword, limit=10):
+    """客戶名稱自動完成的 SQL 寫法（進程內索引之前）：走索引時按最佳 bm25 排序，否則按名稱排序"""
+    if use_fts_search(keyword):
+        return [row['customer_name'] for row in conn.execute(f'''
+            SELECT o.customer_name
+            FROM {ORDERS_FTS_TABLE} f
+            JOIN orders o ON o.id = f.rowid
+            WHERE {ORDERS_FTS_TABLE} MATCH ?
+            GROUP BY o.customer_name
+            ORDER BY MIN(f.rank), o.customer_name
+            LIMIT ?
+        ''', (fts_match_expression(keyword, ['customer_name']), limit))]
+    return [row['customer_name'] for row in conn.execute('''
+        SELECT DISTINCT customer_name
+        FROM orders
+        WHERE customer_name LIKE ?
+        ORDER BY customer_name
+        LIMIT ?
+    ''', (f'%{keyword}%', limit))]
+
+
+def median_ms(fn):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def run_size(size):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pool.reconfigure(database_path=os.path.join(tmp, 'bench.db'))
+        init_db()
+        start = time.perf_counter()
+        seed(size)
+        seed_seconds = time.perf_counter() - start
+        conn = get_db()
+
+        for label, keyword in QUERIES:
+            models.ORDER_SEARCH_FTS = False
+            like = median_ms(lambda: search_orders(conn, keyword))
+            like_rows = {row['id'] for row in search_orders(conn, keyword, limit=size)}
+            models.ORDER_SEARCH_FTS = True
+            fts = median_ms(lambda: search_orders(conn, keyword))
+            fts_rows = {row['id'] for row in search_orders(conn, keyword, limit=size)}
+            assert like_rows == fts_rows, f'{keyword} 結果不一致'
+            results.append((f'全局搜索 {label}', len(fts_rows), like, fts))
+
+        keyword = '恒通'
+        models.ORDER_SEARCH_FTS = False
+        like = median_ms(lambda: search_customer_names(conn, keyword + '貿'))
+        models.ORDER_SEARCH_FTS = True
+        fts = median_ms(lambda: search_customer_names(conn, keyword + '貿'))
+        results.append(('客戶自動完成', 10, like, fts))
+
+        index = CustomerNameIndex()
+        index.load(conn)
+        in_memory = median_ms(lambda: index.search(keyword + '貿'))
+        results.append(('客戶自動完成(內存索引)', 10, like, in_memory))
+
+        conn.close()
+        pool.clear()
+    return seed_seconds, results
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100000, 1000000]
+    if not models.ORDER_SEARCH_FTS:
+        print('當前 SQLite 不支持 FTS5 trigram，無法比較')
+        return
+
+    print("=" * 78)
+    print(f"訂單搜索延遲（毫秒，{REPEAT} 次取中位數；全局搜索取前 100 條）")
+    print("=" * 78)
+    for size in sizes:
+        seed_seconds, results = run_size(size)
+        print(f"\n{size} 筆訂單（寫入含索引耗時 {seed_seconds:.1f} 秒）")
+        print(f"{'查詢':<20} {'匹配數':>10} {'LIKE':>10} {'索引':>10} {'加速':>8}")
+        print("-" * 78)
+        for label, matches, like, fts in results:
+            print(f"{label:<20} {matches:>10} {like:>10.2f} {fts:>10.3f} {like / fts:>7.1f}x")
+    print("=" * 78)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+寫入進行中的讀取吞吐量基準測試
+對比回滾日誌（舊行為）和 WAL 配置下，快速更新持續寫入時首頁查詢的吞吐量
+
+用法：python benchmarks/bench_wal_concurrency.py [訂單數] [秒數] [讀取線程數]
+使用臨時數據庫，不會動到 data/tracking.db
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# 添加项目路径
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from order_tracking.config import SQLITE_PRAGMA_PROFILES
+from order_tracking.db import pool
+from order_tracking.models import init_db, get_db
+
+
+def seed_orders(count):
+    """寫入測試訂單和初始歷史"""
+    conn = get_db()
+    today = date.today()
+    rows = []
+    for i in range(count):
+        changed = (today - timedelta(days=i % 30)).isoformat()
+        rows.append((f'BENCH{i:07d}', f'客戶{i % 500}', changed, 'PRODUCING', changed))
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    conn.execute('''
+        INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator)
+        SELECT id, order_number, NULL, current_status, order_date, 'bench' FROM orders
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def writer(stop, counters, count):
+    """模擬管理員連續快速更新：插入歷史 + 更新訂單，每筆一次提交"""
+    conn = get_db()
+    i = 0
+    while not stop.is_set():
+        order_number = f'BENCH{i % count:07d}'
+        try:
+            conn.execute('''
+                INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator)
+                SELECT id, order_number, current_status, 'PRODUCING', ?, 'bench' FROM orders WHERE order_number = ?
+            ''', (date.today().isoformat(), order_number))
+            conn.execute('''
+                UPDATE orders SET last_status_change_date = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE order_number = ?
+            ''', (date.today().isoformat(), order_number))
+            conn.commit()
+            counters['writes'] += 1
+        except sqlite3.OperationalError:
+            conn.rollback()
+            counters['write_errors'] += 1
+        i += 1
+    conn.close()
+
+
+def reader(stop, counters, lock):
+    """模擬看板讀取：首頁的全表排序查詢"""
+    conn = get_db()
+    reads = errors = 0
+    while not stop.is_set():
+        try:
+            conn.execute(
+                'SELECT * FROM orders ORDER BY status_light DESC, status_days DESC, order_date DESC LIMIT 200'
+            ).fetchall()
+            reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    with lock:
+        counters['reads'] += reads
+        counters['read_errors'] += errors
+
+
+def run_profile(profile, order_count, seconds, reader_count):
+    """在指定 PRAGMA 配置下跑一輪"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool.reconfigure(database_path=os.path.join(tmp, 'bench.db'),
+                         pragmas=SQLITE_PRAGMA_PROFILES[profile])
+        init_db()
+        seed_orders(order_count)
+
+        counters = {'reads': 0, 'read_errors': 0, 'writes': 0, 'write_errors': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        threads = [threading.Thread(target=writer, args=(stop, counters, order_count))]
+        threads += [threading.Thread(target=reader, args=(stop, counters, lock)) for _ in range(reader_count)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        pool.clear()
+
+    return {
+        'profile': profile,
+        'reads_per_sec': counters['reads'] / seconds,
+        'writes_per_sec': counters['writes'] / seconds,
+        'read_errors': counters['read_errors'],
+        'write_errors': counters['write_errors']
+    }
+
+
+def main():
+    order_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    reader_count = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    print("=" * 60)
+    print(f"寫入期間讀取吞吐量（{order_count} 筆訂單，{seconds} 秒，{reader_count} 個讀取線程）")
+    print("=" * 60)
+    print(f"{'配置':<10} {'讀取/秒':>10} {'寫入/秒':>10} {'讀取錯誤':>10} {'寫入錯誤':>10}")
+    print("-" * 60)
+    for profile in ('rollback', 'wal'):
+        r = run_profile(profile, order_count, seconds, reader_count)
+        print(f"{r['profile']:<10} {r['reads_per_sec']:>10.1f} {r['writes_per_sec']:>10.1f} "
+              f"{r['read_errors']:>10} {r['write_errors']:>10}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
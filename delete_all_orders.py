@@ -63,6 +63,9 @@ def delete_all_orders():
         history_deleted = cursor.rowcount
         print(f"✅ 已删除状态历史: {history_deleted} 条")
         
+        # 删除阶段里程碑
+        cursor.execute("DELETE FROM order_milestones")
+        
         # 删除订单备注
         cursor.execute("DELETE FROM notes WHERE item_type = 'order'")
         notes_deleted = cursor.rowcount
@@ -68,6 +68,7 @@ def delete_test_orders():
             # 删除状态历史
             cursor.execute("DELETE FROM status_history WHERE order_number = ?", (order_number,))
             history_deleted = cursor.rowcount
+            cursor.execute("DELETE FROM order_milestones WHERE order_id = ?", (order_id,))
             
             # 删除备注
             cursor.execute("DELETE FROM notes WHERE item_type = 'order' AND item_id = ?", (order_id,))
@@ -124,6 +125,7 @@ def delete_all_test_orders_by_pattern():
                 
                 # 删除状态历史
                 cursor.execute("DELETE FROM status_history WHERE order_number = ?", (order_number,))
+                cursor.execute("DELETE FROM order_milestones WHERE order_id = ?", (order_id,))
                 
                 # 删除备注
                 cursor.execute("DELETE FROM notes WHERE item_type = 'order' AND item_id = ?", (order_id,))
@@ -178,6 +180,7 @@ def delete_yu_orders():
                 # 删除状态历史
                 cursor.execute("DELETE FROM status_history WHERE order_number = ?", (order_number,))
                 history_deleted = cursor.rowcount
+                cursor.execute("DELETE FROM order_milestones WHERE order_id = ?", (order_id,))
                 
                 # 删除备注
                 cursor.execute("DELETE FROM notes WHERE item_type = 'order' AND item_id = ?", (order_id,))
@@ -256,6 +259,9 @@ def delete_all_orders():
         history_deleted = cursor.rowcount
         print(f"✅ 已删除状态历史: {history_deleted} 条")
         
+        # 删除阶段里程碑
+        cursor.execute("DELETE FROM order_milestones")
+        
         # 删除订单备注
         cursor.execute("DELETE FROM notes WHERE item_type = 'order'")
         notes_deleted = cursor.rowcount
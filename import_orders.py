@@ -19,8 +19,9 @@ if sys.platform == 'win32':
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from order_tracking.models import get_db, calculate_status_light, update_status_light
-from order_tracking.status_config import STATUS
+from order_tracking.models import (get_db, calculate_status_light, update_status_light, next_light_change_date,
+                                   record_milestone, update_search_key)
+from order_tracking.status_config import STATUS, normalize_status_key
 
 # 从图片描述中提取的订单数据
 ORDERS_DATA = [
@@ -290,7 +291,9 @@ def import_orders():
             
             # 确定状态
             product_info = order_data.get("product_info", "")
-            current_status, status_date = determine_status_from_info(product_info)
+            status_label, status_date = determine_status_from_info(product_info)
+            # 數據庫存狀態 key（與應用內的寫入一致，里程碑 / 歷史 / 訂單用同一個值）
+            current_status = normalize_status_key(status_label)
             
             # 如果没有从产品信息中提取到日期，使用订单日期
             if not status_date:
@@ -329,6 +332,7 @@ def import_orders():
             ))
             
             order_id = cursor.lastrowid
+            update_search_key(conn, order_id)
             
             # 插入状态历史
             cursor.execute('''
@@ -345,21 +349,25 @@ def import_orders():
                 'system',
                 '订单导入'
             ))
+            # 首頁的階段日期讀 order_milestones，與歷史在同一事務中記錄
+            record_milestone(conn, order_id, current_status,
+                             status_date.isoformat() if status_date else order_date.isoformat())
             
             # 更新灯号
             cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
             order = dict(cursor.fetchone())
             light = calculate_status_light(order)
             status_days = (date.today() - status_date).days if status_date else 0
+            next_change = next_light_change_date(order)
             
             cursor.execute('''
                 UPDATE orders 
-                SET status_light = ?, status_days = ?
+                SET status_light = ?, status_days = ?, next_light_change_date = ?
                 WHERE id = ?
-            ''', (light, status_days, order_id))
+            ''', (light, status_days, next_change.isoformat() if next_change else None, order_id))
             
             success_count += 1
-            print(f"✅ [{idx}] 订单 {order_number} ({customer_name}): {current_status}")
+            print(f"✅ [{idx}] 订单 {order_number} ({customer_name}): {status_label}")
             
         except Exception as e:
             error_count += 1
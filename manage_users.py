@@ -2,7 +2,6 @@
 用戶帳號管理工具
 可以查看資料庫中的所有帳號，並重置密碼
 """
-import sqlite3
 import os
 import sys
 from pathlib import Path
@@ -20,18 +19,18 @@ except ImportError:
     def check_password_hash(hashed, password):
         return hashed == f"hash_{password}"
 
-# 資料庫路徑
-BASE_DIR = Path(__file__).parent / 'order_tracking'
-DATABASE_PATH = BASE_DIR / 'data' / 'tracking.db'
+from order_tracking.db import pool
+from order_tracking.models import get_db as get_pooled_db
+
+# 資料庫路徑（與應用相同，可用 TRACKING_DATABASE_PATH 指定）
+DATABASE_PATH = Path(pool.database_path)
 
 def get_db():
-    """獲取資料庫連接"""
+    """獲取資料庫連接（走 order_tracking 的連接池，PRAGMA 與應用一致）"""
     if not DATABASE_PATH.exists():
         print(f"❌ 錯誤: 找不到資料庫檔案: {DATABASE_PATH}")
         return None
-    conn = sqlite3.connect(str(DATABASE_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_pooled_db()
 
 def list_users():
     """列出所有用戶"""
@@ -2,17 +2,14 @@
 訂單流程追蹤系統 - Blueprint入口
 包含所有路由定義和業務邏輯
 """
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, g
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, g, make_response, Response
 from werkzeug.exceptions import NotFound
-try:
-    from werkzeug.security import check_password_hash
-except ImportError:
-    # 如果沒有werkzeug，使用簡單的檢查（僅開發環境）
-    def check_password_hash(hashed, password):
-        return hashed == f"hash_{password}"
+from .login_guard import check_password_hash, hash_password, needs_rehash, login_guard
 
 from datetime import datetime, date, timezone
+import base64
 import functools
+import json
 try:
     import jwt
     HAS_JWT = True
@@ -20,26 +17,198 @@ except ImportError:
     jwt = None
     HAS_JWT = False
 
-from .models import get_db, init_db, calculate_status_light, update_status_light, generate_revision_number
-from .config import SECRET_KEY, JWT_SECRET_KEY, JWT_EXPIRATION_DELTA, BLUEPRINT_NAME, URL_PREFIX
+from .models import (get_db, init_db, update_status_light,
+                     reserve_quote_number, release_quote_number, take_quote_number,
+                     record_milestones, refresh_status_lights_for,
+                     get_first_reached_dates, record_milestone, refresh_milestone, refresh_all_status_lights,
+                     sweep_status_lights, check_order_counters, order_search_clause, search_orders,
+                     update_search_key, get_data_generation, latest_order_change, order_changes_horizon,
+                     get_order_changes, prune_order_changes, order_columns,
+                     ORDER_FIELDS, BOARD_CARD_FIELDS, ORDER_DETAIL_FIELDS,
+                     ORDERS_READ_SOURCE, ORDERS_LIVE_VIEW)
+from .db import close_request_connection, get_pool_stats
+from .customer_index import customer_index, search_customers
+from .auth_cache import token_cache, user_status_cache
+from .events import order_events, format_sse
+from .fast_json import json_response
+from .compression import compress_response
+from .stats import BOARD_LIGHTS, STATS_BREAKDOWNS, normalize_status_key, get_order_stats
+from .config import (SECRET_KEY, JWT_SECRET_KEY, JWT_EXPIRATION_DELTA, BLUEPRINT_NAME, URL_PREFIX,
+                     ORDERS_PAGE_SIZE, ORDERS_MAX_PAGE_SIZE, INDEX_RENDER_MODE, INDEX_PAGE_SIZE,
+                     LEGACY_STATUS_VALUES, QUICK_UPDATE_BATCH_MAX, SSE_HEARTBEAT_INTERVAL)
 from .status_config import STATUS, STAGE_GROUPS, STATUS_MAP, get_stage_group, get_statuses_by_stage_group  # 向后兼容
-from .status_definitions import STATUS_KEYS, QUICK_ACTIONS_MAP, get_status_label, STATUS_LABELS
+from .status_definitions import STATUS_KEYS, QUICK_ACTIONS_MAP, get_status_label, STATUS_LABELS, LEGACY_STATUS_ALIASES
+from .status_definitions import get_statuses_by_stage_group as get_status_keys_by_stage_group
+
+# ==================== 分頁游標 ====================
+# 看板排序鍵：status_light DESC, status_days DESC, order_date DESC, id DESC
+BOARD_SORT_COLUMNS = ('status_light', 'status_days', 'order_date', 'id')
+
+def encode_cursor(row):
+    """把最後一行的排序鍵編碼成不透明游標"""
+    key = [row[col] for col in BOARD_SORT_COLUMNS]
+    raw = json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor_str):
+    """解析游標，格式錯誤時返回 None"""
+    try:
+        padded = cursor_str + '=' * (-len(cursor_str) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(key, list) or len(key) != len(BOARD_SORT_COLUMNS):
+        return None
+    return key
+
+# ==================== 字段投影 ====================
 
-# ==================== 兼容性辅助函数 ====================
-def get_status_for_query(status_key):
+def parse_fields(default, required=('order_number',)):
     """
-    获取用于数据库查询的状态值（兼容旧数据）
-    返回 (key, 简体中文) 的元组，用于 IN 查询
+    解析 fields= 參數（逗號分隔的列名，* 表示 ORDER_FIELDS 全部；未指定時用 default）
+    required 中的列總是返回；返回 (列名元組, None)，有不允許的列名時返回 (None, 錯誤響應)
     """
-    label_zh_cn = get_status_label(status_key, 'zh_cn')
-    return (status_key, label_zh_cn)
-
-def get_completed_cancelled_for_query():
-    """获取已完成和已取消的状态值（用于查询，兼容旧数据）"""
-    return (
-        (STATUS_KEYS['COMPLETED'], STATUS['COMPLETED']),
-        (STATUS_KEYS['CANCELLED'], STATUS['CANCELLED'])
-    )
+    value = request.args.get('fields', '').strip()
+    if not value:
+        fields = list(default)
+    elif value == '*':
+        fields = list(ORDER_FIELDS)
+    else:
+        fields = [f.strip() for f in value.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in ORDER_FIELDS]
+        if unknown:
+            return None, (jsonify({'success': False, 'error': f'不支持的字段: {", ".join(unknown)}',
+                                   'code': 'INVALID_FIELDS'}), 400)
+    for field in reversed(required):
+        if field not in fields:
+            fields.insert(0, field)
+    return tuple(dict.fromkeys(fields)), None
+
+# 首頁訂單附帶的階段日期：字段名 -> 首次進入的狀態 key
+INDEX_MILESTONE_FIELDS = {
+    'draft_date': STATUS_KEYS['DRAFT_CONFIRMING'],  # 發圖日期
+}
+
+# ==================== 看板篩選 / 匯總 ====================
+def status_values_for_query(status_keys):
+    """
+    狀態 key 列表 -> 查詢用的值列表
+    LEGACY_STATUS_VALUES 開啟時為 key + 簡體 + 繁體 + 舊寫法（兼容舊數據），關閉後只用 key
+    """
+    if not LEGACY_STATUS_VALUES:
+        return list(dict.fromkeys(status_keys))
+    values = []
+    for key in status_keys:
+        for value in (key, get_status_label(key, 'zh_cn'), get_status_label(key, 'zh_tw')):
+            if value not in values:
+                values.append(value)
+        for alias, alias_key in LEGACY_STATUS_ALIASES.items():
+            if alias_key == key and alias not in values:
+                values.append(alias)
+    return values
+
+def build_board_filter(stage_group='all', substatus='all', lights=None, search='',
+                       show_completed=True, show_cancelled=False):
+    """
+    看板篩選條件（語義與 tracking.js 的 applyFilters 一致），返回 (WHERE 子句, 參數)
+    stage_group：all / STAGE_GROUPS 中的分組；None 表示不按階段篩選
+    lights：要顯示的燈號集合，None 表示不限
+    """
+    clauses = []
+    params = []
+
+    def status_in(status_keys, negate=False):
+        values = status_values_for_query(status_keys)
+        if not values:
+            clauses.append('1=1' if negate else '0')
+            return
+        op = 'NOT IN' if negate else 'IN'
+        clauses.append(f"current_status {op} ({', '.join(['?'] * len(values))})")
+        params.extend(values)
+
+    if stage_group == 'all':
+        # 全部：進行中的訂單 + 勾選顯示的已完成 / 已取消
+        hidden = []
+        if not show_completed:
+            hidden.append(STATUS_KEYS['COMPLETED'])
+        if not show_cancelled:
+            hidden.append(STATUS_KEYS['CANCELLED'])
+        if hidden:
+            status_in(hidden, negate=True)
+    elif stage_group is not None:
+        if (stage_group == 'completed' and not show_completed) or \
+                (stage_group == 'cancelled' and not show_cancelled):
+            clauses.append('0')
+        else:
+            status_in(get_status_keys_by_stage_group(stage_group))
+
+    if substatus and substatus != 'all':
+        status_in([normalize_status_key(substatus)])
+
+    if lights is not None:
+        # 沒有燈號的訂單不受燈號篩選影響（與前端一致）
+        lights = [l for l in BOARD_LIGHTS if l in lights]
+        placeholders = ', '.join(['?'] * len(lights)) or 'NULL'
+        clauses.append(f"(status_light IS NULL OR status_light = '' OR status_light IN ({placeholders}))")
+        params.extend(lights)
+
+    if search:
+        # 全文索引（orders_fts，含繁簡 / 拼音搜索鍵，寫入時已算好）；關鍵字太短時退回 LIKE
+        search_sql, search_params = order_search_clause(search)
+        clauses.append(search_sql)
+        params.extend(search_params)
+
+    return ' AND '.join(clauses) or '1=1', params
+
+def fetch_board_page(conn, where, params, limit, after=None, fields=None):
+    """
+    按看板排序取一頁訂單，返回 (行列表, 是否還有下一頁)；fields 為要取的列（需包含排序鍵，默認全部）
+    limit 為 None 時不分頁，返回 after 之後的全部訂單
+    讀 orders 表時排序和游標範圍走 idx_orders_board_sort；讀 orders_live 視圖時燈號 / 天數是算出來的，
+    每頁都要對篩選後的訂單排序一次（成本隨訂單數增長，不隨頁碼增長）
+    默認讀視圖：不能只按保存的列分頁再給這一頁算燈號，保存的燈號 / 天數過時時順序會與顯示的燈號不一致
+    （取捨見 config.LIGHTS_AT_READ_TIME）
+    """
+    query = f"SELECT {order_columns(fields)} FROM {ORDERS_READ_SOURCE} WHERE {where}"
+    params = list(params)
+    if after is not None:
+        query += f" AND ({', '.join(BOARD_SORT_COLUMNS)}) < ({', '.join(['?'] * len(BOARD_SORT_COLUMNS))})"
+        params.extend(after)
+    query += " ORDER BY status_light DESC, status_days DESC, order_date DESC, id DESC"
+    if limit is None:
+        return conn.execute(query, params).fetchall(), False
+    query += " LIMIT ?"
+    params.append(limit + 1)  # 多取一筆判斷是否還有下一頁
+    rows = conn.execute(query, params).fetchall()
+    return rows[:limit], len(rows) > limit
+
+def attach_milestone_dates(conn, orders_list):
+    """給訂單附上 INDEX_MILESTONE_FIELDS 中的階段日期（一次查詢）"""
+    first_dates = get_first_reached_dates(conn, list(INDEX_MILESTONE_FIELDS.values()))
+    for order in orders_list:
+        reached = first_dates.get(order['order_number'], {})
+        for field, status_key in INDEX_MILESTONE_FIELDS.items():
+            order[field] = reached.get(status_key)
+    return orders_list
+
+def board_template_context():
+    """訂單行模板（_order_rows.html）需要的狀態常量"""
+    # 生成兼容列表：同时包含 key 和中文（用于模板查询）
+    def make_compatible_status_list(stage_group):
+        return status_values_for_query(get_status_keys_by_stage_group(stage_group))
+
+    return {
+        'new_and_quote_statuses': make_compatible_status_list('new_and_quote'),
+        'draft_statuses': make_compatible_status_list('draft'),
+        'sampling_statuses': make_compatible_status_list('sampling'),
+        'production_statuses': make_compatible_status_list('production'),
+        # STATUS: 向后兼容（key -> 简体中文）
+        # STATUS_KEYS: 新的 key 定义
+        # STATUS_LABELS: key -> 显示文字映射
+        'STATUS': STATUS,
+        'STATUS_KEYS': STATUS_KEYS,
+        'STATUS_LABELS': STATUS_LABELS,
+    }
 
 # 創建Blueprint
 tracking_bp = Blueprint(
@@ -51,6 +220,14 @@ tracking_bp = Blueprint(
     static_url_path='/static/tracking'
 )
 
+@tracking_bp.record_once
+def _register_db_teardown(state):
+    """應用上下文結束時把請求連接歸還到連接池"""
+    state.app.teardown_appcontext(close_request_connection)
+
+# JSON / HTML 響應按 Accept-Encoding 壓縮（只作用於本藍圖的路由）
+tracking_bp.after_request(compress_response)
+
 # ==================== 工具函數 ====================
 
 def login_required(f):
@@ -79,12 +256,35 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# 非 active 用戶調用 API 時的錯誤（與登入時的提示一致）
+INACTIVE_USER_ERRORS = {
+    'pending': ('您的帳號正在等待主管審核，請稍後再試', 'PENDING_APPROVAL'),
+    'rejected': ('您的註冊申請已被拒絕，請聯繫主管', 'REJECTED'),
+    'suspended': ('您的帳號已被停權，請聯繫主管', 'SUSPENDED')
+}
+
+def check_user_status(user_id):
+    """API 請求的用戶狀態檢查（緩存，停權後立即生效）；可以繼續時返回 None，否則返回錯誤響應"""
+    status = user_status_cache.get(get_db(), user_id)
+    if status is None:
+        return jsonify({'success': False, 'error': '用戶不存在', 'code': 'INVALID_TOKEN'}), 401
+    if status in INACTIVE_USER_ERRORS:
+        error, code = INACTIVE_USER_ERRORS[status]
+        return jsonify({'success': False, 'error': error, 'code': code}), 403
+    return None
+
 def api_login_required(f):
-    """API登入驗證裝飾器（JWT）"""
+    """
+    API登入驗證裝飾器（JWT）
+    已驗證的 Token 緩存到過期為止（token_cache）；每次請求都檢查用戶狀態（user_status_cache）
+    """
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
         # 1) 先支援已有的 Session 登入（從網頁呼叫 API）
         if 'user_id' in session:
+            error = check_user_status(session['user_id'])
+            if error is not None:
+                return error
             g.current_user = {
                 'id': session['user_id'],
                 'username': session.get('username'),
@@ -107,17 +307,24 @@ def api_login_required(f):
         if not token:
             return jsonify({'success': False, 'error': '未提供Token或未登入', 'code': 'UNAUTHORIZED'}), 401
         
-        try:
-            data = jwt.decode(token, JWT_SECRET_KEY, algorithms=['HS256'])
-            g.current_user = {
-                'id': data['user_id'],
-                'username': data['username'],
-                'role': data['role']
-            }
-        except jwt.ExpiredSignatureError:
-            return jsonify({'success': False, 'error': 'Token已過期', 'code': 'TOKEN_EXPIRED'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'success': False, 'error': 'Token無效', 'code': 'INVALID_TOKEN'}), 401
+        data = token_cache.get(token)
+        if data is None:
+            try:
+                data = jwt.decode(token, JWT_SECRET_KEY, algorithms=['HS256'])
+            except jwt.ExpiredSignatureError:
+                return jsonify({'success': False, 'error': 'Token已過期', 'code': 'TOKEN_EXPIRED'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'success': False, 'error': 'Token無效', 'code': 'INVALID_TOKEN'}), 401
+            token_cache.put(token, data)
+        
+        error = check_user_status(data['user_id'])
+        if error is not None:
+            return error
+        g.current_user = {
+            'id': data['user_id'],
+            'username': data['username'],
+            'role': data['role']
+        }
         
         return f(*args, **kwargs)
     return decorated_function
@@ -132,6 +339,41 @@ def api_admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def conditional_get(f):
+    """
+    條件請求裝飾器（放在登入裝飾器之後）：ETag / Last-Modified 取自數據版本（data_generation）和當天日期
+    （燈號按讀取當天計算），If-None-Match / If-Modified-Since 命中時直接返回 304，不執行視圖、不查 orders
+    """
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        generation, changed_at = get_data_generation(get_db())
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+        today = date.today()
+        etag = f'{generation}-{int(changed_at.timestamp())}-{today:%Y%m%d}'
+        last_modified = max(changed_at, datetime.combine(today, datetime.min.time()).astimezone(timezone.utc))
+        
+        # 有 If-None-Match 時以 ETag 為準（RFC 9110）
+        if request.if_none_match:
+            fresh = request.if_none_match.contains_weak(etag)
+        else:
+            fresh = request.if_modified_since is not None and last_modified <= request.if_modified_since
+        response = make_response('', 304) if fresh else make_response(f(*args, **kwargs))
+        if response.status_code not in (200, 304):
+            return response
+        
+        response.set_etag(etag, weak=True)
+        # Last-Modified 只精確到秒：同一秒內可能還有寫入，這一秒過去之前不給（客戶端只能用 ETag）
+        if last_modified < datetime.now(timezone.utc).replace(microsecond=0):
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return decorated_function
+
+def publish_order_changed(action, order_numbers, **data):
+    """寫入提交之後推送 order-changed（看板 SSE，fan-out 線程隨後推送 stats-changed）"""
+    order_events.publish('order-changed', dict(data, action=action, order_numbers=order_numbers))
+
 # ==================== 認證路由 ====================
 
 @tracking_bp.route('/login', methods=['GET', 'POST'])
@@ -155,6 +397,16 @@ def login():
                 return jsonify({'success': False, 'error': error_msg, 'code': 'MISSING_PASSWORD'}), 400
             return render_template('login.html', error=error_msg, username=username)
         
+        # 登入限流：同一用戶名失敗太多次或同一 IP 嘗試太頻繁時，在查庫和驗證密碼之前拒絕
+        wait = login_guard.check(username, request.remote_addr or '')
+        if wait:
+            error_msg = f'嘗試次數過多，請 {wait} 秒後再試'
+            headers = {'Retry-After': str(wait)}
+            if request.is_json:
+                return jsonify({'success': False, 'error': error_msg, 'code': 'TOO_MANY_ATTEMPTS',
+                                'retry_after': wait}), 429, headers
+            return render_template('login.html', error=error_msg, username=username), 429, headers
+        
         # 從資料庫驗證用戶和密碼
         conn = get_db()
         cursor = conn.cursor()
@@ -164,6 +416,7 @@ def login():
         # 驗證用戶是否存在和密碼是否正確
         if not user:
             conn.close()
+            login_guard.failed(username)
             error_msg = '用戶名或密碼錯誤'
             if request.is_json:
                 return jsonify({'success': False, 'error': error_msg, 'code': 'INVALID_CREDENTIALS'}), 401
@@ -233,8 +486,7 @@ def login():
                 return render_template('login.html', error=error_msg, username=username, needs_password_reset=True)
             
             # 更新密碼並清除重置標記
-            from werkzeug.security import generate_password_hash
-            new_password_hash = generate_password_hash(password)
+            new_password_hash = hash_password(password)
             cursor.execute('''
                 UPDATE users 
                 SET password_hash = ?, needs_password_reset = 0 
@@ -245,11 +497,19 @@ def login():
             # 正常登入，驗證密碼
             if not check_password_hash(user['password_hash'], password):
                 conn.close()
+                login_guard.failed(username)
                 error_msg = '用戶名或密碼錯誤'
                 if request.is_json:
                     return jsonify({'success': False, 'error': error_msg, 'code': 'INVALID_CREDENTIALS'}), 401
                 return render_template('login.html', error=error_msg, username=username)
+            
+            # 哈希參數與當前配置不同（舊密碼或調整了 PASSWORD_HASH_METHOD）：用剛驗證過的明文重新計算
+            if needs_rehash(user['password_hash']):
+                cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                               (hash_password(password), user['id']))
+                conn.commit()
         
+        login_guard.succeeded(username)
         conn.close()
         
         # 登入成功
@@ -323,88 +583,111 @@ def handle_404(e):
 @tracking_bp.route('/')
 @tracking_bp.route('/index')
 def index():
-    """主頁 - 自動判斷是否登入，未登入則顯示登入頁"""
+    """
+    主頁 - 自動判斷是否登入，未登入則顯示登入頁
+    full 模式渲染所有訂單（前端篩選）；paged 模式只渲染進行中訂單的第一頁，
+    篩選時由前端請求 /orders/fragment。可用 ?mode=full|paged 臨時切換
+    """
     # 如果未登入，直接顯示登入頁面
     if 'user_id' not in session:
         return render_template('login.html')
     
-    # 已登入，返回所有訂單數據（前端進行篩選）
+    index_mode = request.args.get('mode') or INDEX_RENDER_MODE
+    if index_mode not in ('full', 'paged'):
+        index_mode = 'full'
+    
     conn = get_db()
     cursor = conn.cursor()
     
-    # 獲取所有訂單（不做篩選，前端處理）
-    cursor.execute("SELECT * FROM orders ORDER BY status_light DESC, status_days DESC, order_date DESC")
-    orders_list = [dict(row) for row in cursor.fetchall()]
+    next_cursor = None
+    if index_mode == 'paged':
+        # 只取進行中訂單的第一頁，已完成/已取消等篩選時再取
+        where, params = build_board_filter(show_completed=False, show_cancelled=False)
+        rows, has_more = fetch_board_page(conn, where, params, INDEX_PAGE_SIZE)
+        orders_list = [dict(row) for row in rows]
+        if has_more:
+            next_cursor = encode_cursor(rows[-1])
+    else:
+        # 獲取所有訂單（不做篩選，前端處理）
+        cursor.execute(f"SELECT * FROM {ORDERS_READ_SOURCE} ORDER BY status_light DESC, status_days DESC, order_date DESC")
+        orders_list = [dict(row) for row in cursor.fetchall()]
     
-    # 为每个订单查询发图日期
-    for order in orders_list:
-        order_dict = dict(order)
-        cursor.execute('''
-            SELECT action_date FROM status_history 
-            WHERE order_number = ? AND to_status = ? 
-            ORDER BY action_date ASC LIMIT 1
-        ''', (order_dict['order_number'], STATUS_KEYS['DRAFT_CONFIRMING']))
-        draft_row = cursor.fetchone()
-        order_dict['draft_date'] = draft_row['action_date'] if draft_row else None
-        orders_list[orders_list.index(order)] = order_dict
-    
-    # 总订单数
-    cursor.execute('SELECT COUNT(*) as total FROM orders')
-    total_orders = cursor.fetchone()['total']
-    
-    # 燈號統計（用於統計卡片）- 兼容旧数据（同时查询 key 和中文）
-    completed_key, completed_label = get_status_for_query(STATUS_KEYS['COMPLETED'])
-    cancelled_key, cancelled_label = get_status_for_query(STATUS_KEYS['CANCELLED'])
-    cursor.execute('''
-        SELECT status_light, COUNT(*) as count 
-        FROM orders 
-        WHERE current_status NOT IN (?, ?, ?, ?)
-        GROUP BY status_light
-    ''', (completed_key, completed_label, cancelled_key, cancelled_label))
-    light_stats = {row['status_light']: row['count'] for row in cursor.fetchall()}
+    # 各階段首次到達日期（發圖日期等）：一次 GROUP BY 查詢，不再逐單查詢
+    attach_milestone_dates(conn, orders_list)
     
-    conn.close()
+    # 統計卡片 / 篩選按鈕的計數在 SQL 中匯總，與頁面上渲染的行數無關
+    board_counts = get_order_stats(conn)
     
-    # 定义各阶段的状态列表（兼容 key 和中文）
-    # 统一使用 status_definitions.py 中的状态定义
-    from .status_definitions import get_statuses_by_stage_group as get_status_keys_by_stage_group
+    conn.close()
     
-    # 生成兼容列表：同时包含 key 和中文（用于模板查询）
-    def make_compatible_status_list(stage_group):
-        """生成兼容 key 和中文的状态列表"""
-        keys = get_status_keys_by_stage_group(stage_group)
-        labels = [get_status_label(key, 'zh_cn') for key in keys]
-        return keys + labels  # 同时包含 key 和中文
-    
-    new_and_quote_statuses = make_compatible_status_list('new_and_quote')
-    draft_statuses = make_compatible_status_list('draft')
-    sampling_statuses = make_compatible_status_list('sampling')
-    production_statuses = make_compatible_status_list('production')
-    
-    # 等国外确认（虚拟筛选器）
-    waiting_confirm_keys = ['QUOTE_CONFIRMING', 'DRAFT_CONFIRMING', 'SAMPLE_CONFIRMING']
-    waiting_confirm_labels = [get_status_label(k, 'zh_cn') for k in waiting_confirm_keys]
-    quote_statuses = waiting_confirm_keys + waiting_confirm_labels
-    
-    # 计算等国外确认的订单数量（兼容 key 和中文）
-    quote_orders = [o for o in orders_list if o['current_status'] in quote_statuses]
-    
-    # 传递状态常量给模板
-    # STATUS: 向后兼容（key -> 简体中文）
-    # STATUS_KEYS: 新的 key 定义
-    # STATUS_LABELS: key -> 显示文字映射
     return render_template('index.html',
-                         all_orders=orders_list,
-                         total_orders=total_orders,
-                         light_stats=light_stats,
-                         new_and_quote_statuses=new_and_quote_statuses,
-                         draft_statuses=draft_statuses,
-                         sampling_statuses=sampling_statuses,
-                         production_statuses=production_statuses,
-                         quote_orders=quote_orders,
-                         STATUS=STATUS,  # 向后兼容
-                         STATUS_KEYS=STATUS_KEYS,  # 新的 key 定义
-                         STATUS_LABELS=STATUS_LABELS)  # key -> 显示文字
+                         orders=orders_list,
+                         board_counts=board_counts,
+                         index_mode=index_mode,
+                         next_cursor=next_cursor,
+                         **board_template_context())
+
+@tracking_bp.route('/orders/fragment')
+@login_required
+def orders_fragment():
+    """
+    首頁 paged 模式的篩選接口：返回服務端渲染的訂單行
+    參數：stage_group / substatus / lights（逗號分隔的要顯示的燈號）/ search /
+    show_completed / show_cancelled / cursor；include_counts=1 時附帶看板計數
+    order_numbers（逗號分隔）：只返回這些訂單的行，不篩選不分頁（full 模式收到推送後局部替換）
+    """
+    def flag(name, default):
+        value = request.args.get(name)
+        if value is None:
+            return default
+        return value.lower() in ('1', 'true', 'yes')
+    
+    lights = request.args.get('lights')
+    if lights is not None:
+        lights = [l for l in lights.split(',') if l]
+    
+    after = None
+    cursor_param = request.args.get('cursor')
+    if cursor_param:
+        after = decode_cursor(cursor_param)
+        if after is None:
+            return jsonify({'success': False, 'error': '游標無效', 'code': 'INVALID_CURSOR'}), 400
+    
+    limit = INDEX_PAGE_SIZE
+    order_numbers = request.args.get('order_numbers')
+    if order_numbers is not None:
+        numbers = list(dict.fromkeys(n for n in order_numbers.split(',') if n))
+        if len(numbers) > ORDERS_MAX_PAGE_SIZE:
+            return jsonify({'success': False, 'error': f'每次最多 {ORDERS_MAX_PAGE_SIZE} 個訂單號',
+                            'code': 'TOO_MANY_ORDERS'}), 400
+        where = f"order_number IN ({', '.join(['?'] * len(numbers)) or 'NULL'})"
+        params, limit, after = numbers, None, None
+    else:
+        where, params = build_board_filter(
+            stage_group=request.args.get('stage_group', 'all'),
+            substatus=request.args.get('substatus', 'all'),
+            lights=lights,
+            search=request.args.get('search', '').strip(),
+            show_completed=flag('show_completed', True),
+            show_cancelled=flag('show_cancelled', False)
+        )
+    
+    conn = get_db()
+    rows, has_more = fetch_board_page(conn, where, params, limit, after)
+    orders_list = attach_milestone_dates(conn, [dict(row) for row in rows])
+    counts = get_order_stats(conn) if flag('include_counts', False) else None
+    conn.close()
+    
+    result = {
+        'success': True,
+        'html': render_template('_order_rows.html', orders=orders_list, **board_template_context()),
+        'count': len(orders_list),
+        'has_more': has_more,
+        'next_cursor': encode_cursor(rows[-1]) if has_more else None
+    }
+    if counts is not None:
+        result['counts'] = counts
+    return jsonify(result)
 
 @tracking_bp.route('/orders')
 @login_required
@@ -463,27 +746,11 @@ def order_new():
         conn = get_db()
         cursor = conn.cursor()
         
-        order_number = data.get('order_number', '').strip()
+        order_number = (data.get('order_number') or '').strip()
         
-        # 如果沒有提供訂單號，生成詢價/修圖編號（YU00001開始）
+        # 如果沒有提供訂單號，使用預覽時預留的詢價編號，否則從序列分配（KC00001開始）
         if not order_number:
-            cursor.execute('''
-                SELECT order_number 
-                FROM orders 
-                WHERE order_number LIKE 'YU%'
-                ORDER BY order_number DESC
-                LIMIT 1
-            ''')
-            last_order = cursor.fetchone()
-            if last_order and last_order['order_number'].startswith('YU'):
-                try:
-                    last_num = int(last_order['order_number'].replace('YU', ''))
-                    next_num = last_num + 1
-                except:
-                    next_num = 1
-            else:
-                next_num = 1
-            order_number = f'KC{next_num:05d}'
+            order_number = take_quote_number(conn, data.get('reserved_number'), session.get('username'))
             initial_status = STATUS_KEYS['NEW_ORDER']  # 使用 key（数据库存储）
         else:
             # 如果提供了訂單號，檢查是否已存在
@@ -519,16 +786,19 @@ def order_new():
         ))
         
         order_id = cursor.lastrowid
+        update_search_key(conn, order_id)
         
         # 記錄初始狀態
         cursor.execute('''
             INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator)
             VALUES (?, ?, NULL, ?, ?, ?)
         ''', (order_id, order_number, initial_status, today_str, session.get('display_name', 'system')))
+        record_milestone(conn, order_id, initial_status, today_str)
         # 更新燈號
         update_status_light(order_id, conn)
         
         conn.commit()
+        customer_index.order_added(data.get('customer_name'))
         conn.close()
         
         if request.is_json:
@@ -580,8 +850,10 @@ def order_edit(order_number):
         order_number
     ))
     
+    update_search_key(conn, order['id'])
     update_status_light(order['id'], conn)
     conn.commit()
+    customer_index.order_renamed(order['customer_name'], data.get('customer_name'))
     conn.close()
     
     if request.is_json:
@@ -612,81 +884,145 @@ def api_auth_me():
 
 @tracking_bp.route('/api/orders', methods=['GET'])
 @api_login_required
+@conditional_get
 def api_orders():
-    """獲取訂單列表API"""
+    """
+    獲取訂單列表API（keyset 分頁）
+    參數：tab / stage / light / search 篩選；limit 每頁筆數；cursor 上一頁返回的 next_cursor；
+    limit 和 cursor 都不帶時不分頁，返回全部符合條件的訂單（與分頁前的行為相同）；
+    include_total=1 時額外返回符合條件的總數；fields 逗號分隔的列名（默認看板卡片的列，* 為全部）
+    """
     tab = request.args.get('tab', 'all')
     stage = request.args.get('stage', 'all')
     light = request.args.get('light', 'all')
     search = request.args.get('search', '')
+    include_total = request.args.get('include_total', '0').lower() in ('1', 'true', 'yes')
+    
+    # 返回的列（默認看板卡片的列）；排序鍵用於生成游標，總是返回
+    fields, error = parse_fields(BOARD_CARD_FIELDS, required=('order_number',) + BOARD_SORT_COLUMNS)
+    if error:
+        return error
+    
+    # 分頁參數：limit + cursor（keyset，按看板排序鍵翻頁）；只帶 cursor 時每頁 ORDERS_PAGE_SIZE 筆
+    limit = None
+    cursor_param = request.args.get('cursor')
+    if 'limit' in request.args or cursor_param:
+        try:
+            limit = int(request.args.get('limit', ORDERS_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'limit 必須是整數', 'code': 'INVALID_LIMIT'}), 400
+        limit = max(1, min(limit, ORDERS_MAX_PAGE_SIZE))
+    
+    after = None
+    if cursor_param:
+        after = decode_cursor(cursor_param)
+        if after is None:
+            return jsonify({'success': False, 'error': '游標無效', 'code': 'INVALID_CURSOR'}), 400
+    
+    # tab 對應看板分組（quote = 等国外确认）；未知 tab 不按階段篩選
+    tab_groups = {'all': 'all', 'quote': 'waiting_confirm', 'draft': 'draft',
+                  'sampling': 'sampling', 'production': 'production'}
+    where, params = build_board_filter(
+        stage_group=tab_groups.get(tab),
+        substatus=stage,
+        search=search,
+        show_completed=False,
+        show_cancelled=False
+    )
+    if light != 'all':
+        where += " AND status_light = ?"
+        params.append(light)
     
     conn = get_db()
-    cursor = conn.cursor()
     
-    query = "SELECT * FROM orders WHERE 1=1"
-    params = []
+    # 總數可選：大數據量時 COUNT(*) 本身就是全量掃描
+    total = None
+    if include_total:
+        total = conn.execute(f"SELECT COUNT(*) AS total FROM {ORDERS_READ_SOURCE} WHERE {where}", params).fetchone()['total']
     
-    if tab == 'all':
-        query += " AND current_status NOT IN (?, ?)"
-        # 兼容旧数据：同时查询 key 和中文
-        completed_key, completed_label = get_status_for_query(STATUS_KEYS['COMPLETED'])
-        cancelled_key, cancelled_label = get_status_for_query(STATUS_KEYS['CANCELLED'])
-        params.extend([completed_key, completed_label, cancelled_key, cancelled_label])
-    elif tab == 'quote':
-        # 等国外确认 - 筛选所有需要国外确认的状态
-        quote_statuses = get_statuses_by_stage_group('quote')
-        placeholders = ','.join(['?'] * len(quote_statuses))
-        query += f" AND current_status IN ({placeholders})"
-        params.extend(quote_statuses)
-    elif tab == 'draft':
-        draft_statuses = get_statuses_by_stage_group('draft')
-        placeholders = ','.join(['?'] * len(draft_statuses))
-        query += f" AND current_status IN ({placeholders})"
-        params.extend(draft_statuses)
-    elif tab == 'sampling':
-        sampling_statuses = get_statuses_by_stage_group('sampling')
-        placeholders = ','.join(['?'] * len(sampling_statuses))
-        query += f" AND current_status IN ({placeholders})"
-        params.extend(sampling_statuses)
-    elif tab == 'production':
-        production_statuses = get_statuses_by_stage_group('production')
-        placeholders = ','.join(['?'] * len(production_statuses))
-        query += f" AND current_status IN ({placeholders})"
-        params.extend(production_statuses)
-    
-    if stage != 'all':
-        query += " AND current_status = ?"
-        params.append(stage)
+    rows, has_more = fetch_board_page(conn, where, params, limit, after, fields)
     
-    if light != 'all':
-        query += " AND status_light = ?"
-        params.append(light)
+    conn.close()
     
-    if search:
-        query += " AND (order_number LIKE ? OR customer_name LIKE ?)"
-        search_term = f'%{search}%'
-        params.extend([search_term, search_term])
+    # 行直接交給編碼器（json_response），不先複製成 dict
+    result = {
+        'success': True,
+        'data': rows,
+        'count': len(rows),
+        'has_more': has_more,
+        'next_cursor': encode_cursor(rows[-1]) if has_more else None
+    }
+    if include_total:
+        result['total'] = total
+    return json_response(result)
+
+@tracking_bp.route('/api/orders/changes', methods=['GET'])
+@api_login_required
+@conditional_get
+def api_order_changes():
+    """
+    增量同步API：since 為上次返回的 cursor，返回之後變化過的訂單（upserted + orders）和已刪除的訂單號（deleted）
+    不帶 since 或 since 早於已清理的位置時返回 reset=true 和當前 cursor：客戶端先全量加載，再從這個 cursor 開始同步
+    has_more 時用返回的 cursor 繼續取；燈號按讀取當天計算，日期變化時客戶端應全量重載一次
+    fields 同 /api/orders（默認看板卡片的列）
+    """
+    try:
+        limit = int(request.args.get('limit', ORDERS_MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit 必須是整數', 'code': 'INVALID_LIMIT'}), 400
+    limit = max(1, min(limit, ORDERS_MAX_PAGE_SIZE))
     
-    query += " ORDER BY status_light DESC, status_days DESC, order_date DESC"
+    fields, error = parse_fields(BOARD_CARD_FIELDS)
+    if error:
+        return error
     
-    cursor.execute(query, params)
-    orders_list = [dict(row) for row in cursor.fetchall()]
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({'success': False, 'error': '游標無效', 'code': 'INVALID_CURSOR'}), 400
     
+    conn = get_db()
+    if since is None or since < order_changes_horizon(conn):
+        cursor = latest_order_change(conn)
+        conn.close()
+        return jsonify({'success': True, 'reset': True, 'cursor': str(cursor),
+                        'upserted': [], 'deleted': [], 'orders': [], 'has_more': False})
+    
+    numbers, cursor, has_more = get_order_changes(conn, since, limit)
+    orders_list = []
+    if numbers:
+        placeholders = ', '.join(['?'] * len(numbers))
+        orders_list = [dict(row) for row in conn.execute(f'''
+            SELECT {order_columns(fields)} FROM {ORDERS_READ_SOURCE} WHERE order_number IN ({placeholders})
+        ''', numbers)]
     conn.close()
     
+    upserted = {order['order_number'] for order in orders_list}
     return jsonify({
         'success': True,
-        'data': orders_list,
-        'total': len(orders_list)
+        'reset': False,
+        'cursor': str(cursor),
+        'upserted': [number for number in numbers if number in upserted],
+        'deleted': [number for number in numbers if number not in upserted],
+        'orders': orders_list,
+        'has_more': has_more
     })
 
 @tracking_bp.route('/api/orders/<order_number>', methods=['GET'])
 @api_login_required
+@conditional_get
 def api_order_detail(order_number):
-    """獲取訂單詳情API"""
+    """獲取訂單詳情API（fields 逗號分隔的列名，默認詳情彈窗的列）"""
+    fields, error = parse_fields(ORDER_DETAIL_FIELDS)
+    if error:
+        return error
+    
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM orders WHERE order_number = ?', (order_number,))
+    cursor.execute(f'SELECT {order_columns(fields)} FROM {ORDERS_READ_SOURCE} WHERE order_number = ?', (order_number,))
     order = cursor.fetchone()
     
     if not order:
@@ -729,27 +1065,11 @@ def api_create_order():
     cursor = conn.cursor()
     
     # 处理订单号
-    order_number = data.get('order_number', '').strip()
+    order_number = (data.get('order_number') or '').strip()
     
-    # 如果沒有提供訂單號，生成詢價/修圖編號（YU00001開始）
+    # 如果沒有提供訂單號，使用預覽時預留的詢價編號，否則從序列分配（KC00001開始）
     if not order_number:
-        cursor.execute('''
-            SELECT order_number 
-            FROM orders 
-            WHERE order_number LIKE 'YU%'
-            ORDER BY order_number DESC
-            LIMIT 1
-        ''')
-        last_order = cursor.fetchone()
-        if last_order and last_order['order_number'].startswith('YU'):
-            try:
-                last_num = int(last_order['order_number'].replace('YU', ''))
-                next_num = last_num + 1
-            except:
-                next_num = 1
-        else:
-            next_num = 1
-        order_number = f'KC{next_num:05d}'
+        order_number = take_quote_number(conn, data.get('reserved_number'), g.current_user.get('username'))
         initial_status = STATUS_KEYS['NEW_ORDER']  # 使用 key（数据库存储）
     else:
         # 如果提供了訂單號，檢查是否已存在
@@ -788,6 +1108,7 @@ def api_create_order():
         ))
         
         order_id = cursor.lastrowid
+        update_search_key(conn, order_id)
         
         # 记录初始状态历史
         cursor.execute('''
@@ -804,11 +1125,14 @@ def api_create_order():
             g.current_user.get('username', 'system'),
             '订单创建'
         ))
+        record_milestone(conn, order_id, initial_status, data['order_date'])
         
         # 更新灯号
         update_status_light(order_id, conn)
         
         conn.commit()
+        customer_index.order_added(data['customer_name'])
+        publish_order_changed('create', [order_number])
         
         # 獲取完整訂單信息返回
         cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
@@ -830,122 +1154,121 @@ def api_create_order():
             'code': 'DATABASE_ERROR'
         }), 500
 
+# 快速更新的操作 -> 狀態 key（统一使用 status_definitions.py 中的 QUICK_ACTIONS_MAP，直接存入数据库）
+QUICK_UPDATE_STATUS_MAP = dict(QUICK_ACTIONS_MAP)
+# 兼容旧版本（保留，但建议逐步迁移）
+QUICK_UPDATE_STATUS_MAP.update({
+    'quote_to_order': STATUS_KEYS['NEW_ORDER'],
+    'quote_complete': STATUS_KEYS['COMPLETED'],
+    'draft_sent': STATUS_KEYS['DRAFT_CONFIRMING'],
+    'draft_revise': STATUS_KEYS['DRAFT_REVISING'],
+    'draft_modified': STATUS_KEYS['DRAFT_CONFIRMING'],
+    'sample_start': STATUS_KEYS['SAMPLING'],
+    'sample_done': STATUS_KEYS['SAMPLE_CONFIRMING'],
+    'sample_confirm': STATUS_KEYS['PENDING_PRODUCTION'],
+    'sample_revise': STATUS_KEYS['SAMPLE_REVISING'],
+    'sample_modified': STATUS_KEYS['SAMPLE_CONFIRMING'],
+    'complete': STATUS_KEYS['COMPLETED']
+})
+
+def check_quick_update(item, today_str):
+    """
+    校驗一項快速更新（單筆和批量共用），返回 ((order_number, new_status, action_date, notes), None)
+    或 (None, (錯誤信息, 錯誤碼))；訂單是否存在由調用方檢查
+    """
+    if not isinstance(item, dict):
+        return None, ('無效的項', 'INVALID_ITEM')
+    order_number = item.get('order_number')
+    action = item.get('action')
+    action_date = item.get('date') or today_str
+    notes = item.get('notes', '')
+    
+    if not order_number or not action:
+        return None, ('缺少必要參數', 'MISSING_PARAMS')
+    new_status = QUICK_UPDATE_STATUS_MAP.get(action)  # 返回 key
+    if not new_status:
+        return None, (f'无效的操作：{action}', 'INVALID_ACTION')
+    # 特殊處理：詢價轉為訂單
+    if action == 'quote_to_order':
+        return None, ('請使用轉為訂單功能', 'USE_CONVERT')
+    try:
+        date.fromisoformat(action_date)
+    except (TypeError, ValueError):
+        return None, (f'日期格式錯誤：{action_date}', 'INVALID_DATE')
+    return (order_number, new_status, action_date, notes), None
+
+def write_quick_updates(conn, updates, operator):
+    """
+    寫入快速更新（單筆和批量共用）：updates 為 (order_id, order_number, old_status, new_status, action_date, notes) 列表，
+    同一訂單多次出現時按順序轉移；歷史、里程碑、訂單狀態和操作日誌（每項一條，與 /api/orders/<order_number>/status 相同）
+    用 executemany 寫入，燈號批量重算後一起提交
+    """
+    conn.executemany('''
+        INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(order_id, order_number, old_status, new_status, action_date, operator, notes)
+          for order_id, order_number, old_status, new_status, action_date, notes in updates])
+    record_milestones(conn, [(order_id, new_status, action_date)
+                             for order_id, _, _, new_status, action_date, _ in updates])
+    conn.executemany('''
+        UPDATE orders
+        SET current_status = ?,
+            last_status_change_date = ?,
+            status_days = 0,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', [(new_status, action_date, order_id) for order_id, _, _, new_status, action_date, _ in updates])
+    conn.executemany('''
+        INSERT INTO audit_log (action_type, order_number, old_status, new_status, operator, reason)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [('status_update', order_number, old_status, new_status, operator, notes)
+          for _, order_number, old_status, new_status, _, notes in updates])
+    # 燈號批量重算，並提交以上所有寫入
+    refresh_status_lights_for(conn, {order_id for order_id, *_ in updates})
+
 @tracking_bp.route('/api/orders/quick-update', methods=['POST'])
 @api_admin_required
 def api_quick_update():
-    """快速更新訂單狀態API"""
+    """快速更新訂單狀態API（校驗和寫入與批量快速更新共用，記錄操作日誌）"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'success': False, 'error': '無效的請求數據'}), 400
+    
+    params, error = check_quick_update(data, date.today().isoformat())
+    if error:
+        message, code = error
+        return jsonify({'success': False, 'error': message, 'code': code}), 400
+    order_number, new_status, action_date, notes = params
+    
+    conn = get_db()
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'success': False, 'error': '無效的請求數據'}), 400
-            
-        order_number = data.get('order_number')
-        action = data.get('action')
-        action_date = data.get('date', date.today().isoformat())
-        notes = data.get('notes', '')
-        
-        if not order_number or not action:
-            return jsonify({'success': False, 'error': '缺少必要參數'}), 400
-        
-        # 状态映射（统一使用 status_definitions.py 中的 QUICK_ACTIONS_MAP）
-        # 返回的是 key，直接存入数据库
-        status_map = QUICK_ACTIONS_MAP.copy()
-        
-        # 兼容旧版本（保留，但建议逐步迁移）
-        status_map.update({
-            'quote_to_order': STATUS_KEYS['NEW_ORDER'],
-            'quote_complete': STATUS_KEYS['COMPLETED'],
-            'draft_sent': STATUS_KEYS['DRAFT_CONFIRMING'],
-            'draft_revise': STATUS_KEYS['DRAFT_REVISING'],
-            'draft_modified': STATUS_KEYS['DRAFT_CONFIRMING'],
-            'sample_start': STATUS_KEYS['SAMPLING'],
-            'sample_done': STATUS_KEYS['SAMPLE_CONFIRMING'],
-            'sample_confirm': STATUS_KEYS['PENDING_PRODUCTION'],
-            'sample_revise': STATUS_KEYS['SAMPLE_REVISING'],
-            'sample_modified': STATUS_KEYS['SAMPLE_CONFIRMING'],
-            'complete': STATUS_KEYS['COMPLETED']
-        })
-        
-        new_status = status_map.get(action)  # 返回 key
-        if not new_status:
-            return jsonify({'success': False, 'error': f'无效的操作：{action}'}), 400
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM orders WHERE order_number = ?', (order_number,))
-        order = cursor.fetchone()
-        
+        order = conn.execute(
+            'SELECT id, current_status FROM orders WHERE order_number = ?', (order_number,)
+        ).fetchone()
         if not order:
             conn.close()
-            return jsonify({'success': False, 'error': '訂單不存在'}), 404
+            return jsonify({'success': False, 'error': '訂單不存在', 'code': 'ORDER_NOT_FOUND'}), 404
         
-        order = dict(order)
         old_status = order['current_status']
-        
-        # 特殊處理：詢價轉為訂單
-        if action == 'quote_to_order':
-            conn.close()
-            return jsonify({'success': False, 'error': '請使用轉為訂單功能'}), 400
-        
-        # 獲取操作者
-        operator = 'system'
-        if hasattr(g, 'current_user') and g.current_user:
-            operator = g.current_user.get('username', 'system')
-        
-        # 記錄狀態變更
-        cursor.execute('''
-            INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            order['id'],
-            order_number,
-            old_status,
-            new_status,
-            action_date,
-            operator,
-            notes
-        ))
-        
-        # 更新訂單
-        cursor.execute('''
-            UPDATE orders 
-            SET current_status = ?,
-                last_status_change_date = ?,
-                status_days = 0,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE order_number = ?
-        ''', (new_status, action_date, order_number))
-        
-        # 更新燈號
-        update_status_light(order['id'], conn)
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'message': f'訂單已更新為「{new_status}」',
-            'data': {
-                'order_number': order_number,
-                'old_status': old_status,
-                'new_status': new_status,
-                'action_date': action_date
-            }
-        })
-        
+        operator = g.current_user.get('username', 'system')
+        write_quick_updates(conn, [(order['id'], order_number, old_status, new_status, action_date, notes)], operator)
+        publish_order_changed('quick_update', [order_number], new_status=new_status)
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"API Error: {error_detail}")  # 打印到控制台
-        
-        if 'conn' in locals():
-            conn.close()
-            
-        return jsonify({
-            'success': False,
-            'error': f'更新失敗：{str(e)}'
-        }), 500
+        conn.rollback()
+        conn.close()
+        return jsonify({'success': False, 'error': f'更新失敗：{e}', 'code': 'DATABASE_ERROR'}), 500
+    conn.close()
+    
+    return jsonify({
+        'success': True,
+        'message': f'訂單已更新為「{new_status}」',
+        'data': {
+            'order_number': order_number,
+            'old_status': old_status,
+            'new_status': new_status,
+            'action_date': action_date
+        }
+    })
 
 
 @tracking_bp.route('/api/revisions', methods=['GET'])
@@ -986,22 +1309,91 @@ def api_search_customers():
     if not query or len(query) < 1:
         return jsonify({'success': True, 'data': []})
     
+    # 進程內索引（前綴 + n-gram，按訂單數排序），不再每次按鍵查數據庫
     conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT DISTINCT customer_name 
-        FROM orders 
-        WHERE customer_name LIKE ?
-        ORDER BY customer_name
-        LIMIT 10
-    ''', (f'%{query}%',))
-    
-    customers = [row['customer_name'] for row in cursor.fetchall()]
+    customers = search_customers(conn, query, limit=10)
     conn.close()
     
     return jsonify({'success': True, 'data': customers})
 
+@tracking_bp.route('/api/orders/quick-update/batch', methods=['POST'])
+@api_admin_required
+def api_quick_update_batch():
+    """
+    批量快速更新API：{"items": [{"order_number", "action", "date", "notes"}, ...]}（也接受直接傳列表）
+    每一項的校驗（check_quick_update）和寫入（write_quick_updates）與 /api/orders/quick-update 共用；
+    不合法的項跳過並在 results 中返回原因，其餘各項在同一個事務中寫入並提交
+    同一訂單出現多次時按順序依次轉移
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'items 必須是非空列表', 'code': 'INVALID_ITEMS'}), 400
+    if len(items) > QUICK_UPDATE_BATCH_MAX:
+        return jsonify({'success': False, 'error': f'每次最多 {QUICK_UPDATE_BATCH_MAX} 項',
+                        'code': 'TOO_MANY_ITEMS'}), 400
+    
+    operator = g.current_user.get('username', 'system')
+    today_str = date.today().isoformat()
+    
+    conn = get_db()
+    numbers = list({item.get('order_number') for item in items
+                    if isinstance(item, dict) and isinstance(item.get('order_number'), str)})
+    orders = {}
+    if numbers:
+        placeholders = ', '.join(['?'] * len(numbers))
+        for row in conn.execute(f'''
+            SELECT id, order_number, current_status FROM orders WHERE order_number IN ({placeholders})
+        ''', numbers):
+            orders[row['order_number']] = {'id': row['id'], 'status': row['current_status']}
+    
+    results = []
+    updates = []
+    
+    for item in items:
+        params, error = check_quick_update(item, today_str)
+        if error is None:
+            order_number, new_status, action_date, notes = params
+            order = orders.get(order_number)
+            if order is None:
+                error = ('訂單不存在', 'ORDER_NOT_FOUND')
+        if error:
+            message, code = error
+            results.append({'order_number': item.get('order_number') if isinstance(item, dict) else None,
+                            'success': False, 'error': message, 'code': code})
+            continue
+        
+        old_status = order['status']
+        order['status'] = new_status
+        updates.append((order['id'], order_number, old_status, new_status, action_date, notes))
+        results.append({
+            'order_number': order_number,
+            'success': True,
+            'old_status': old_status,
+            'new_status': new_status,
+            'action_date': action_date
+        })
+    
+    if updates:
+        try:
+            write_quick_updates(conn, updates, operator)
+            publish_order_changed('quick_update_batch', list(dict.fromkeys(
+                result['order_number'] for result in results if result['success'])))
+        except Exception as e:
+            conn.rollback()
+            conn.close()
+            return jsonify({'success': False, 'error': f'更新失敗：{e}', 'code': 'DATABASE_ERROR'}), 500
+    conn.close()
+    
+    updated = len(updates)
+    return jsonify({
+        'success': True,
+        'message': f'已更新 {updated} 項，失敗 {len(items) - updated} 項',
+        'updated': updated,
+        'failed': len(items) - updated,
+        'results': results
+    })
+
 @tracking_bp.route('/api/orders/<order_number>/status', methods=['POST'])
 @api_admin_required
 def api_update_order_status(order_number):
@@ -1050,6 +1442,7 @@ def api_update_order_status(order_number):
             operator,
             notes
         ))
+        record_milestone(conn, order['id'], new_status, action_date)
         
         # 更新訂單
         cursor.execute('''
@@ -1070,6 +1463,7 @@ def api_update_order_status(order_number):
         ''', ('status_update', order_number, old_status, new_status, operator, notes))
         
         conn.commit()
+        publish_order_changed('status_update', [order_number], new_status=new_status)
         conn.close()
         
         return jsonify({
@@ -1110,32 +1504,15 @@ def api_check_order_number():
         'message': '訂單號已存在' if exists else '訂單號可用'
     })
 
-@tracking_bp.route('/api/orders/next-quote-number', methods=['GET'])
+@tracking_bp.route('/api/orders/next-quote-number', methods=['POST'])
 @login_required
 def api_next_quote_number():
-    """獲取下一個詢價編號"""
+    """
+    預留下一個詢價編號：新建訂單時帶上 reserved_number 即使用這個編號
+    （不是猜測，其他人同時新建也不會拿到同一個號碼；放棄新建時釋放，號碼留給下一次新建）
+    """
     conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT order_number 
-        FROM orders 
-        WHERE order_number LIKE 'YU%'
-        ORDER BY order_number DESC
-        LIMIT 1
-    ''')
-    
-    last_order = cursor.fetchone()
-    if last_order and last_order['order_number'].startswith('YU'):
-        try:
-            last_num = int(last_order['order_number'].replace('YU', ''))
-            next_num = last_num + 1
-        except:
-            next_num = 1
-    else:
-        next_num = 1
-    
-    next_number = f'KC{next_num:05d}'
+    next_number = reserve_quote_number(conn, session.get('username'))
     conn.close()
     
     return jsonify({
@@ -1143,51 +1520,114 @@ def api_next_quote_number():
         'next_number': next_number
     })
 
-@tracking_bp.route('/api/stats', methods=['GET'])
-@api_login_required
-def api_stats():
-    """獲取統計數據API"""
+@tracking_bp.route('/api/orders/next-quote-number/<number>', methods=['DELETE'])
+@login_required
+def api_release_quote_number(number):
+    """釋放本人預留的詢價編號（新建訂單對話框取消時調用；已使用或不是本人預留的不受影響）"""
     conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) as total FROM orders')
-    total = cursor.fetchone()['total']
-    
-    # 兼容旧数据：同时查询 key 和中文
-    completed_key, completed_label = get_status_for_query(STATUS_KEYS['COMPLETED'])
-    cancelled_key, cancelled_label = get_status_for_query(STATUS_KEYS['CANCELLED'])
-    
-    cursor.execute('SELECT COUNT(*) as count FROM orders WHERE current_status NOT IN (?, ?, ?, ?)', 
-                   (completed_key, completed_label, cancelled_key, cancelled_label))
-    active = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(*) as count FROM orders WHERE status_light = "red" AND current_status NOT IN (?, ?, ?, ?)', 
-                   (completed_key, completed_label, cancelled_key, cancelled_label))
-    red = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(*) as count FROM orders WHERE status_light = "yellow" AND current_status NOT IN (?, ?, ?, ?)', 
-                   (completed_key, completed_label, cancelled_key, cancelled_label))
-    yellow = cursor.fetchone()['count']
-    
-    cursor.execute('SELECT COUNT(*) as count FROM orders WHERE status_light = "green" AND current_status NOT IN (?, ?, ?, ?)', 
-                   (completed_key, completed_label, cancelled_key, cancelled_label))
-    green = cursor.fetchone()['count']
-    
+    released = release_quote_number(conn, number, session.get('username'))
     conn.close()
     
     return jsonify({
         'success': True,
-        'data': {
-            'total': total,
-            'active': active,
-            'lights': {
-                'red': red,
-                'yellow': yellow,
-                'green': green
-            }
-        }
+        'released': released
     })
 
+def board_stats_data(breakdowns=()):
+    """/api/stats 和推送的 stats-changed 事件共用的統計數據"""
+    conn = get_db()
+    stats = get_order_stats(conn, breakdowns)
+    conn.close()
+    
+    data = {
+        'total': stats['total'],
+        'active': stats['active'],
+        'lights': stats['lights'],
+        'statuses': stats['statuses'],
+        'groups': stats['groups']
+    }
+    for name in breakdowns:
+        data[f'by_{name}'] = stats[f'by_{name}']
+    return data
+
+# 推送的 stats-changed 在 fan-out 線程中計算（沒有請求上下文，取池化連接）
+order_events.stats_provider = board_stats_data
+
+@tracking_bp.route('/api/stats', methods=['GET'])
+@api_login_required
+@conditional_get
+def api_stats():
+    """
+    獲取統計數據API（與首頁計數共用一次 GROUP BY）
+    breakdown=factory,customer 時附帶按工廠 / 客戶的分組計數
+    """
+    breakdowns = [b for b in request.args.get('breakdown', '').split(',') if b]
+    unknown = [b for b in breakdowns if b not in STATS_BREAKDOWNS]
+    if unknown:
+        return jsonify({'success': False, 'error': f'未知的統計維度: {", ".join(unknown)}',
+                        'code': 'INVALID_BREAKDOWN'}), 400
+    
+    return jsonify({'success': True, 'data': board_stats_data(breakdowns)})
+
+@tracking_bp.route('/api/events', methods=['GET'])
+@api_login_required
+def api_events():
+    """
+    看板推送（Server-Sent Events）：order-changed（data.order_numbers 為變化的訂單號）、stats-changed（同 /api/stats）、
+    resync（緩衝區溢出，客戶端應整頁重新加載）；沒有事件時每 SSE_HEARTBEAT_INTERVAL 秒發一次註釋行作為心跳
+    """
+    subscriber = order_events.subscribe()
+    if subscriber is None:
+        return jsonify({'success': False, 'error': '推送連接數已滿', 'code': 'TOO_MANY_SUBSCRIBERS'}), 503
+    
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                events = subscriber.wait(SSE_HEARTBEAT_INTERVAL)
+                if not events:
+                    yield ': keepalive\n\n'
+                    continue
+                for event, data in events:
+                    yield format_sse(event, data)
+        finally:
+            # 客戶端斷開時（生成器被關閉）退訂
+            order_events.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@tracking_bp.route('/api/admin/db-stats', methods=['GET'])
+@api_admin_required
+def api_db_stats():
+    """數據庫連接池統計（命中/未命中）"""
+    return jsonify({'success': True, 'data': {'pool': get_pool_stats()}})
+
+@tracking_bp.route('/api/admin/refresh-lights', methods=['POST'])
+@api_admin_required
+def api_refresh_lights():
+    """
+    批量重算訂單燈號（返回各顏色的變更數）
+    sweep=1 時只重算 next_light_change_date 已到期的訂單
+    """
+    sweep = request.args.get('sweep', '0').lower() in ('1', 'true', 'yes')
+    conn = get_db()
+    stats = sweep_status_lights(conn) if sweep else refresh_all_status_lights(conn)
+    conn.close()
+    return jsonify({'success': True, 'data': stats})
+
+@tracking_bp.route('/api/admin/order-counters', methods=['GET', 'POST'])
+@api_admin_required
+def api_order_counters():
+    """
+    看板計數表一致性檢查（GET 只報告偏差）
+    POST 時有偏差則重算燈號並重建計數表
+    """
+    conn = get_db()
+    report = check_order_counters(conn, repair=request.method == 'POST')
+    conn.close()
+    return jsonify({'success': True, 'data': report})
+
 @tracking_bp.route('/api/orders/<order_number>/undo-last-step', methods=['POST'])
 @api_admin_required
 def api_undo_last_step(order_number):
@@ -1241,6 +1681,7 @@ def api_undo_last_step(order_number):
     
     # 5. 硬刪除最後一步
     cursor.execute('DELETE FROM status_history WHERE id = ?', (last_step['id'],))
+    refresh_milestone(conn, last_step['order_id'], last_step['to_status'])
     
     # 6. 恢復訂單到上一個狀態
     cursor.execute('''
@@ -1256,6 +1697,7 @@ def api_undo_last_step(order_number):
     update_status_light(order['id'], conn)
     
     conn.commit()
+    publish_order_changed('undo', [order_number])
     conn.close()
     
     return jsonify({
@@ -1298,6 +1740,7 @@ def api_update_history(order_number, history_id):
         SET action_date = ?, notes = ?
         WHERE id = ?
     ''', (action_date, notes, history_id))
+    refresh_milestone(conn, history_record['order_id'], history_record['to_status'])
     
     # 檢查這是否是最後一條歷史記錄（當前狀態）
     cursor.execute('''
@@ -1336,6 +1779,7 @@ def api_update_history(order_number, history_id):
     ))
     
     conn.commit()
+    publish_order_changed('history_update', [order_number])
     conn.close()
     
     return jsonify({
@@ -1412,11 +1856,15 @@ def api_update_order(order_number):
         # 构建并执行更新语句
         update_sql = f'UPDATE orders SET {", ".join(update_fields)} WHERE order_number = ?'
         cursor.execute(update_sql, update_values)
+        update_search_key(conn, order['id'])
         
         # 更新燈號
         update_status_light(order['id'], conn)
         
         conn.commit()
+        if 'customer_name' in data:
+            customer_index.order_renamed(order['customer_name'], data['customer_name'])
+        publish_order_changed('update', [order_number])
         conn.close()
         
         return jsonify({
@@ -1499,6 +1947,7 @@ def api_change_order_number(order_number):
                 data.get('notes', ''),
                 order_number
             ))
+            update_search_key(conn, order['id'])
             
             # 2. 更新 status_history 表
             cursor.execute('''
@@ -1533,6 +1982,8 @@ def api_change_order_number(order_number):
             update_status_light(order['id'], conn)
             
             conn.commit()
+            customer_index.order_renamed(order['customer_name'], data.get('customer_name'))
+            publish_order_changed('change_number', [new_order_number], old_order_number=order_number)
             conn.close()
             
             return jsonify({
@@ -1612,13 +2063,17 @@ def api_delete_order(order_number):
         cursor.execute('DELETE FROM images WHERE item_type = ? AND item_id = ?', 
                       ('order', order['id']))
         
-        # 刪除狀態歷史
+        # 刪除狀態歷史和里程碑
         cursor.execute('DELETE FROM status_history WHERE order_number = ?', (order_number,))
+        cursor.execute('DELETE FROM order_milestones WHERE order_id = ?', (order['id'],))
         
-        # 刪除訂單
+        # 刪除訂單（觸發器記錄到 order_changes，增量同步時返回在 deleted 中）
         cursor.execute('DELETE FROM orders WHERE order_number = ?', (order_number,))
+        prune_order_changes(conn)
         
         conn.commit()
+        customer_index.order_removed(order['customer_name'])
+        publish_order_changed('delete', [order_number], deleted=True)
         conn.close()
         
         return jsonify({
@@ -1641,36 +2096,26 @@ def api_delete_order(order_number):
 
 @tracking_bp.route('/api/search', methods=['GET'])
 @login_required
+@conditional_get
 def api_global_search():
-    """全局搜索API - 搜索所有状态的订单"""
+    """全局搜索API - 搜索所有状态的订单（fields 逗號分隔的列名，默認看板卡片的列）"""
     keyword = request.args.get('q', '').strip()
+    fields, error = parse_fields(BOARD_CARD_FIELDS)
+    if error:
+        return error
     
     conn = get_db()
     cursor = conn.cursor()
     
     try:
         if keyword:
-            # 有关键字：搜索匹配的订单
-            cursor.execute('''
-                SELECT * FROM orders 
-                WHERE order_number LIKE ? OR customer_name LIKE ?
-                ORDER BY order_date DESC 
-                LIMIT 100
-            ''', (f'%{keyword}%', f'%{keyword}%'))
-            
-            orders = cursor.fetchall()
-            
-            # 转换为字典列表
-            orders_list = []
-            for order in orders:
-                order_dict = dict(order)
-                # 更新灯号
-                order_dict['status_light'] = calculate_status_light(order)
-                orders_list.append(order_dict)
+            # 有关键字：全文索引搜索匹配的订单（按 bm25 相关度排序）
+            # 灯号和天数由 orders_live 视图在 SQL 中计算
+            orders_list = search_orders(conn, keyword, source=ORDERS_LIVE_VIEW, limit=100, fields=fields)
             
             conn.close()
             
-            return jsonify({
+            return json_response({
                 'success': True,
                 'type': 'search',
                 'keyword': keyword,
@@ -1680,25 +2125,17 @@ def api_global_search():
             })
         else:
             # 无关键字：返回最近250条（所有状态）
-            cursor.execute('''
-                SELECT * FROM orders 
+            cursor.execute(f'''
+                SELECT {order_columns(fields)} FROM {ORDERS_LIVE_VIEW}
                 ORDER BY order_date DESC 
                 LIMIT 250
             ''')
             
-            orders = cursor.fetchall()
-            
-            # 转换为字典列表
-            orders_list = []
-            for order in orders:
-                order_dict = dict(order)
-                # 更新灯号
-                order_dict['status_light'] = calculate_status_light(order)
-                orders_list.append(order_dict)
+            orders_list = cursor.fetchall()
             
             conn.close()
             
-            return jsonify({
+            return json_response({
                 'success': True,
                 'type': 'recent',
                 'orders': orders_list,
@@ -1812,8 +2249,7 @@ def create_user_api():
         return jsonify({'success': False, 'error': '用戶名已存在'}), 400
     
     # 創建用戶
-    from werkzeug.security import generate_password_hash
-    password_hash = generate_password_hash(data['password'])
+    password_hash = hash_password(data['password'])
     
     cursor.execute('''
         INSERT INTO users (username, password_hash, display_name, real_name, role)
@@ -1890,6 +2326,7 @@ def update_user_api(user_id):
         params.append(user_id)
         cursor.execute(query, params)
         conn.commit()
+        user_status_cache.invalidate(user_id)
     
     conn.close()
     return jsonify({'success': True, 'message': '用戶資料已更新'})
@@ -1911,8 +2348,7 @@ def reset_user_password_api(user_id):
             conn.close()
             return jsonify({'success': False, 'error': '密碼至少6位'}), 400
         
-        from werkzeug.security import generate_password_hash
-        password_hash = generate_password_hash(new_password)
+        password_hash = hash_password(new_password)
         cursor.execute('''
             UPDATE users 
             SET password_hash = ?, needs_password_reset = 0 
@@ -1956,8 +2392,7 @@ def register_api():
         return jsonify({'success': False, 'error': '用戶名已存在'}), 400
     
     # 創建用戶（狀態為 pending，等待審核）
-    from werkzeug.security import generate_password_hash
-    password_hash = generate_password_hash(data['password'])
+    password_hash = hash_password(data['password'])
     
     cursor.execute('''
         INSERT INTO users (username, password_hash, display_name, real_name, role, status)
@@ -2057,6 +2492,7 @@ def approve_user_api(user_id):
     ''', (role, user_id))
     
     conn.commit()
+    user_status_cache.invalidate(user_id)
     conn.close()
     
     return jsonify({'success': True, 'message': '用戶審核通過'})
@@ -2089,10 +2525,10 @@ def reject_user_api(user_id):
         return jsonify({'success': False, 'error': '該用戶已經是拒絕狀態'}), 400
     
     # 更新用戶狀態為 rejected
-    cursor.execute('UPDATE users SET status = ? WHERE id = ?', ('suspended', user_id))
-
+    cursor.execute('UPDATE users SET status = ? WHERE id = ?', ('rejected', user_id))
     
     conn.commit()
+    user_status_cache.invalidate(user_id)
     conn.close()
     
     return jsonify({'success': True, 'message': '用戶狀態已設為拒絕'})
@@ -2121,8 +2557,9 @@ def suspend_user_api(user_id):
         return jsonify({'success': False, 'error': '用戶不存在'}), 404
     
     cursor.execute('UPDATE users SET status = ? WHERE id = ?', ('suspended', user_id))
-
+    
     conn.commit()
+    user_status_cache.invalidate(user_id)
     conn.close()
     
     return jsonify({'success': True, 'message': '用戶已停權'})
@@ -2143,6 +2580,7 @@ def restore_user_api(user_id):
     
     cursor.execute('UPDATE users SET status = ? WHERE id = ?', ('active', user_id))
     conn.commit()
+    user_status_cache.invalidate(user_id)
     conn.close()
     
     return jsonify({'success': True, 'message': '用戶已恢復'})
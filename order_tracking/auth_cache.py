@@ -0,0 +1,109 @@
+"""
+訂單流程追蹤系統 - 登入驗證緩存
+- 已驗證的 JWT：以 Token 的 SHA-256 為鍵的有界 LRU，到 exp 自動失效，同一個 Token 不用每次重新驗簽
+- 用戶狀態（active / pending / rejected / suspended）：每個 API 請求都要檢查，進程內緩存
+  USER_STATUS_CACHE_TTL 秒；本進程內審核 / 拒絕 / 停權 / 恢復時立即失效
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .config import JWT_CACHE_SIZE, USER_STATUS_CACHE_TTL
+from .db import pool
+
+
+class TokenCache:
+    """已驗證 Token 的 LRU 緩存（線程安全）"""
+
+    def __init__(self, max_size=JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # Token 摘要 -> (claims, exp)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token):
+        # 不保存 Token 原文
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        """已驗證且未過期的 claims，沒有時返回 None"""
+        if not self.max_size:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, exp = entry
+                if exp is None or exp > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        """緩存驗證通過的 claims（只在 jwt.decode 成功之後調用）"""
+        if not self.max_size:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, claims.get('exp'))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class UserStatusCache:
+    """用戶狀態緩存（線程安全）；用戶不存在時狀態為 None"""
+
+    def __init__(self, ttl=USER_STATUS_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}    # (數據庫路徑, 用戶 id) -> (狀態, 載入時間)
+        self._generation = 0  # 每次失效加一：查詢期間發生的失效不會被舊結果覆蓋
+
+    def get(self, conn, user_id):
+        key = (pool.database_path, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            generation = self._generation
+        try:
+            row = conn.execute('SELECT status FROM users WHERE id = ?', (user_id,)).fetchone()
+            status = None if row is None else (row['status'] or 'active')
+        except sqlite3.OperationalError:
+            # 舊數據庫沒有 status 欄位（未執行 migrate_db）：與登入時的兼容處理一致
+            row = conn.execute('SELECT id FROM users WHERE id = ?', (user_id,)).fetchone()
+            status = None if row is None else 'active'
+        with self._lock:
+            if self._generation == generation:
+                self._entries[key] = (status, time.monotonic())
+        return status
+
+    def invalidate(self, user_id=None):
+        """修改用戶狀態並提交之後調用；不指定用戶時清空全部"""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((pool.database_path, user_id), None)
+
+
+token_cache = TokenCache()
+user_status_cache = UserStatusCache()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+"""
+訂單階段里程碑回填腳本
+從 status_history 全量重建 order_milestones（可重複執行）
+用法：python backfill_milestones.py
+"""
+import sys
+from pathlib import Path
+
+# 添加項目根目錄到路徑
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from order_tracking.models import init_db, backfill_order_milestones
+
+if __name__ == '__main__':
+    print("確保表結構存在...")
+    init_db()
+    print("開始回填里程碑...")
+    count = backfill_order_milestones()
+    print(f"\n回填完成！共 {count} 條里程碑記錄")
@@ -0,0 +1,53 @@
+"""
+訂單流程追蹤系統 - 響應壓縮
+藍圖的 after_request：JSON / HTML 響應超過 COMPRESS_MIN_SIZE 時按 Accept-Encoding 壓縮
+（br 優先，需要安裝 brotli；否則 gzip）；流式響應（SSE）、文件和 304 不處理
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    brotli = None
+    HAS_BROTLI = False
+
+from .config import RESPONSE_COMPRESSION, COMPRESS_MIN_SIZE, COMPRESS_MIMETYPES, GZIP_LEVEL, BROTLI_QUALITY
+
+
+def choose_encoding(accept_encodings):
+    """客戶端接受的壓縮方式，都不接受時返回 None"""
+    if HAS_BROTLI and accept_encodings.quality('br') > 0:
+        return 'br'
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """after_request 回調"""
+    if not RESPONSE_COMPRESSION or response.direct_passthrough or response.is_streamed:
+        return response
+    if response.status_code != 200 or response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -7,15 +7,106 @@ import os
 SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-change-in-production-2026'
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production-2026'
 JWT_EXPIRATION_DELTA = 7 * 24 * 60 * 60  # 7天
+JWT_CACHE_SIZE = 1024  # 進程內緩存的已驗證 Token 數（LRU），0 表示不緩存
+USER_STATUS_CACHE_TTL = 30  # 用戶狀態緩存秒數；本進程的停權 / 恢復即時生效，其他進程最多延遲這麼久
+
+# 登入保護（超過上限時在驗證密碼之前拒絕，0 表示不限制）
+LOGIN_USER_FAILURE_LIMIT = 5   # 同一用戶名在 LOGIN_USER_WINDOW 秒內最多失敗次數
+LOGIN_USER_WINDOW = 300
+LOGIN_IP_ATTEMPT_LIMIT = 30    # 同一 IP 在 LOGIN_IP_WINDOW 秒內最多嘗試次數
+LOGIN_IP_WINDOW = 60
+# 密碼哈希方法（werkzeug 格式，如 scrypt:32768:8:1、pbkdf2:sha256:600000）；舊參數的哈希在登入成功時重新計算
+PASSWORD_HASH_METHOD = os.environ.get('TRACKING_PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
 
 # 數據庫配置
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, 'data', 'tracking.db')
+DATABASE_PATH = os.environ.get('TRACKING_DATABASE_PATH') or os.path.join(BASE_DIR, 'data', 'tracking.db')
+
+# 連接池配置
+DB_POOL_SIZE = int(os.environ.get('TRACKING_DB_POOL_SIZE') or 8)  # 最多保留的空閒連接數
+
+# 每個新連接執行一次的 PRAGMA（按順序執行，journal_mode 必須在最前）
+SQLITE_PRAGMA_PROFILES = {
+    # 默認：WAL 模式，讀取不會被 quick-update 等寫入阻塞
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',    # WAL 下 NORMAL 已可保證一致性，只有斷電可能丟最後一筆
+        'busy_timeout': 5000,       # 遇到鎖時等待 5 秒，而不是立即報 database is locked
+        'cache_size': -20000,       # 負數單位為 KiB，約 20MB
+        'mmap_size': 268435456,     # 256MB
+        'temp_store': 'MEMORY'
+    },
+    # 舊行為：回滾日誌（僅用於對比測試或排查問題）
+    'rollback': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL'
+    }
+}
+SQLITE_PRAGMA_PROFILE = os.environ.get('TRACKING_SQLITE_PROFILE') or 'wal'
+SQLITE_PRAGMAS = SQLITE_PRAGMA_PROFILES[SQLITE_PRAGMA_PROFILE]
+
+# WAL 檢查點間隔（秒），0 表示只依賴 SQLite 的自動檢查點
+WAL_CHECKPOINT_INTERVAL = 300
 
 # 藍圖配置
 BLUEPRINT_NAME = 'tracking_bp'
 URL_PREFIX = '/tracking'
 
+# 分頁配置（/api/orders；limit 和 cursor 都不帶時不分頁）
+ORDERS_PAGE_SIZE = 100      # 帶 cursor 但未指定 limit 時的每頁筆數
+ORDERS_MAX_PAGE_SIZE = 500  # limit 上限
+
+# 批量快速更新（/api/orders/quick-update/batch）每次最多的項數
+QUICK_UPDATE_BATCH_MAX = 500
+
+# 增量同步（/api/orders/changes）：已刪除訂單的變更記錄保留天數，游標早於清理位置的客戶端需要全量重載
+ORDER_CHANGES_RETENTION_DAYS = 30
+
+# 看板推送（/api/events，Server-Sent Events）
+SSE_BUFFER_SIZE = 100          # 每個連接最多緩衝的事件數，超過時改發 resync
+SSE_HEARTBEAT_INTERVAL = 15    # 沒有事件時每隔多少秒發一次心跳（保持代理不斷開）
+SSE_MAX_SUBSCRIBERS = 200      # 每個進程最多的推送連接數
+
+# 響應壓縮（JSON / HTML，按 Accept-Encoding 選 br 或 gzip；br 需要安裝 brotli）
+RESPONSE_COMPRESSION = True
+COMPRESS_MIN_SIZE = 1024       # 小於此字節數的響應不壓縮
+COMPRESS_MIMETYPES = ('application/json', 'text/html')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# 訂單列表 / 搜索的 JSON 編碼器：auto（已安裝 orjson 時用 orjson）/ orjson / json（標準庫）
+JSON_ENCODER = os.environ.get('TRACKING_JSON_ENCODER') or 'auto'
+
+# 首頁渲染模式
+# full：一次把所有訂單渲染進頁面，前端篩選（舊行為）
+# paged：只渲染進行中訂單的第一頁和匯總計數，篩選時向 /orders/fragment 取服務端渲染的行
+INDEX_RENDER_MODE = os.environ.get('TRACKING_INDEX_MODE') or 'full'
+INDEX_PAGE_SIZE = 100  # paged 模式下每次渲染的行數
+
+# 看板讀取時在 SQL 中計算 status_light / status_days（orders_live 視圖），
+# 不依賴上次寫入時保存的值；設為 0 時讀取 orders 表中保存的值（可以用到排序索引）
+# 取捨（默認選正確性）：看板按燈號 / 天數排序，而這兩列在視圖中是算出來的，
+# 所以 keyset 分頁每一頁都要對篩選後的訂單排序一次（成本隨訂單數增長，不隨頁碼增長），用不到 idx_orders_board_sort；
+# 保存的值只在寫入、巡檢和全表重算時更新，過時時按它排序與實際燈號不一致，所以不能只按保存的列分頁。
+# 訂單量大到排序成為瓶頸時設為 0，並每天凌晨全表重算一次（update_status_light_fixed.py；--sweep 不更新天數）
+LIGHTS_AT_READ_TIME = (os.environ.get('TRACKING_LIGHTS_AT_READ_TIME') or '1') == '1'
+
+# 舊數據兼容：current_status 等字段可能還存著中文（簡體/繁體），狀態查詢要同時帶 key 和中文。
+# 用 migrate_status_keys.py 遷移並驗證完成後設為 0，查詢只用 key（狀態索引可以直接等值查找）
+LEGACY_STATUS_VALUES = (os.environ.get('TRACKING_LEGACY_STATUS_VALUES') or '1') == '1'
+
+# 訂單搜索使用 FTS5 trigram 全文索引（orders_fts）；SQLite 不支持或設為 0 時使用 LIKE
+SEARCH_USE_FTS = (os.environ.get('TRACKING_SEARCH_USE_FTS') or '1') == '1'
+
+# 客戶名稱自動完成的進程內索引多久全量重新載入一次（秒）；本進程的寫入會即時增量更新
+CUSTOMER_INDEX_TTL = 300
+
+# 詢價 / 修圖編號每個進程一次從序列表預取多少個（1 = 逐個分配，號碼連續且按時間遞增）
+SEQUENCE_BLOCK_SIZE = int(os.environ.get('TRACKING_SEQUENCE_BLOCK_SIZE') or 1)
+
+# 新增訂單時預留的詢價編號保留多久（秒）；過期未用（例如直接關閉了頁面）的號碼重新發放給之後的新建
+QUOTE_RESERVATION_TTL = 86400
+
 # ==================== 燈號規則配置（天數）====================
 # 核心原则：监控每个阶段的停留时间
 # 🟢 绿灯 = 正常进行中
@@ -115,6 +206,24 @@ LIGHT_RULES = {
 # 建议只监控每个阶段的停留时间，这样更准确
 # 等 models.py 更新后可以移除
 
+# 状态 key -> 使用的燈號規則（LIGHT_RULES 中的名稱）
+# 沒有列出的状态（已完成、已取消）始终绿灯
+# 注意：以下對應沿用原 calculate_status_light 的行为，
+# 例如报价待确认、图稿修改中用的是 draft_confirm 规则，生产中用的是 ready_production 规则
+STATUS_LIGHT_RULES = {
+    'NEW_ORDER': 'new_order',
+    'QUOTE_CONFIRMING': 'draft_confirm',
+    'DRAFT_MAKING': 'draft_confirm',
+    'DRAFT_CONFIRMING': 'draft_confirm',
+    'DRAFT_REVISING': 'draft_confirm',
+    'PENDING_SAMPLE': 'ready_sample',
+    'SAMPLING': 'sampling_process',
+    'SAMPLE_CONFIRMING': 'sampling_confirm',
+    'SAMPLE_REVISING': 'sampling_confirm',
+    'PENDING_PRODUCTION': 'ready_production',
+    'PRODUCING': 'ready_production',
+}
+
 # 上傳配置（預留）
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
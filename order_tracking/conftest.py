@@ -0,0 +1,59 @@
+"""
+測試共用夾具：每個測試一個臨時數據庫（連接池指向 tmp_path，結束後恢復），不會改動倉庫裡的 data/tracking.db；
+tracking_db 初始化表結構，client 是已登入管理員的測試客戶端
+"""
+import sys
+import os
+
+import pytest
+from flask import Flask
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking import tracking_bp
+from order_tracking.db import pool
+from order_tracking.models import init_db
+
+
+@pytest.fixture(autouse=True)
+def isolated_database(tmp_path):
+    """連接池指向臨時目錄中的空數據庫（直接調用 get_db 的測試也不會寫到默認數據庫）"""
+    saved_path = pool.database_path
+    path = str(tmp_path / 'tracking.db')
+    pool.reconfigure(database_path=path)
+    try:
+        yield path
+    finally:
+        pool.reconfigure(database_path=saved_path)
+
+
+@pytest.fixture
+def tracking_db(isolated_database):
+    """已初始化表結構的臨時數據庫，返回路徑"""
+    init_db()
+    return isolated_database
+
+
+@pytest.fixture
+def app(tracking_db):
+    """註冊了 tracking_bp 的測試應用"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(tracking_bp)
+    return app
+
+
+def login(client, user_id=1, username='admin', role='admin'):
+    """在測試客戶端的 session 中登入"""
+    with client.session_transaction() as s:
+        s['user_id'] = user_id
+        s['username'] = username
+        s['role'] = role
+    return client
+
+
+@pytest.fixture
+def client(app):
+    """已登入管理員的測試客戶端"""
+    return login(app.test_client())
@@ -0,0 +1,191 @@
+"""
+訂單流程追蹤系統 - 客戶名稱自動完成索引
+進程內保存去重後的客戶名稱和訂單數，按前綴（有序列表 + 二分查找）和 1~3 字 n-gram 查找，
+不用每次按鍵都查數據庫；新建 / 改名 / 刪除訂單時增量更新，超過 CUSTOMER_INDEX_TTL 秒重新載入
+（其他進程或腳本的寫入最多延遲這麼久）
+匹配不區分大小寫和全形/半形；安裝了 opencc / pypinyin 時也不區分繁簡，並可用拼音或首字母查找
+（見 search_keys.py）
+"""
+import bisect
+import threading
+import time
+
+from .config import CUSTOMER_INDEX_TTL
+from .db import pool
+from .search_keys import fold_text, text_variants
+
+# n-gram 最大長度：更長的關鍵字用各個 3-gram 的交集篩選候選，再逐個確認子串
+MAX_GRAM = 3
+
+
+def normalize_name(name):
+    """全形轉半形、大小寫折疊、繁轉簡，去掉首尾空白"""
+    return fold_text(name)
+
+
+def _grams(key):
+    for n in range(1, MAX_GRAM + 1):
+        for i in range(len(key) - n + 1):
+            yield key[i:i + n]
+
+
+class CustomerNameIndex:
+    """客戶名稱索引（線程安全）"""
+
+    def __init__(self, ttl=CUSTOMER_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_path = None
+        self._loaded_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._counts = {}    # 名稱 -> 訂單數
+        self._keys = {}      # 名稱 -> 各搜索形式（第一個是規範化後的名稱，其後是拼音）
+        self._sorted = []    # [(搜索形式, 名稱)]，按搜索形式排序，用於前綴查找
+        self._grams = {}     # n-gram -> {名稱}
+
+    # ---------- 載入 ----------
+
+    def load(self, conn):
+        """從 orders 全量載入"""
+        rows = conn.execute('''
+            SELECT customer_name, COUNT(*) AS count
+            FROM orders
+            WHERE customer_name IS NOT NULL AND customer_name != ''
+            GROUP BY customer_name
+        ''').fetchall()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(row['customer_name'], row['count'])
+            self._loaded_path = pool.database_path
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, conn):
+        """未載入、切換了數據庫或超過 TTL 時重新載入"""
+        with self._lock:
+            fresh = (self._loaded_path == pool.database_path and
+                     (not self.ttl or time.monotonic() - self._loaded_at < self.ttl))
+        if not fresh:
+            self.load(conn)
+
+    def invalidate(self):
+        """下次查詢時重新載入"""
+        with self._lock:
+            self._loaded_path = None
+
+    # ---------- 增量更新（在寫入提交之後調用）----------
+
+    def order_added(self, name):
+        self._apply(name, 1)
+
+    def order_removed(self, name):
+        self._apply(name, -1)
+
+    def order_renamed(self, old_name, new_name):
+        if old_name == new_name:
+            return
+        self._apply(old_name, -1)
+        self._apply(new_name, 1)
+
+    def _apply(self, name, delta):
+        if not name:
+            return
+        with self._lock:
+            # 還沒載入（或載入的是別的數據庫）時不用維護，下次查詢會全量載入
+            if self._loaded_path != pool.database_path:
+                return
+            if delta > 0:
+                self._add(name, delta)
+            else:
+                self._remove(name, -delta)
+
+    def _add(self, name, count):
+        if name in self._counts:
+            self._counts[name] += count
+            return
+        keys = tuple(text_variants(name)) or ('',)
+        self._counts[name] = count
+        self._keys[name] = keys
+        for key in keys:
+            bisect.insort(self._sorted, (key, name))
+        for gram in {g for key in keys for g in _grams(key)}:
+            self._grams.setdefault(gram, set()).add(name)
+
+    def _remove(self, name, count):
+        if name not in self._counts:
+            return
+        self._counts[name] -= count
+        if self._counts[name] > 0:
+            return
+        del self._counts[name]
+        keys = self._keys.pop(name)
+        for key in keys:
+            pos = bisect.bisect_left(self._sorted, (key, name))
+            if pos < len(self._sorted) and self._sorted[pos] == (key, name):
+                del self._sorted[pos]
+        for gram in {g for key in keys for g in _grams(key)}:
+            names = self._grams.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._grams[gram]
+
+    # ---------- 查詢 ----------
+
+    def search(self, query, limit=10):
+        """
+        包含 query 的客戶名稱：前綴匹配在前，其次按訂單數從多到少，最後按名稱
+        """
+        q = normalize_name(query)
+        if not q:
+            return []
+        with self._lock:
+            # 前綴匹配：有序列表上的一段連續區間
+            start = bisect.bisect_left(self._sorted, (q,))
+            prefix = []
+            for key, name in self._sorted[start:]:
+                if not key.startswith(q):
+                    break
+                prefix.append(name)
+            prefix = list(dict.fromkeys(prefix))
+
+            # 子串匹配：短關鍵字直接查 n-gram，長關鍵字取各 3-gram 的交集後確認
+            if len(q) <= MAX_GRAM:
+                candidates = self._grams.get(q, set())
+            else:
+                sets = [self._grams.get(q[i:i + MAX_GRAM]) for i in range(len(q) - MAX_GRAM + 1)]
+                if not all(sets):
+                    candidates = set()
+                else:
+                    sets.sort(key=len)
+                    candidates = {name for name in sets[0].intersection(*sets[1:])
+                                  if any(q in key for key in self._keys[name])}
+
+            prefix_set = set(prefix)
+            counts = self._counts
+            ranked = sorted(prefix, key=lambda n: (-counts[n], self._keys[n][0]))
+            if len(ranked) < limit:
+                rest = sorted((n for n in candidates if n not in prefix_set),
+                              key=lambda n: (-counts[n], self._keys[n][0]))
+                ranked.extend(rest)
+            return ranked[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'database_path': self._loaded_path,
+                'names': len(self._counts),
+                'grams': len(self._grams),
+                'age_seconds': round(time.monotonic() - self._loaded_at, 1) if self._loaded_path else None
+            }
+
+
+customer_index = CustomerNameIndex()
+
+
+def search_customers(conn, query, limit=10):
+    """自動完成入口：按需載入後在內存中查找"""
+    customer_index.ensure_loaded(conn)
+    return customer_index.search(query, limit)
@@ -0,0 +1,218 @@
+"""
+订单流程追踪系统 - 数据库连接管理
+每个请求绑定一个连接（flask.g），请求结束时归还到有界连接池
+"""
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import g, has_app_context
+
+from .config import DATABASE_PATH, DB_POOL_SIZE, SQLITE_PRAGMAS, WAL_CHECKPOINT_INTERVAL
+
+# flask.g 上保存请求连接的属性名
+_G_ATTR = '_tracking_db_conn'
+
+
+def apply_pragmas(conn, pragmas=None):
+    """在新连接上执行 PRAGMA 配置（每个物理连接只执行一次）"""
+    if pragmas is None:
+        pragmas = SQLITE_PRAGMAS
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+class PooledConnection:
+    """
+    连接池中的连接包装
+    行为与 sqlite3.Connection 一致，但 close() 是把连接归还到连接池，
+    这样现有的 conn = get_db() ... conn.close() 写法不需要修改
+    """
+
+    def __init__(self, pool, raw, request_bound=False):
+        self._pool = pool
+        self._raw = raw
+        self._request_bound = request_bound
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        # 请求内的连接由 teardown_appcontext 统一归还
+        if self._request_bound or self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        self._pool.release(raw)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self._raw.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+
+class ConnectionPool:
+    """有界 SQLite 连接池（最多保留 max_size 个空闲连接）"""
+
+    def __init__(self, database_path, max_size=DB_POOL_SIZE, pragmas=None,
+                 checkpoint_interval=WAL_CHECKPOINT_INTERVAL):
+        self.database_path = database_path
+        self.max_size = max_size
+        self.pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+        self.checkpoint_interval = checkpoint_interval
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.checkpoints = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def acquire(self):
+        """取出一个连接：池中有空闲连接算命中，否则新建"""
+        with self._lock:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+        return self._connect()
+
+    def release(self, conn):
+        """归还连接：未提交的事务回滚；池满则直接关闭"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close_quietly(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        self._close_quietly(conn)
+
+    def checkpoint(self, conn=None, mode='PASSIVE'):
+        """
+        执行 WAL 检查点，返回 (busy, wal 页数, 已写回页数)
+        PASSIVE 不会阻塞读写；需要截断 WAL 文件时用 TRUNCATE
+        """
+        own = conn is None
+        if own:
+            conn = self.acquire()
+        try:
+            row = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        finally:
+            if own:
+                self.release(conn)
+        with self._lock:
+            self._last_checkpoint = time.monotonic()
+            self.checkpoints += 1
+        return tuple(row)
+
+    def maybe_checkpoint(self, conn):
+        """距离上次检查点超过 checkpoint_interval 秒时，借用归还中的连接做一次 PASSIVE 检查点"""
+        if not self.checkpoint_interval:
+            return None
+        if str(self.pragmas.get('journal_mode', '')).upper() != 'WAL':
+            return None
+        with self._lock:
+            if time.monotonic() - self._last_checkpoint < self.checkpoint_interval:
+                return None
+            # 先占位，避免多个请求同时触发
+            self._last_checkpoint = time.monotonic()
+        try:
+            return self.checkpoint(conn)
+        except sqlite3.Error:
+            return None
+
+    def clear(self):
+        """关闭所有空闲连接（切换数据库路径或进程退出时使用）"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def reconfigure(self, database_path=None, max_size=None, pragmas=None):
+        """修改连接参数，已有的空闲连接会被关闭"""
+        self.clear()
+        if database_path is not None:
+            self.database_path = database_path
+        if max_size is not None:
+            self.max_size = max_size
+        if pragmas is not None:
+            self.pragmas = pragmas
+
+    def stats(self):
+        """连接池命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'database_path': self.database_path,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'checkpoints': self.checkpoints,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+pool = ConnectionPool(DATABASE_PATH)
+
+
+def get_connection():
+    """
+    获取数据库连接
+    - 在 Flask 请求/应用上下文内：同一上下文共用一个连接，teardown 时归还
+    - 在脚本中：每次取一个池化连接，conn.close() 时归还
+    """
+    if has_app_context():
+        conn = getattr(g, _G_ATTR, None)
+        if conn is None:
+            conn = PooledConnection(pool, pool.acquire(), request_bound=True)
+            setattr(g, _G_ATTR, conn)
+        return conn
+    return PooledConnection(pool, pool.acquire())
+
+
+def close_request_connection(exc=None):
+    """teardown_appcontext 回调：把请求连接归还到连接池"""
+    conn = g.pop(_G_ATTR, None)
+    if conn is None or conn._raw is None:
+        return
+    raw, conn._raw = conn._raw, None
+    if not raw.in_transaction:
+        pool.maybe_checkpoint(raw)
+    pool.release(raw)
+
+
+def checkpoint(mode='PASSIVE'):
+    """手动/定时任务调用的 WAL 检查点入口"""
+    return pool.checkpoint(mode=mode)
+
+
+def get_pool_stats():
+    """连接池命中/未命中计数"""
+    return pool.stats()
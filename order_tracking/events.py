@@ -0,0 +1,130 @@
+"""
+訂單流程追蹤系統 - 看板推送（Server-Sent Events）
+- 寫入訂單的 API 提交後 publish('order-changed', ...)，只是放進收件隊列，不阻塞請求
+- 一個後台線程（fan-out 循環）取出事件，每批 order-changed 之後統計一次看板計數（stats-changed），
+  再分發到每個訂閱者的有界緩衝區；閒置的連接只是在條件變量上等待，不佔 CPU
+- 訂閱者處理不過來（緩衝區滿）時清空緩衝區，改發一個 resync 事件，客戶端整頁重新加載
+- 只在本進程內分發：多進程部署時其他進程的寫入不會推送到本進程的連接
+"""
+import json
+import queue
+import threading
+from collections import deque
+
+from .config import SSE_BUFFER_SIZE, SSE_MAX_SUBSCRIBERS
+
+
+def format_sse(event, data):
+    """一個 SSE 消息（event + 單行 JSON data）"""
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n'
+
+
+class Subscriber:
+    """一個 SSE 連接的有界緩衝區"""
+
+    def __init__(self, buffer_size):
+        self.buffer_size = buffer_size
+        self._events = deque()
+        self._cond = threading.Condition()
+        self.overflowed = False
+        self.dropped = 0
+
+    def push(self, events):
+        """由 fan-out 線程調用；放不下時丟棄緩衝區，下一次 wait 返回 resync"""
+        with self._cond:
+            if len(self._events) + len(events) > self.buffer_size:
+                self.dropped += len(self._events) + len(events)
+                self._events.clear()
+                self.overflowed = True
+            else:
+                self._events.extend(events)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """等待事件，返回 [(event, data), ...]；超時返回空列表（調用方發心跳）"""
+        with self._cond:
+            if not self._events and not self.overflowed:
+                self._cond.wait(timeout)
+            if self.overflowed:
+                self.overflowed = False
+                self._events.clear()
+                return [('resync', {})]
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+
+class EventBroker:
+    """
+    進程內的事件分發
+    stats_provider：無參數的函數，返回 stats-changed 事件的數據（在 fan-out 線程中調用，每批只調用一次）
+    """
+
+    def __init__(self, buffer_size=SSE_BUFFER_SIZE, max_subscribers=SSE_MAX_SUBSCRIBERS, stats_provider=None):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.stats_provider = stats_provider
+        self._inbox = queue.SimpleQueue()
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.published = 0
+
+    def subscribe(self):
+        """新的訂閱者；超過 max_subscribers 時返回 None"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(self.buffer_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        """放進收件隊列（沒有訂閱者時直接丟棄）"""
+        if not self._subscribers:
+            return
+        self._ensure_thread()
+        self._inbox.put((event, data))
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='tracking-sse-fanout', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """阻塞取一個事件，再取走隊列裡已有的（合併成一批）"""
+        batch = [self._inbox.get()]
+        while True:
+            try:
+                batch.append(self._inbox.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            self.published += len(batch)
+            if self.stats_provider is not None and any(event == 'order-changed' for event, _ in batch):
+                try:
+                    batch.append(('stats-changed', self.stats_provider()))
+                except Exception as e:
+                    print(f"⚠️ 推送統計失敗: {e}")
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                subscriber.push(batch)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self.published,
+                    'dropped': sum(s.dropped for s in self._subscribers)}
+
+
+order_events = EventBroker()
@@ -0,0 +1,66 @@
+"""
+訂單流程追蹤系統 - 訂單列表的 JSON 響應
+- 列表直接放 sqlite3.Row：編碼器寫到這一行時才按列名展開（逐行生成、用完即丟），不先複製出整個 dict 列表
+- 編碼器可替換（JSON_ENCODER）：orjson（已安裝時默認）或標準庫 json；兩者輸出相同的數據
+- 中文輸出 UTF-8 原文（不轉義成 \\uXXXX），每字 3 字節而不是 6 字節
+- 日期 / Decimal 的格式與 Flask 的 jsonify 相同（HTTP 日期、字符串）
+"""
+import json
+import sqlite3
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from flask import current_app
+from werkzeug.http import http_date
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+from .config import JSON_ENCODER
+
+
+def _default(obj):
+    """兩種編碼器共用：sqlite3.Row 展開成對象，其餘與 Flask 的 DefaultJSONProvider 一致"""
+    if isinstance(obj, sqlite3.Row):
+        return dict(zip(obj.keys(), obj))
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (Decimal, uuid.UUID)):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _json_dumps(payload):
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_dumps(payload):
+    return orjson.dumps(payload, default=_default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS = {'json': _json_dumps}
+if HAS_ORJSON:
+    ENCODERS['orjson'] = _orjson_dumps
+
+
+def get_encoder(name=JSON_ENCODER):
+    """按名稱取編碼器（payload -> bytes）；auto 或未安裝的 orjson 退回可用的最快實現"""
+    if name in ENCODERS:
+        return ENCODERS[name]
+    return ENCODERS['orjson' if HAS_ORJSON else 'json']
+
+
+dumps = get_encoder()
+
+
+def json_response(payload, status=200):
+    """代替 jsonify 返回大列表（payload 中可以直接放 sqlite3.Row）"""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
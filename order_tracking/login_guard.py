@@ -0,0 +1,138 @@
+"""
+訂單流程追蹤系統 - 登入保護
+- 滑動窗口限流：同一用戶名的失敗次數、同一 IP 的嘗試次數超過上限時，在查庫和驗證密碼之前直接拒絕
+  （密碼哈希故意很慢，撞庫時每次嘗試都算一次哈希會佔滿 CPU）
+- 密碼哈希參數可配置（PASSWORD_HASH_METHOD）；舊參數的哈希在登入成功時自動按新參數重新計算
+計數保存在進程內：多進程部署時每個進程各自計數
+"""
+import functools
+import threading
+import time
+from collections import deque
+
+try:
+    from werkzeug.security import generate_password_hash, check_password_hash
+    HAS_WERKZEUG = True
+except ImportError:
+    # 如果沒有werkzeug，使用簡單的hash（僅開發環境）
+    def generate_password_hash(password, method=None):
+        return f"hash_{password}"
+
+    def check_password_hash(hashed, password):
+        return hashed == f"hash_{password}"
+    HAS_WERKZEUG = False
+
+from .config import (LOGIN_USER_FAILURE_LIMIT, LOGIN_USER_WINDOW, LOGIN_IP_ATTEMPT_LIMIT, LOGIN_IP_WINDOW,
+                     PASSWORD_HASH_METHOD)
+
+
+class SlidingWindowLimiter:
+    """每個鍵在最近 window 秒內最多 limit 次（limit 為 0 時不限制），線程安全"""
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._hits = {}    # 鍵 -> deque[時間]
+
+    def _prune(self, hits, now):
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+
+    def retry_after(self, key, now=None):
+        """已達上限時返回還需等待的秒數，否則返回 0"""
+        if not self.limit:
+            return 0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return 0
+            self._prune(hits, now)
+            if len(hits) < self.limit:
+                return 0
+            return max(1, int(hits[0] + self.window - now + 0.999))
+
+    def hit(self, key, now=None):
+        if not self.limit:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                if len(self._hits) >= self.max_keys:
+                    self._evict(now)
+                hits = self._hits[key] = deque()
+            self._prune(hits, now)
+            hits.append(now)
+            # 超過上限後的記錄沒有意義，只保留最近 limit 次
+            while len(hits) > self.limit:
+                hits.popleft()
+
+    def _evict(self, now):
+        # 鍵太多（大量不同的用戶名 / IP）時先清掉已過窗口的，仍然太多就清空
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - self.window]:
+            del self._hits[key]
+        if len(self._hits) >= self.max_keys:
+            self._hits.clear()
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._hits.clear()
+
+
+class LoginGuard:
+    """登入限流：用戶名按失敗次數，IP 按嘗試次數"""
+
+    def __init__(self, user_limit=LOGIN_USER_FAILURE_LIMIT, user_window=LOGIN_USER_WINDOW,
+                 ip_limit=LOGIN_IP_ATTEMPT_LIMIT, ip_window=LOGIN_IP_WINDOW):
+        self.users = SlidingWindowLimiter(user_limit, user_window)
+        self.ips = SlidingWindowLimiter(ip_limit, ip_window)
+
+    def check(self, username, ip, now=None):
+        """
+        每次登入嘗試先調用（記一次 IP 嘗試）
+        返回需要等待的秒數；0 表示可以繼續驗證密碼
+        """
+        wait = max(self.users.retry_after(username.casefold(), now), self.ips.retry_after(ip, now))
+        if wait:
+            return wait
+        self.ips.hit(ip, now)
+        return 0
+
+    def failed(self, username, now=None):
+        """用戶名不存在或密碼錯誤"""
+        self.users.hit(username.casefold(), now)
+
+    def succeeded(self, username):
+        self.users.reset(username.casefold())
+
+    def clear(self):
+        self.users.clear()
+        self.ips.clear()
+
+
+login_guard = LoginGuard()
+
+
+def hash_password(password):
+    """按當前配置的方法計算密碼哈希"""
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+@functools.lru_cache(maxsize=None)
+def _method_prefix(method):
+    # werkzeug 會補全省略的參數（scrypt -> scrypt:32768:8:1），以實際生成的哈希為準
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """哈希的方法 / 參數與當前配置不同（登入成功後應重新計算）"""
+    if not HAS_WERKZEUG or not password_hash:
+        return False
+    return password_hash.split('$', 1)[0] != _method_prefix(PASSWORD_HASH_METHOD)
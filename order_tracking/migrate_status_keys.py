@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+舊中文狀態值遷移腳本
+把 orders / status_history / audit_log 中存成中文（簡體/繁體/舊的"确认中"寫法）的狀態改成 key
+分段執行、每段單獨提交，可以在系統運行時執行；中斷後再次執行會從上次位置繼續
+
+用法：python migrate_status_keys.py [--chunk N] [--pause 秒] [--restart] [--verify]
+  --chunk N    每段處理的行數（默認 1000）
+  --pause 秒   每段之間休眠的秒數（默認 0）
+  --restart    忽略已記錄的進度，從頭開始
+  --verify     只做驗證，不遷移
+
+驗證通過後，設置環境變量 TRACKING_LEGACY_STATUS_VALUES=0，查詢不再同時帶中文
+"""
+import sys
+import time
+from pathlib import Path
+
+# 添加項目根目錄到路徑
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir.parent))
+
+from order_tracking.models import init_db, migrate_status_values, verify_status_migration
+
+
+def arg_value(name, default, cast):
+    if name in sys.argv:
+        return cast(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+
+def print_progress(table, last_id, max_id, updated):
+    percent = min(100.0, last_id * 100.0 / max_id) if max_id else 100.0
+    print(f"  {table:<16} id {last_id:>10} / {max_id:<10} {percent:6.1f}%  已更新 {updated}")
+
+
+def print_verification(report):
+    print("\n驗證結果：")
+    if report['complete']:
+        print("[OK] 沒有剩餘的中文狀態值")
+    for field, values in report['legacy'].items():
+        print(f"[WARN] {field} 仍有中文狀態: " + ', '.join(f'{v}({c})' for v, c in values.items()))
+    for field, values in report['unknown'].items():
+        print(f"[WARN] {field} 有無法識別的狀態（需人工處理）: " + ', '.join(f'{v}({c})' for v, c in values.items()))
+
+
+if __name__ == '__main__':
+    init_db()
+    if '--verify' not in sys.argv:
+        chunk = arg_value('--chunk', 1000, int)
+        pause = arg_value('--pause', 0, float)
+        print(f"開始遷移狀態值（每段 {chunk} 行）...")
+        start = time.perf_counter()
+        result = migrate_status_values(chunk_size=chunk, restart='--restart' in sys.argv,
+                                       pause=pause, progress=print_progress)
+        for table, stats in result.items():
+            print(f"{table}: 本次更新 {stats['updated']} 行{'（已完成）' if stats['finished'] else ''}")
+        print(f"耗時: {time.perf_counter() - start:.2f} 秒")
+
+    report = verify_status_migration()
+    print_verification(report)
+    if report['complete']:
+        print("\n可以設置 TRACKING_LEGACY_STATUS_VALUES=0 關閉中文狀態兼容查詢")
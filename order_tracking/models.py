@@ -3,7 +3,10 @@
 """
 import sqlite3
 import os
-from datetime import datetime, date
+import functools
+import threading
+import time
+from datetime import datetime, date, timedelta
 try:
     from werkzeug.security import generate_password_hash
 except ImportError:
@@ -11,26 +14,40 @@ except ImportError:
     def generate_password_hash(password):
         return f"hash_{password}"
 
-from .config import DATABASE_PATH, LIGHT_RULES
+from .config import (LIGHT_RULES, STATUS_LIGHT_RULES, LIGHTS_AT_READ_TIME, SEARCH_USE_FTS,
+                     SEQUENCE_BLOCK_SIZE, QUOTE_RESERVATION_TTL, ORDER_CHANGES_RETENTION_DAYS)
+from .db import get_connection, pool
 from .status_config import STATUS  # 向后兼容：简体中文
-from .status_definitions import STATUS_KEYS, get_status_label
+from .status_definitions import STATUS_KEYS, STATUS_LABEL_TO_KEY, get_status_label
+from .search_keys import build_search_key, fold_query
 
 # 数据库默认状态值（使用 key）
 DEFAULT_STATUS = STATUS_KEYS['NEW_ORDER']
 
+# 本进程中已执行过 init_db 的数据库路径（脚本直接打开旧数据库时自动补齐表结构）
+_schema_ready = set()
+_schema_lock = threading.RLock()
+
 def get_db():
-    """获取数据库连接"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    获取数据库连接（连接池）
+    请求内多次调用返回同一个连接；conn.close() 只是归还，不会真正断开
+    每个数据库路径第一次取连接时会先执行一次 init_db（升级旧数据库的表结构）
+    """
+    if pool.database_path not in _schema_ready:
+        with _schema_lock:
+            if pool.database_path not in _schema_ready:
+                init_db()
+    return get_connection()
 
 def init_db():
-    """初始化数据库"""
-    conn = get_db()
+    """初始化数据库（全部成功後才把該路徑標記為已初始化，中途出錯時下次 get_db 會重試）"""
+    database_path = pool.database_path
+    conn = get_connection()
     cursor = conn.cursor()
     
-    # 使用 STATUS 配置中的默认状态（与 STATUS_SYSTEM.js 保持一致）
-    default_status = STATUS['NEW_ORDER']
+    # 新建的數據庫默認狀態用 key（舊數據庫的默認值保持不變，寫入時都會明確指定狀態）
+    default_status = DEFAULT_STATUS
     
     # 1. 用戶表
     cursor.execute('''
@@ -44,7 +61,7 @@ def init_db():
         )
     ''')
     
-    # 2. 訂單主表（使用 STATUS 配置中的默认状态）
+    # 2. 訂單主表（默认状态使用 key）
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS orders (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -63,6 +80,8 @@ def init_db():
             product_name VARCHAR(100),
             pattern_code VARCHAR(50),
             expected_delivery_date DATE,
+            next_light_change_date DATE,
+            search_key TEXT,
             notes TEXT,
             from_revision_id VARCHAR(50),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -152,12 +171,26 @@ def init_db():
         )
     ''')
     
+    # 9. 訂單階段里程碑表（每個訂單每個狀態一行：首次/最後進入日期和次數）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_milestones (
+            order_id INTEGER NOT NULL,
+            status_key VARCHAR(50) NOT NULL,
+            first_at DATE NOT NULL,
+            last_at DATE NOT NULL,
+            count INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (order_id, status_key)
+        )
+    ''')
+    
     # 創建索引
     indexes = [
         "CREATE INDEX IF NOT EXISTS idx_order_number ON orders(order_number)",
         "CREATE INDEX IF NOT EXISTS idx_customer_name ON orders(customer_name)",
         "CREATE INDEX IF NOT EXISTS idx_current_status ON orders(current_status)",
         "CREATE INDEX IF NOT EXISTS idx_status_light ON orders(status_light)",
+        # 看板排序（status_light, status_days, order_date DESC + id）及 keyset 分頁（讀 orders 表時，即 LIGHTS_AT_READ_TIME=0）
+        "CREATE INDEX IF NOT EXISTS idx_orders_board_sort ON orders(status_light, status_days, order_date, id)",
         "CREATE INDEX IF NOT EXISTS idx_history_order_id ON status_history(order_id)",
         "CREATE INDEX IF NOT EXISTS idx_history_order_number ON status_history(order_number)",
         "CREATE INDEX IF NOT EXISTS idx_history_to_status ON status_history(to_status)",
@@ -167,7 +200,8 @@ def init_db():
         "CREATE INDEX IF NOT EXISTS idx_revision_customer ON revisions(customer_name)",
         "CREATE INDEX IF NOT EXISTS idx_revision_status ON revisions(current_status)",
         "CREATE INDEX IF NOT EXISTS idx_images_item ON images(item_type, item_id)",
-        "CREATE INDEX IF NOT EXISTS idx_audit_order ON audit_log(order_number)"
+        "CREATE INDEX IF NOT EXISTS idx_audit_order ON audit_log(order_number)",
+        "CREATE INDEX IF NOT EXISTS idx_milestones_status ON order_milestones(status_key, order_id, first_at)"
     ]
     
     for index_sql in indexes:
@@ -211,6 +245,35 @@ def init_db():
         except Exception as e:
             print(f"⚠️ 添加字段 factory 失敗或已存在: {e}")
     
+    # 燈號下一次可能變化的日期（每日只需重算到期的訂單）
+    try:
+        cursor.execute("SELECT next_light_change_date FROM orders LIMIT 1")
+        fill_next_light_change = False
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE orders ADD COLUMN next_light_change_date DATE")
+        print("✅ 成功添加字段：next_light_change_date")
+        fill_next_light_change = True
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_next_light_change ON orders(next_light_change_date)")
+    
+    # 看板計數表（觸發器維護）；新建時從 orders 全量生成一次
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'order_counters'")
+    fill_order_counters = cursor.fetchone() is None
+    create_order_counters(conn)
+    if fill_order_counters:
+        rebuild_order_counters(conn)
+    
+    # 搜索鍵（繁簡 / 拼音 / 全形半形折疊）和訂單全文搜索索引（FTS5 trigram，觸發器同步）
+    create_search_key_column(conn)
+    create_orders_search_index(conn)
+    fill_search_keys(conn)
+    
+    # 詢價 / 修圖編號序列
+    create_sequences(conn)
+    
+    # 數據版本（API 的 ETag / Last-Modified）和增量同步的變更記錄
+    create_data_generation(conn)
+    create_order_changes(conn)
+    
     # 初始化用戶
     try:
         admin_hash = generate_password_hash('admin123')
@@ -250,130 +313,224 @@ def init_db():
             VALUES (?, ?, ?)
         ''', (key, value, desc))
     
+    # status_days 為 NULL 的舊數據會讓 keyset 分頁的行值比較失效
+    cursor.execute("UPDATE orders SET status_days = 0 WHERE status_days IS NULL")
+    
+    # 里程碑表為空但已有歷史時（舊數據庫升級），自動回填一次
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM order_milestones) AS has_rows")
+    if not cursor.fetchone()['has_rows']:
+        backfill_order_milestones(conn)
+    
+    # 讀取時計算燈號用的規則表和視圖（每次啟動按當前配置重建）
+    rules_changed = create_orders_live_view(conn)
+    
+    # 剛添加 next_light_change_date 或燈號規則改了時全表重算一次（存儲的燈號和下一次變化日期按舊規則算的），
+    # 之後由寫入路徑和每日巡檢維護
+    if fill_next_light_change or rules_changed:
+        conn.commit()
+        refresh_all_status_lights(conn)
+    
     conn.commit()
     conn.close()
+    _schema_ready.add(database_path)
+
+# ==================== 燈號規則（編譯後的查表）====================
+
+def compile_light_rules(light_rules=None, status_rules=None):
+    """
+    把 LIGHT_RULES + STATUS_LIGHT_RULES 編譯成查表：狀態值 -> (黃燈天數, 紅燈天數)
+    - key 和舊數據的簡體中文都作為鍵，避免每次計算時線性查找
+    - 紅燈天數為 None 表示該狀態不會因停留天數變紅
+    - 沒有規則的狀態（已完成、已取消、未知狀態）不在表中，按綠燈處理
+    """
+    if light_rules is None:
+        light_rules = LIGHT_RULES
+    if status_rules is None:
+        status_rules = STATUS_LIGHT_RULES
+
+    table = {}
+    for status_key, rule_name in status_rules.items():
+        rules = light_rules[rule_name]
+        red_days = rules['red_days']
+        # 打樣中的紅燈天數允許留空（原邏輯只在這個狀態上判斷了 red_days）
+        if status_key == STATUS_KEYS['SAMPLING'] and not red_days:
+            red_days = None
+        thresholds = (rules['yellow_days'], red_days)
+        table[status_key] = thresholds
+        table[STATUS[status_key]] = thresholds  # 舊數據：簡體中文
+    return table
+
 
-def calculate_status_light(order):
+LIGHT_RULE_TABLE = compile_light_rules()
+DELIVERY_WARNING_DAYS = LIGHT_RULES['delivery_warning_days']
+
+# 看板讀取用的數據源：orders_live 視圖在讀取時計算燈號和天數
+ORDERS_LIVE_VIEW = 'orders_live'
+ORDERS_READ_SOURCE = ORDERS_LIVE_VIEW if LIGHTS_AT_READ_TIME else 'orders'
+
+# API 的 fields= 參數可選的列（search_key 是內部搜索鍵，不對外返回）
+# 只取需要的列：notes 等長文本存在溢出頁，不選就不會讀；選的列都在某個索引裡時 SQLite 只讀索引（覆蓋索引）
+ORDER_FIELDS = ('id', 'order_number', 'customer_id', 'customer_name', 'product_code', 'product_name', 'quantity',
+                'factory', 'production_type', 'pattern_code', 'order_date', 'expected_delivery_date',
+                'current_status', 'status_light', 'status_days', 'last_status_change_date', 'next_light_change_date',
+                'notes', 'from_revision_id', 'created_at', 'updated_at')
+# 看板卡片 / 搜索結果行（/api/orders、/api/search 的默認值）：不含備註等長文本
+BOARD_CARD_FIELDS = ('id', 'order_number', 'customer_name', 'product_name', 'product_code', 'quantity', 'factory',
+                     'production_type', 'order_date', 'expected_delivery_date', 'current_status', 'status_light',
+                     'status_days', 'last_status_change_date')
+# 詳情彈窗（/api/orders/<order_number> 的默認值）
+ORDER_DETAIL_FIELDS = ORDER_FIELDS
+
+
+def order_columns(fields=None, prefix=''):
+    """SELECT 列表：fields 為 None 時取全部列（*），否則只取這些列（調用方已按 ORDER_FIELDS 校驗）"""
+    if fields is None:
+        return f'{prefix}*'
+    return ', '.join(f'{prefix}{field}' for field in fields)
+
+
+def create_orders_live_view(conn):
+    """
+    重建 light_rules 表和 orders_live 視圖
+    視圖的列與 orders 相同，但 status_days / status_light 按今天的日期和 LIGHT_RULE_TABLE 在 SQL 中計算，
+    結果與 calculate_status_light / update_status_light 一致（日期都是 YYYY-MM-DD 時）
+    
+    Returns:
+        規則是否與數據庫中上次保存的不同（閾值或交貨提醒天數改了，存儲的燈號需要全表重算）
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS light_rules (
+            status VARCHAR(50) PRIMARY KEY,
+            yellow_days INTEGER NOT NULL,
+            red_days INTEGER
+        )
+    ''')
+    rules = sorted((status, yellow_days, red_days) for status, (yellow_days, red_days) in LIGHT_RULE_TABLE.items())
+    old_rules = [tuple(row) for row in conn.execute(
+        'SELECT status, yellow_days, red_days FROM light_rules ORDER BY status')]
+    conn.execute('DELETE FROM light_rules')
+    conn.executemany('INSERT INTO light_rules (status, yellow_days, red_days) VALUES (?, ?, ?)', rules)
+    
+    # 交貨提醒天數寫在視圖的 SQL 裡，與舊視圖比較即可知道是否改過
+    old_view = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (ORDERS_LIVE_VIEW,)
+    ).fetchone()
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(orders)')
+               if row['name'] not in ('status_light', 'status_days')]
+    conn.execute(f'DROP VIEW IF EXISTS {ORDERS_LIVE_VIEW}')
+    conn.execute(f'''
+        CREATE VIEW {ORDERS_LIVE_VIEW} AS
+        SELECT {', '.join(columns)},
+               MAX(0, COALESCE(days, 0)) AS status_days,
+               CASE
+                   WHEN last_status_change_date IS NULL OR last_status_change_date = '' THEN 'green'
+                   WHEN delivery_in <= 0 THEN 'red'
+                   WHEN delivery_in <= {int(DELIVERY_WARNING_DAYS)} THEN 'yellow'
+                   WHEN yellow_days IS NULL THEN 'green'
+                   WHEN red_days IS NOT NULL AND days >= red_days THEN 'red'
+                   WHEN days >= yellow_days THEN 'yellow'
+                   ELSE 'green'
+               END AS status_light
+        FROM (
+            SELECT o.*,
+                   CAST(julianday(date('now', 'localtime')) - julianday(o.last_status_change_date) AS INTEGER) AS days,
+                   julianday(o.expected_delivery_date) - julianday(date('now', 'localtime')) AS delivery_in,
+                   r.yellow_days,
+                   r.red_days
+            FROM orders o
+            LEFT JOIN light_rules r ON r.status = o.current_status
+        )
+    ''')
+    new_view = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (ORDERS_LIVE_VIEW,)
+    ).fetchone()
+    return old_rules != rules or old_view is None or old_view['sql'] != new_view['sql']
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date(value):
+    """解析 YYYY-MM-DD（與原來的 strptime 行為一致，結果緩存）"""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def calculate_status_light(order, today=None):
     """
     计算订单的灯号
     支持新格式（key）和旧格式（中文）的状态值
+    today 默认为当天，批量计算时可传入同一个日期
     """
-    today = date.today()
-    current_status = order['current_status']
+    if today is None:
+        today = date.today()
     last_change = order['last_status_change_date']
     
     if not last_change:
         return 'green'
     
     if isinstance(last_change, str):
-        last_change = datetime.strptime(last_change, '%Y-%m-%d').date()
-    
-    days = (today - last_change).days
+        last_change = _parse_date(last_change)
     
     # 檢查是否超過預計交貨日期
-    if order['expected_delivery_date']:
-        delivery = order['expected_delivery_date']
+    delivery = order['expected_delivery_date']
+    if delivery:
         if isinstance(delivery, str):
-            delivery = datetime.strptime(delivery, '%Y-%m-%d').date()
+            delivery = _parse_date(delivery)
         if today >= delivery:
             return 'red'
-        if (delivery - today).days <= LIGHT_RULES['delivery_warning_days']:
-            return 'yellow'
-    
-    # 正規化狀態：如果是中文，轉換成 key；如果已經是 key，直接使用
-    status_key = current_status
-    if current_status not in STATUS_KEYS.values():
-        # 可能是舊的中文狀態，嘗試找到對應的 key
-        for key, label_zh_cn in STATUS.items():
-            if label_zh_cn == current_status:
-                status_key = key
-                break
-        # 如果找不到，可能是未知狀態，返回綠燈
-        if status_key not in STATUS_KEYS.values():
-            return 'green'
-    
-    # 根據狀態 key 和等待天數判斷
-    if status_key == STATUS_KEYS['NEW_ORDER']:
-        rules = LIGHT_RULES['new_order']
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['QUOTE_CONFIRMING']:
-        rules = LIGHT_RULES['draft_confirm']  # 报价待确认使用图稿确认规则
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['DRAFT_MAKING']:
-        # 图稿制作中：内部制作阶段，阈值沿用图稿阶段规则
-        rules = LIGHT_RULES['draft_confirm']
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['DRAFT_CONFIRMING']:
-        rules = LIGHT_RULES['draft_confirm']
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['DRAFT_REVISING']:
-        rules = LIGHT_RULES['draft_confirm']  # 图稿修改中使用图稿确认规则
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['PENDING_SAMPLE']:
-        rules = LIGHT_RULES['ready_sample']
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['SAMPLING']:
-        rules = LIGHT_RULES['sampling_process']
-        if rules['red_days'] and days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['SAMPLE_CONFIRMING']:
-        rules = LIGHT_RULES['sampling_confirm']
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['SAMPLE_REVISING']:
-        rules = LIGHT_RULES['sampling_confirm']  # 打样修改中使用打样确认规则
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
+        if (delivery - today).days <= DELIVERY_WARNING_DAYS:
             return 'yellow'
     
-    elif status_key == STATUS_KEYS['PENDING_PRODUCTION']:
-        rules = LIGHT_RULES['ready_production']
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
-    
-    elif status_key == STATUS_KEYS['PRODUCING']:
-        rules = LIGHT_RULES['ready_production']  # 生产中待生产规则
-        if days >= rules['red_days']:
-            return 'red'
-        elif days >= rules['yellow_days']:
-            return 'yellow'
+    thresholds = LIGHT_RULE_TABLE.get(order['current_status'])
+    if thresholds is None:
+        return 'green'
     
+    days = (today - last_change).days
+    yellow_days, red_days = thresholds
+    if red_days is not None and days >= red_days:
+        return 'red'
+    if days >= yellow_days:
+        return 'yellow'
     return 'green'
 
 
+def next_light_change_date(order, today=None):
+    """
+    灯号下一次会变化的日期（晚于 today）；之后不会再变化时返回 None
+    灯号只会在这几个日期跳变：最后变更日期 + 黄/红灯天数、交货日期 - 提醒天数、交货日期，
+    所以只需按顺序检查这些日期
+    """
+    if today is None:
+        today = date.today()
+    last_change = order['last_status_change_date']
+    if not last_change:
+        return None
+    
+    try:
+        if isinstance(last_change, str):
+            last_change = _parse_date(last_change)
+        delivery = order['expected_delivery_date']
+        if delivery and isinstance(delivery, str):
+            delivery = _parse_date(delivery)
+    except ValueError:
+        return None
+    
+    candidates = []
+    thresholds = LIGHT_RULE_TABLE.get(order['current_status'])
+    if thresholds is not None:
+        yellow_days, red_days = thresholds
+        candidates.append(last_change + timedelta(days=yellow_days))
+        if red_days is not None:
+            candidates.append(last_change + timedelta(days=red_days))
+    if delivery:
+        candidates.append(delivery - timedelta(days=DELIVERY_WARNING_DAYS))
+        candidates.append(delivery)
+    
+    current = calculate_status_light(order, today)
+    for candidate in sorted(c for c in candidates if c > today):
+        if calculate_status_light(order, candidate) != current:
+            return candidate
+    return None
+
+
 
 def update_status_light(order_id, conn=None):
     """更新订单灯号（修复版 - 兼容 sqlite3.Row）"""
@@ -389,6 +546,7 @@ def update_status_light(order_id, conn=None):
     
     if order:
         light = calculate_status_light(order)
+        fixed_last_change = None
         
         # 计算天数（修复：确保不是负数）
         if order['last_status_change_date']:
@@ -406,6 +564,7 @@ def update_status_light(order_id, conn=None):
                     
                     print(f"⚠️  警告: 订单 {order_num} 的最后变更日期是未来 ({last_change})，已修正为今天")
                     last_change = today
+                    fixed_last_change = today.isoformat()
                     # 同时更新数据库中的日期
                     cursor.execute('''
                         UPDATE orders 
@@ -429,13 +588,19 @@ def update_status_light(order_id, conn=None):
         else:
             days = 0
         
+        # 下一次灯号变化日期（未来日期已修正时按修正后的日期计算）
+        if fixed_last_change:
+            order = dict(order, last_status_change_date=fixed_last_change)
+        next_change = next_light_change_date(order)
+        
         cursor.execute('''
             UPDATE orders 
             SET status_light = ?, 
                 status_days = ?,
+                next_light_change_date = ?,
                 updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
-        ''', (light, days, order_id))
+        ''', (light, days, next_change.isoformat() if next_change else None, order_id))
         conn.commit()
     
     if should_close:
@@ -446,23 +611,1037 @@ def update_status_light(order_id, conn=None):
 
 
 
-def generate_revision_number():
-    """生成修图编号"""
-    today = datetime.now().strftime('%Y%m%d')
-    conn = get_db()
-    cursor = conn.cursor()
+def _refresh_status_lights(conn, today, where, params, batch_size):
+    """批量重算符合 where 条件的订单：灯号、等待天数、下一次灯号变化日期"""
+    should_close = False
+    if conn is None:
+        conn = get_db()
+        should_close = True
+    if today is None:
+        today = date.today()
+    today_str = today.isoformat()
+    
+    stats = {
+        'total': 0,
+        'updated': 0,
+        'errors': 0,
+        'date_fixed': 0,
+        'lights': {'red': 0, 'yellow': 0, 'green': 0},
+        'changed': {'red': 0, 'yellow': 0, 'green': 0}
+    }
+    light_updates = []
+    date_fixes = []
+    
+    cursor = conn.execute(f'''
+        SELECT id, current_status, last_status_change_date, expected_delivery_date,
+               status_light, status_days, next_light_change_date
+        FROM orders
+        WHERE {where}
+    ''', params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for order in rows:
+            stats['total'] += 1
+            try:
+                light = calculate_status_light(order, today)
+            except (ValueError, TypeError):
+                stats['errors'] += 1
+                continue
+            
+            # 天数：与 update_status_light 相同（未来日期修正为今天，不为负数）
+            last_change = order['last_status_change_date']
+            days = 0
+            if last_change:
+                try:
+                    last_change = date.fromisoformat(last_change)
+                    if last_change > today:
+                        date_fixes.append((today_str, order['id']))
+                        last_change = today
+                        order = dict(order, last_status_change_date=today_str)
+                    days = max(0, (today - last_change).days)
+                except (ValueError, TypeError):
+                    days = 0
+            next_change = next_light_change_date(order, today)
+            next_change = next_change.isoformat() if next_change else None
+            
+            stats['lights'][light] += 1
+            if (light != order['status_light'] or days != order['status_days']
+                    or next_change != order['next_light_change_date']):
+                light_updates.append((light, days, next_change, order['id']))
+                if light != order['status_light']:
+                    stats['changed'][light] += 1
+    
+    with conn:
+        if date_fixes:
+            conn.executemany('''
+                UPDATE orders SET last_status_change_date = ? WHERE id = ?
+            ''', date_fixes)
+        if light_updates:
+            conn.executemany('''
+                UPDATE orders
+                SET status_light = ?,
+                    status_days = ?,
+                    next_light_change_date = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', light_updates)
+    stats['updated'] = len(light_updates)
+    stats['date_fixed'] = len(date_fixes)
     
-    cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM revisions 
-        WHERE revision_number LIKE ?
-    ''', (f'REV-{today}-%',))
+    if should_close:
+        conn.close()
+    return stats
+
+
+def refresh_all_status_lights(conn=None, today=None, batch_size=5000):
+    """
+    批量重算所有订单的灯号、等待天数和下一次灯号变化日期
+    一次读取需要的列，用编译后的规则表在内存中计算，只把有变化的行用 executemany
+    在同一个事务中写回（updated_at 只在真正变化的行上更新）
+    计算结果与逐单调用 update_status_light 一致；日期格式错误的订单跳过并计入 errors
+    
+    Returns:
+        {'total', 'updated', 'errors',
+         'lights': 各颜色订单数, 'changed': 变成该颜色的订单数, 'date_fixed': 修正的未来日期数}
+    """
+    return _refresh_status_lights(conn, today, '1=1', (), batch_size)
+
+
+def sweep_status_lights(conn=None, today=None, batch_size=5000):
+    """
+    每日巡检：只重算 next_light_change_date 已到期的订单（走 idx_orders_next_light_change 索引）
+    其他订单的灯号在下一次到期前不会变化；返回值同 refresh_all_status_lights，
+    其中 lights 只统计本次重算的订单
+    注意：未到期订单的 status_days 不会更新
+    """
+    if today is None:
+        today = date.today()
+    return _refresh_status_lights(conn, today, 'next_light_change_date <= ?', (today.isoformat(),), batch_size)
+
+
+def refresh_status_lights_for(conn, order_ids, today=None, batch_size=5000):
+    """
+    只重算指定訂單的燈號（批量快速更新之後調用），返回值同 refresh_all_status_lights
+    寫回時提交 conn 上的事務：調用前的寫入與燈號一起提交
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        conn.commit()
+        return None
+    placeholders = ', '.join(['?'] * len(order_ids))
+    return _refresh_status_lights(conn, today, f'id IN ({placeholders})', order_ids, batch_size)
+
+
+# ==================== 看板計數表 ====================
+# order_counters 按 (current_status, status_light, factory) 保存訂單數，由 orders 上的觸發器維護，
+# 看板統計只需讀 O(分組數) 行；NULL 一律存成空字符串（主鍵列不能用 NULL 比較）
+
+_COUNTER_KEY_COLUMNS = ('current_status', 'status_light', 'factory')
+
+
+def _counter_key(prefix):
+    return ', '.join(f"COALESCE({prefix}.{col}, '')" for col in _COUNTER_KEY_COLUMNS)
+
+
+def _counter_match(prefix):
+    return ' AND '.join(f"{col} = COALESCE({prefix}.{col}, '')" for col in _COUNTER_KEY_COLUMNS)
+
+
+def create_order_counters(conn):
+    """創建 order_counters 表和 orders 上的 INSERT / UPDATE / DELETE 觸發器"""
+    key_columns = ', '.join(_COUNTER_KEY_COLUMNS)
+    increment = f'''
+            INSERT INTO order_counters ({key_columns}, count)
+            VALUES ({_counter_key('NEW')}, 1)
+            ON CONFLICT({key_columns}) DO UPDATE SET count = count + 1;'''
+    decrement = f'''
+            UPDATE order_counters SET count = count - 1 WHERE {_counter_match('OLD')};
+            DELETE FROM order_counters WHERE {_counter_match('OLD')} AND count <= 0;'''
+    changed = ' OR '.join(f'OLD.{col} IS NOT NEW.{col}' for col in _COUNTER_KEY_COLUMNS)
+
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS order_counters (
+            current_status VARCHAR(50) NOT NULL,
+            status_light VARCHAR(10) NOT NULL,
+            factory VARCHAR(100) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY ({key_columns})
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_order_counters_insert AFTER INSERT ON orders
+        BEGIN{increment}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_order_counters_delete AFTER DELETE ON orders
+        BEGIN{decrement}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_order_counters_update
+        AFTER UPDATE OF {key_columns} ON orders
+        WHEN {changed}
+        BEGIN{decrement}{increment}
+        END
+    ''')
+
+
+def rebuild_order_counters(conn):
+    """從 orders 全量重建 order_counters（同一事務內），返回分組數"""
+    key_columns = ', '.join(_COUNTER_KEY_COLUMNS)
+    with conn:
+        conn.execute('DELETE FROM order_counters')
+        conn.execute(f'''
+            INSERT INTO order_counters ({key_columns}, count)
+            SELECT {_counter_key('orders')}, COUNT(*)
+            FROM orders
+            GROUP BY {_counter_key('orders')}
+        ''')
+    return conn.execute('SELECT COUNT(*) AS count FROM order_counters').fetchone()['count']
+
+
+def check_order_counters(conn=None, repair=False):
+    """
+    一致性檢查：對比 order_counters 與 orders 上的 GROUP BY，報告偏差
+    讀取時計算燈號的模式下，同時統計保存的燈號與 orders_live 不一致的訂單數（stale_lights）
+    repair=True 時先重算保存的燈號，再重建計數表
+
+    Returns:
+        {'groups': 分組數, 'drift': [{current_status, status_light, factory, expected, actual}],
+         'stale_lights': 燈號過期的訂單數, 'repaired': 是否已修復}
+    """
+    should_close = False
+    if conn is None:
+        conn = get_db()
+        should_close = True
+
+    key_columns = ', '.join(_COUNTER_KEY_COLUMNS)
+    expected = {
+        tuple(row[:3]): row[3]
+        for row in conn.execute(f'''
+            SELECT {_counter_key('orders')}, COUNT(*)
+            FROM orders
+            GROUP BY {_counter_key('orders')}
+        ''')
+    }
+    actual = {
+        tuple(row[:3]): row[3]
+        for row in conn.execute(f'SELECT {key_columns}, count FROM order_counters')
+    }
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key, 0) != actual.get(key, 0):
+            drift.append(dict(zip(_COUNTER_KEY_COLUMNS, key),
+                              expected=expected.get(key, 0), actual=actual.get(key, 0)))
+
+    stale_lights = 0
+    if LIGHTS_AT_READ_TIME:
+        stale_lights = conn.execute(f'''
+            SELECT COUNT(*) AS count
+            FROM orders o JOIN {ORDERS_LIVE_VIEW} l ON l.id = o.id
+            WHERE o.status_light IS NOT l.status_light
+        ''').fetchone()['count']
+
+    report = {'groups': len(expected), 'drift': drift, 'stale_lights': stale_lights, 'repaired': False}
+    if repair and (drift or stale_lights):
+        if stale_lights:
+            refresh_all_status_lights(conn)
+        report['groups'] = rebuild_order_counters(conn)
+        report['repaired'] = True
+
+    if should_close:
+        conn.close()
+    return report
+
+
+# ==================== 訂單全文搜索（FTS5 trigram）====================
+# orders_fts 是 orders 的外部內容索引（不重複保存文字），由觸發器同步；
+# trigram 分詞支持任意位置的子串匹配（與 LIKE '%關鍵字%' 相同），至少 3 個字符才能走索引
+# search_key 列保存客戶 / 產品 / 工廠名稱折疊後的形式（全形半形、繁簡、拼音，見 search_keys.py），
+# 應用的寫入路徑（新建 / 編輯 / 導入）在同一事務中用 update_search_key 算好；
+# 原文字段被其他方式改動時由觸發器清空，啟動時（init_db）由 fill_search_keys 補算，讀取路徑不寫入
+
+ORDERS_FTS_TABLE = 'orders_fts'
+ORDERS_FTS_COLUMNS = ('order_number', 'customer_name', 'product_name', 'product_code',
+                      'pattern_code', 'factory', 'notes')
+SEARCH_KEY_COLUMN = 'search_key'
+SEARCH_KEY_SOURCES = ('customer_name', 'product_name', 'factory')
+# bm25 各列權重（與 ORDERS_FTS_COLUMNS + search_key 順序一致）：單號、客戶命中排在前面
+ORDERS_FTS_WEIGHTS = (10.0, 5.0, 2.0, 2.0, 2.0, 1.0, 1.0, 2.0)
+FTS_MIN_QUERY_LENGTH = 3
+
+
+def _fts_trigram_supported():
+    """當前 SQLite 是否支持 FTS5 trigram 分詞（3.34+ 且編譯了 FTS5）"""
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(v, tokenize = 'trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+ORDER_SEARCH_FTS = SEARCH_USE_FTS and _fts_trigram_supported()
+
+
+def create_search_key_column(conn):
+    """orders.search_key 列、待補算的部分索引、原文改動時清空搜索鍵的觸發器"""
+    try:
+        conn.execute(f"SELECT {SEARCH_KEY_COLUMN} FROM orders LIMIT 1")
+    except sqlite3.OperationalError:
+        conn.execute(f"ALTER TABLE orders ADD COLUMN {SEARCH_KEY_COLUMN} TEXT")
+        print(f"✅ 成功添加字段：{SEARCH_KEY_COLUMN}")
+    conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_orders_search_key_pending ON orders(id)
+        WHERE {SEARCH_KEY_COLUMN} IS NULL
+    ''')
+    changed = ' OR '.join(f'OLD.{col} IS NOT NEW.{col}' for col in SEARCH_KEY_SOURCES)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_search_key_reset
+        AFTER UPDATE OF {', '.join(SEARCH_KEY_SOURCES)} ON orders
+        WHEN {changed}
+        BEGIN
+            UPDATE orders SET {SEARCH_KEY_COLUMN} = NULL WHERE id = NEW.id;
+        END
+    ''')
+
+
+def update_search_key(conn, order_id):
+    """
+    寫入訂單後在同一事務中計算它的 search_key（不提交）
+    只在新建或原文改動（觸發器已清空）時寫入；只改其他字段時是一次主鍵查找
+    """
+    row = conn.execute(f'''
+        SELECT {', '.join(SEARCH_KEY_SOURCES)} FROM orders WHERE id = ? AND {SEARCH_KEY_COLUMN} IS NULL
+    ''', (order_id,)).fetchone()
+    if row:
+        conn.execute(f'UPDATE orders SET {SEARCH_KEY_COLUMN} = ? WHERE id = ?',
+                     (build_search_key(*(row[col] for col in SEARCH_KEY_SOURCES)), order_id))
+
+
+def fill_search_keys(conn, batch_size=1000):
+    """
+    補算 search_key 為 NULL 的訂單（直接用 SQL 寫入或改名的），返回補算的行數
+    沒有待補算的訂單時只是一次部分索引查找
+    """
+    sources = ', '.join(SEARCH_KEY_SOURCES)
+    total = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT id, {sources} FROM orders WHERE {SEARCH_KEY_COLUMN} IS NULL LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            return total
+        with conn:
+            conn.executemany(
+                f'UPDATE orders SET {SEARCH_KEY_COLUMN} = ? WHERE id = ?',
+                [(build_search_key(*(row[col] for col in SEARCH_KEY_SOURCES)), row['id']) for row in rows]
+            )
+        total += len(rows)
+
+
+def create_orders_search_index(conn):
+    """
+    創建 orders_fts 及同步觸發器；新建（或列定義變了需要重建）時從 orders 全量生成一次
+    不支持 FTS5 時跳過
+    """
+    if not ORDER_SEARCH_FTS:
+        return
+    fts_columns = ORDERS_FTS_COLUMNS + (SEARCH_KEY_COLUMN,)
+    existing = [row['name'] for row in conn.execute(f'PRAGMA table_info({ORDERS_FTS_TABLE})')]
+    if existing and tuple(existing) != fts_columns:
+        for name in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_orders_fts_{name}')
+        conn.execute(f'DROP TABLE {ORDERS_FTS_TABLE}')
+        existing = []
+
+    columns = ', '.join(fts_columns)
+    new_values = ', '.join(f'NEW.{col}' for col in fts_columns)
+    old_values = ', '.join(f'OLD.{col}' for col in fts_columns)
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {ORDERS_FTS_TABLE} USING fts5(
+            {columns},
+            content = 'orders',
+            content_rowid = 'id',
+            tokenize = 'trigram'
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_insert AFTER INSERT ON orders
+        BEGIN
+            INSERT INTO {ORDERS_FTS_TABLE} (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_delete AFTER DELETE ON orders
+        BEGIN
+            INSERT INTO {ORDERS_FTS_TABLE} ({ORDERS_FTS_TABLE}, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_fts_update AFTER UPDATE OF {columns} ON orders
+        BEGIN
+            INSERT INTO {ORDERS_FTS_TABLE} ({ORDERS_FTS_TABLE}, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO {ORDERS_FTS_TABLE} (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+    if not existing:
+        rebuild_orders_search_index(conn)
+
+
+def rebuild_orders_search_index(conn):
+    """從 orders 重建全文索引（索引損壞或批量導入時關閉了觸發器之後使用）"""
+    with conn:
+        conn.execute(f"INSERT INTO {ORDERS_FTS_TABLE} ({ORDERS_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def fts_match_expression(keyword, columns=None):
+    """
+    關鍵字 -> FTS5 MATCH 表達式
+    整個關鍵字作為一個帶引號的字符串（子串匹配，與 LIKE '%關鍵字%' 語義一致）
+    columns 為 None 時搜索全部原文字段，並用折疊後的關鍵字匹配 search_key；否則只搜索指定的原文字段
+    """
+    phrase = _fts_phrase(keyword)
+    if columns:
+        return '{' + ' '.join(columns) + '}: ' + phrase
+    expression = '{' + ' '.join(ORDERS_FTS_COLUMNS) + '}: ' + phrase
+    folded = fold_query(keyword)
+    if len(folded) >= FTS_MIN_QUERY_LENGTH:
+        expression += f' OR {SEARCH_KEY_COLUMN}: ' + _fts_phrase(folded)
+    return expression
+
+
+def use_fts_search(keyword):
+    """關鍵字能否走全文索引（trigram 至少需要 3 個字符）"""
+    return ORDER_SEARCH_FTS and len(keyword) >= FTS_MIN_QUERY_LENGTH
+
+
+def order_search_clause(keyword, columns=None, id_column='id'):
+    """
+    訂單搜索的 WHERE 子句，返回 (SQL, 參數)
+    能走全文索引時為 id IN (MATCH 子查詢)，否則退回各列 LIKE
+    columns 為 None 時搜索全部原文字段和 search_key
+    """
+    if use_fts_search(keyword):
+        return (f'{id_column} IN (SELECT rowid FROM {ORDERS_FTS_TABLE} WHERE {ORDERS_FTS_TABLE} MATCH ?)',
+                [fts_match_expression(keyword, columns)])
+    pattern = f'%{keyword}%'
+    clauses = [f'{col} LIKE ?' for col in (columns or ORDERS_FTS_COLUMNS)]
+    params = [pattern] * len(clauses)
+    if columns is None:
+        clauses.append(f'{SEARCH_KEY_COLUMN} LIKE ?')
+        params.append(f'%{fold_query(keyword)}%')
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def search_orders(conn, keyword, source='orders', limit=100, fields=None):
+    """
+    全文搜索訂單（source 可以是 orders 或 orders_live 視圖），返回行列表；fields 為要取的列（默認全部）
+    簡繁體、全形半形、拼音輸入都能匹配（search_key）
+    走索引時按 bm25 相關度排序（相同相關度按訂單日期倒序），否則按訂單日期倒序
+    """
+    if use_fts_search(keyword):
+        weights = ', '.join(str(w) for w in ORDERS_FTS_WEIGHTS)
+        return conn.execute(f'''
+            SELECT {order_columns(fields, 'o.')}
+            FROM {ORDERS_FTS_TABLE} f
+            JOIN {source} o ON o.id = f.rowid
+            WHERE {ORDERS_FTS_TABLE} MATCH ?
+            ORDER BY bm25({ORDERS_FTS_TABLE}, {weights}), o.order_date DESC
+            LIMIT ?
+        ''', (fts_match_expression(keyword), limit)).fetchall()
+    where, params = order_search_clause(keyword)
+    return conn.execute(f'''
+        SELECT {order_columns(fields)} FROM {source}
+        WHERE {where}
+        ORDER BY order_date DESC
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+
+
+# ==================== 舊中文狀態值遷移 ====================
+# 需要遷移的表和字段（都以 id 為主鍵，按 id 分段處理）
+STATUS_MIGRATION_TARGETS = (
+    ('orders', ('current_status',)),
+    ('status_history', ('from_status', 'to_status')),
+    ('audit_log', ('old_status', 'new_status')),
+)
+
+
+def _prepare_status_migration(conn):
+    """進度表（持久，用於斷點續跑）和中文 -> key 對照表（臨時表，每個連接一份）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS status_migration_progress (
+            table_name VARCHAR(50) PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            updated INTEGER NOT NULL DEFAULT 0,
+            finished_at TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS status_label_map (
+            label VARCHAR(50) PRIMARY KEY,
+            status_key VARCHAR(50) NOT NULL
+        )
+    ''')
+    conn.execute('DELETE FROM temp.status_label_map')
+    conn.executemany('INSERT INTO temp.status_label_map (label, status_key) VALUES (?, ?)',
+                     list(STATUS_LABEL_TO_KEY.items()))
+    conn.commit()
+
+
+def migrate_status_values(conn=None, chunk_size=1000, restart=False, pause=0, progress=None):
+    """
+    把 orders / status_history / audit_log 中的中文狀態值改成 key
+    按 id 分段，每段一個短事務並記錄進度（status_migration_progress），中斷後再次執行從上次位置繼續；
+    應用可以同時正常讀寫（新寫入的本來就是 key）
+    pause：每段之間休眠的秒數，降低對線上寫入的影響
+    progress：每段完成後調用 progress(表名, 已處理到的 id, 開始時的最大 id, 本表累計更新行數)
+    status_history 有更新時最後重建 order_milestones
+
+    Returns:
+        {表名: {'updated': 本次更新的行數, 'last_id': 已處理到的 id, 'finished': 是否已完成}}
+    """
+    should_close = False
+    if conn is None:
+        conn = get_db()
+        should_close = True
+
+    _prepare_status_migration(conn)
+    if restart:
+        conn.execute('DELETE FROM status_migration_progress')
+        conn.commit()
+
+    result = {}
+    for table, columns in STATUS_MIGRATION_TARGETS:
+        conn.execute('INSERT OR IGNORE INTO status_migration_progress (table_name) VALUES (?)', (table,))
+        conn.commit()
+        row = conn.execute('''
+            SELECT last_id, updated, finished_at FROM status_migration_progress WHERE table_name = ?
+        ''', (table,)).fetchone()
+        last_id, total_updated = row['last_id'], row['updated']
+        result[table] = {'updated': 0, 'last_id': last_id, 'finished': row['finished_at'] is not None}
+        if row['finished_at'] is not None:
+            continue
+
+        max_id = conn.execute(f'SELECT COALESCE(MAX(id), 0) AS max_id FROM {table}').fetchone()['max_id']
+        while True:
+            end_id = conn.execute(f'''
+                SELECT MAX(id) AS end_id FROM (SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?)
+            ''', (last_id, chunk_size)).fetchone()['end_id']
+            if end_id is None:
+                break
+            updated = 0
+            with conn:
+                for column in columns:
+                    cursor = conn.execute(f'''
+                        UPDATE {table}
+                        SET {column} = (SELECT status_key FROM temp.status_label_map WHERE label = {table}.{column})
+                        WHERE id > ? AND id <= ?
+                          AND {column} IN (SELECT label FROM temp.status_label_map)
+                    ''', (last_id, end_id))
+                    updated += cursor.rowcount
+                conn.execute('''
+                    UPDATE status_migration_progress SET last_id = ?, updated = updated + ? WHERE table_name = ?
+                ''', (end_id, updated, table))
+            last_id = end_id
+            total_updated += updated
+            result[table]['updated'] += updated
+            result[table]['last_id'] = last_id
+            if progress:
+                progress(table, last_id, max_id, total_updated)
+            if pause:
+                time.sleep(pause)
+
+        with conn:
+            conn.execute('''
+                UPDATE status_migration_progress SET finished_at = CURRENT_TIMESTAMP WHERE table_name = ?
+            ''', (table,))
+        result[table]['finished'] = True
+
+    if result.get('status_history', {}).get('updated'):
+        backfill_order_milestones(conn)
+
+    if should_close:
+        conn.close()
+    return result
+
+
+def verify_status_migration(conn=None):
+    """
+    驗證遷移結果：統計各字段中仍不是 key 的值
+    legacy：可以遷移的中文值；unknown：無法識別的值（需要人工處理，不影響切換）
+    complete 為 True 時可以把 LEGACY_STATUS_VALUES 關掉
+
+    Returns:
+        {'complete': bool, 'legacy': {'表.字段': {值: 行數}}, 'unknown': {'表.字段': {值: 行數}}}
+    """
+    should_close = False
+    if conn is None:
+        conn = get_db()
+        should_close = True
+
+    keys = list(STATUS_KEYS.values())
+    placeholders = ', '.join(['?'] * len(keys))
+    legacy = {}
+    unknown = {}
+    for table, columns in STATUS_MIGRATION_TARGETS:
+        for column in columns:
+            rows = conn.execute(f'''
+                SELECT {column} AS value, COUNT(*) AS count
+                FROM {table}
+                WHERE {column} IS NOT NULL AND {column} != '' AND {column} NOT IN ({placeholders})
+                GROUP BY {column}
+            ''', keys).fetchall()
+            for row in rows:
+                target = legacy if row['value'] in STATUS_LABEL_TO_KEY else unknown
+                target.setdefault(f'{table}.{column}', {})[row['value']] = row['count']
+
+    if should_close:
+        conn.close()
+    return {'complete': not legacy, 'legacy': legacy, 'unknown': unknown}
+
+
+# ==================== 訂單階段里程碑 ====================
+
+RECORD_MILESTONE_SQL = '''
+    INSERT INTO order_milestones (order_id, status_key, first_at, last_at, count)
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT(order_id, status_key) DO UPDATE SET
+        first_at = MIN(first_at, excluded.first_at),
+        last_at = MAX(last_at, excluded.last_at),
+        count = count + 1
+'''
+
+
+def record_milestone(conn, order_id, status_key, action_date):
+    """
+    記錄一次狀態轉移（與 status_history 的 INSERT 在同一事務中調用）
+    首次進入取最早日期，最後進入取最晚日期，次數 +1
+    """
+    conn.execute(RECORD_MILESTONE_SQL, (order_id, status_key, action_date, action_date))
+
+
+def record_milestones(conn, transitions):
+    """批量版 record_milestone：transitions 為 (order_id, status_key, action_date) 列表"""
+    conn.executemany(RECORD_MILESTONE_SQL, [(order_id, status_key, action_date, action_date)
+                                            for order_id, status_key, action_date in transitions])
+
+
+def refresh_milestone(conn, order_id, status_key):
+    """
+    根據 status_history 重算某訂單某狀態的里程碑
+    用於撤銷（刪除歷史）和編輯歷史日期之後
+    """
+    conn.execute('''
+        DELETE FROM order_milestones WHERE order_id = ? AND status_key = ?
+    ''', (order_id, status_key))
+    conn.execute('''
+        INSERT INTO order_milestones (order_id, status_key, first_at, last_at, count)
+        SELECT order_id, to_status, MIN(action_date), MAX(action_date), COUNT(*)
+        FROM status_history
+        WHERE order_id = ? AND to_status = ?
+        GROUP BY order_id, to_status
+    ''', (order_id, status_key))
+
+
+def backfill_order_milestones(conn=None):
+    """從全部 status_history 重建里程碑表，返回寫入的行數"""
+    should_close = False
+    if conn is None:
+        conn = get_db()
+        should_close = True
     
-    count = cursor.fetchone()['count'] + 1
-    revision_number = f'REV-{today}-{count:03d}'
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM order_milestones')
+    cursor.execute('''
+        INSERT INTO order_milestones (order_id, status_key, first_at, last_at, count)
+        SELECT order_id, to_status, MIN(action_date), MAX(action_date), COUNT(*)
+        FROM status_history
+        GROUP BY order_id, to_status
+    ''')
+    cursor.execute('SELECT COUNT(*) AS count FROM order_milestones')
+    count = cursor.fetchone()['count']
+    conn.commit()
     
-    conn.close()
-    return revision_number
+    if should_close:
+        conn.close()
+    return count
+
+
+def get_first_reached_dates(conn, status_keys):
+    """
+    一次查询获取所有订单首次进入指定状态的日期（读 order_milestones）
+    返回 {order_number: {status_key: 最早 action_date}}
+    """
+    if not status_keys:
+        return {}
+    placeholders = ','.join(['?'] * len(status_keys))
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT o.order_number, m.status_key, m.first_at
+        FROM order_milestones m
+        JOIN orders o ON o.id = m.order_id
+        WHERE m.status_key IN ({placeholders})
+    ''', list(status_keys))
+    
+    result = {}
+    for row in cursor.fetchall():
+        result.setdefault(row['order_number'], {})[row['status_key']] = row['first_at']
+    return result
+
+
+# ==================== 編號分配（序列表）====================
+# 詢價編號（KC00001）和修圖編號（REV-日期-001）從 sequences 表原子分配（UPDATE ... RETURNING），
+# 不再每次掃描 orders / revisions，並發新建也不會拿到同一個號碼
+# 分配在獨立的連接上立即提交（與數據庫序列相同）：後續寫入失敗時號碼作廢，不會重複發放
+# 新建對話框打開時預留詢價編號（POST），取消時釋放；釋放或過期的號碼優先重新發放，放棄新建不會留下空號
+# SEQUENCE_BLOCK_SIZE > 1 時每個進程一次預取一段號碼，進程內逐個發放（多進程時號碼不再按時間遞增，重啟會留下空號）
+
+QUOTE_SEQUENCE = 'quote_number'
+QUOTE_NUMBER_PREFIX = 'KC'
+REVISION_SEQUENCE_PREFIX = 'revision:'
+
+
+def format_quote_number(value):
+    return f'{QUOTE_NUMBER_PREFIX}{value:05d}'
+
+
+def create_sequences(conn):
+    """序列表和預覽時預留的詢價編號"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sequences (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS number_reservations (
+            number TEXT PRIMARY KEY,
+            reserved_by TEXT,
+            reserved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _sequence_seed(conn, name):
+    """序列第一次使用時的起點：已有數據中的最大號碼（兼容建表前生成的編號）"""
+    if name == QUOTE_SEQUENCE:
+        # 只看系統生成的格式（KC + 5 位數字），手工輸入的其他 KC 單號不影響
+        row = conn.execute(f'''
+            SELECT MAX(CAST(SUBSTR(order_number, {len(QUOTE_NUMBER_PREFIX) + 1}) AS INTEGER))
+            FROM orders
+            WHERE order_number GLOB '{QUOTE_NUMBER_PREFIX}[0-9][0-9][0-9][0-9][0-9]'
+        ''').fetchone()
+        return row[0] or 0
+    if name.startswith(REVISION_SEQUENCE_PREFIX):
+        prefix = f'REV-{name[len(REVISION_SEQUENCE_PREFIX):]}-'
+        row = conn.execute('''
+            SELECT MAX(CAST(SUBSTR(revision_number, ?) AS INTEGER))
+            FROM revisions
+            WHERE revision_number LIKE ?
+        ''', (len(prefix) + 1, prefix + '%')).fetchone()
+        return row[0] or 0
+    return 0
+
+
+def next_sequence_values(conn, name, count=1):
+    """
+    原子地取 count 個連續號碼，返回 range；在 conn 當前的事務中執行（由調用者提交）
+    序列不存在時先按已有數據建立
+    """
+    row = conn.execute('UPDATE sequences SET value = value + ? WHERE name = ? RETURNING value',
+                       (count, name)).fetchone()
+    if row is None:
+        conn.execute('INSERT INTO sequences (name, value) VALUES (?, ?) ON CONFLICT(name) DO NOTHING',
+                     (name, _sequence_seed(conn, name)))
+        row = conn.execute('UPDATE sequences SET value = value + ? WHERE name = ? RETURNING value',
+                           (count, name)).fetchone()
+    end = row[0] + 1
+    return range(end - count, end)
+
+
+class SequenceAllocator:
+    """進程內的號碼分配器：按 block_size 從序列表預取，線程安全"""
+
+    def __init__(self, block_size=SEQUENCE_BLOCK_SIZE):
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._blocks = {}    # (數據庫路徑, 序列名) -> 還沒發放的號碼迭代器
+
+    def allocate(self, name):
+        key = (pool.database_path, name)
+        with self._lock:
+            block = self._blocks.get(key)
+            value = next(block, None) if block is not None else None
+            if value is None:
+                block = iter(self._fetch(name))
+                self._blocks[key] = block
+                value = next(block)
+            return value
+
+    def _fetch(self, name):
+        # 獨立連接立即提交：不受調用者事務回滾的影響，也不會長時間持有寫鎖
+        get_db().close()    # 確保表結構已初始化
+        raw = pool.acquire()
+        try:
+            with raw:
+                return next_sequence_values(raw, name, self.block_size)
+        finally:
+            pool.release(raw)
+
+    def reset(self):
+        """丟棄預取的號碼（測試或切換數據庫時用）"""
+        with self._lock:
+            self._blocks.clear()
+
+
+sequence_allocator = SequenceAllocator()
+
+
+def allocate_quote_number(conn):
+    """
+    分配一個詢價編號；跳過已被手工輸入佔用的號碼
+    必須在 conn 開始寫入之前調用（分配器用另一個連接提交，conn 持有寫鎖時會互相等待）
+    """
+    while True:
+        number = format_quote_number(sequence_allocator.allocate(QUOTE_SEQUENCE))
+        if conn.execute('SELECT 1 FROM orders WHERE order_number = ?', (number,)).fetchone() is None:
+            return number
+
+
+# 預留過期（QUOTE_RESERVATION_TTL 秒未使用）或已釋放（reserved_at 為 NULL）的號碼可以重新發放
+FREE_RESERVATION = "(reserved_at IS NULL OR reserved_at < datetime('now', ?))"
+
+
+def reserve_quote_number(conn, reserved_by):
+    """
+    新建訂單對話框打開時調用：預留一個詢價編號，返回編號
+    優先重新發放已釋放 / 過期的預留（號碼不會因為放棄新建而作廢），沒有時新分配
+    """
+    ttl = f'-{QUOTE_RESERVATION_TTL} seconds'
+    with conn:
+        # 已被手工輸入佔用的號碼不再發放
+        conn.execute('''
+            DELETE FROM number_reservations
+            WHERE EXISTS (SELECT 1 FROM orders WHERE order_number = number_reservations.number)
+        ''')
+        row = conn.execute(f'''
+            UPDATE number_reservations SET reserved_by = ?, reserved_at = CURRENT_TIMESTAMP
+            WHERE number = (SELECT number FROM number_reservations WHERE {FREE_RESERVATION} ORDER BY number LIMIT 1)
+            RETURNING number
+        ''', (reserved_by, ttl)).fetchone()
+    if row:
+        return row[0]
+    number = allocate_quote_number(conn)
+    with conn:
+        conn.execute('INSERT INTO number_reservations (number, reserved_by) VALUES (?, ?)',
+                     (number, reserved_by))
+    return number
+
+
+def release_quote_number(conn, number, reserved_by):
+    """新建訂單對話框取消時調用：釋放本人的預留，號碼留給下一次新建；返回是否釋放了"""
+    with conn:
+        cursor = conn.execute('''
+            UPDATE number_reservations SET reserved_by = NULL, reserved_at = NULL
+            WHERE number = ? AND reserved_by IS ? AND reserved_at IS NOT NULL
+        ''', (number, reserved_by))
+    return cursor.rowcount > 0
+
+
+def take_quote_number(conn, reserved_number=None, reserved_by=None):
+    """
+    新建訂單時取詢價編號：優先使用本人預覽時預留的編號，其次已釋放 / 過期的預留，否則新分配
+    預留記錄在 conn 當前的事務中刪除，與插入訂單一起提交（同樣必須在 conn 開始寫入之前調用）
+    """
+    if reserved_number and conn.execute('''
+        SELECT 1 FROM number_reservations
+        WHERE number = ? AND reserved_by IS ?
+          AND NOT EXISTS (SELECT 1 FROM orders WHERE order_number = ?)
+    ''', (reserved_number, reserved_by, reserved_number)).fetchone():
+        cursor = conn.execute('DELETE FROM number_reservations WHERE number = ? AND reserved_by IS ?',
+                              (reserved_number, reserved_by))
+        if cursor.rowcount:
+            return reserved_number
+        conn.rollback()
+    row = conn.execute(f'''
+        DELETE FROM number_reservations
+        WHERE number = (SELECT number FROM number_reservations
+                        WHERE {FREE_RESERVATION}
+                          AND NOT EXISTS (SELECT 1 FROM orders WHERE order_number = number_reservations.number)
+                        ORDER BY number LIMIT 1)
+        RETURNING number
+    ''', (f'-{QUOTE_RESERVATION_TTL} seconds',)).fetchone()
+    if row:
+        return row[0]
+    conn.rollback()
+    return allocate_quote_number(conn)
+
+
+def generate_revision_number():
+    """生成修图编号（REV-日期-序號，每天從 001 開始）"""
+    today = datetime.now().strftime('%Y%m%d')
+    count = sequence_allocator.allocate(REVISION_SEQUENCE_PREFIX + today)
+    return f'REV-{today}-{count:03d}'
+
+
+# ==================== 數據版本（條件請求）====================
+# data_generation 只有一行：orders / status_history 每寫入一行，觸發器把 generation +1 並記下時間
+# 列表、詳情、統計、搜索 API 先讀這一行生成 ETag / Last-Modified，沒有變化時直接 304，不查 orders
+# 只改 search_key 的 UPDATE（update_search_key / fill_search_keys）不算變化：原文改動時外層的 UPDATE 已經計過一次
+
+DATA_GENERATION_TABLES = ('orders', 'status_history')
+
+
+def create_data_generation(conn):
+    """data_generation 表和各表上的 INSERT / UPDATE / DELETE 觸發器（需在 search_key 列之後創建）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL,
+            changed_at TIMESTAMP NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO data_generation (id, generation, changed_at) VALUES (1, 0, CURRENT_TIMESTAMP)
+    ''')
+    bump = '''
+            UPDATE data_generation SET generation = generation + 1, changed_at = CURRENT_TIMESTAMP WHERE id = 1;'''
+    for table in DATA_GENERATION_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            when = ''
+            if table == 'orders' and event == 'UPDATE':
+                when = f'WHEN OLD.{SEARCH_KEY_COLUMN} IS NEW.{SEARCH_KEY_COLUMN}'
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_generation_{event.lower()} AFTER {event} ON {table}
+                {when}
+                BEGIN{bump}
+                END
+            ''')
+
+
+def get_data_generation(conn):
+    """當前數據版本：(generation, changed_at)，changed_at 為 UTC 的 datetime"""
+    row = conn.execute('SELECT generation, changed_at FROM data_generation WHERE id = 1').fetchone()
+    changed_at = datetime.strptime(row['changed_at'], '%Y-%m-%d %H:%M:%S')
+    return row['generation'], changed_at
+
+
+# ==================== 增量同步（變更記錄）====================
+# order_changes 每個訂單號只保留最後一條記錄（INSERT OR REPLACE，seq 為 AUTOINCREMENT 單調遞增），
+# 由 orders / status_history 上的觸發器寫入；客戶端按 seq 游標取變化的訂單號，
+# 讀取時訂單號不在 orders 裡即為已刪除（改單號時舊號同樣視為刪除）
+# 已刪除訂單的記錄保留 ORDER_CHANGES_RETENTION_DAYS 天，清理到的最大 seq 記在 sequences 表（ORDER_CHANGES_HORIZON），
+# 游標早於它的客戶端需要全量重載
+
+ORDER_CHANGES_HORIZON = 'order_changes_horizon'
+
+
+def create_order_changes(conn):
+    """order_changes 表和 orders / status_history 上的觸發器（需在 search_key 列之後創建）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number VARCHAR(50) NOT NULL UNIQUE,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_order_changes_changed_at ON order_changes(changed_at)')
+
+    def log(ref):
+        return f'''
+            INSERT OR REPLACE INTO order_changes (order_number) VALUES ({ref}.order_number);'''
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_changes_insert AFTER INSERT ON orders
+        BEGIN{log('NEW')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_changes_delete AFTER DELETE ON orders
+        BEGIN{log('OLD')}
+        END
+    ''')
+    # 只補算 search_key 的 UPDATE 不記錄（同 data_generation）
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_changes_update AFTER UPDATE ON orders
+        WHEN OLD.{SEARCH_KEY_COLUMN} IS NEW.{SEARCH_KEY_COLUMN}
+        BEGIN
+            INSERT OR REPLACE INTO order_changes (order_number)
+            SELECT OLD.order_number WHERE OLD.order_number IS NOT NEW.order_number;{log('NEW')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_status_history_changes_insert AFTER INSERT ON status_history
+        BEGIN{log('NEW')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_status_history_changes_update AFTER UPDATE ON status_history
+        BEGIN{log('NEW')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_status_history_changes_delete AFTER DELETE ON status_history
+        BEGIN{log('OLD')}
+        END
+    ''')
+
+
+def latest_order_change(conn):
+    """當前的變更游標（最後分配的 seq，從未寫入時為 0）"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'order_changes'").fetchone()
+    return row['seq'] if row else 0
+
+
+def order_changes_horizon(conn):
+    """已清理到的 seq：游標小於它時變更可能不完整"""
+    row = conn.execute('SELECT value FROM sequences WHERE name = ?', (ORDER_CHANGES_HORIZON,)).fetchone()
+    return row['value'] if row else 0
+
+
+def get_order_changes(conn, since, limit):
+    """
+    seq > since 的變更，按 seq 順序最多 limit 條
+
+    Returns:
+        (訂單號列表, 最後一條的 seq（沒有變更時為 since）, 是否還有更多)
+    """
+    rows = conn.execute('''
+        SELECT seq, order_number FROM order_changes WHERE seq > ? ORDER BY seq LIMIT ?
+    ''', (since, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return [row['order_number'] for row in rows], (rows[-1]['seq'] if rows else since), has_more
+
+
+def prune_order_changes(conn, retention_days=ORDER_CHANGES_RETENTION_DAYS):
+    """清理已刪除訂單的過期變更記錄（調用方提交），返回清理的條數"""
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+    stale = '''
+        FROM order_changes
+        WHERE changed_at < ? AND order_number NOT IN (SELECT order_number FROM orders)
+    '''
+    horizon = conn.execute(f'SELECT MAX(seq) AS seq {stale}', (cutoff,)).fetchone()['seq']
+    if horizon is None:
+        return 0
+    conn.execute('''
+        INSERT INTO sequences (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)
+    ''', (ORDER_CHANGES_HORIZON, horizon))
+    return conn.execute(f'DELETE {stale}', (cutoff,)).rowcount
 
 
 # ==================== 新增：數據庫遷移工具 ====================
@@ -0,0 +1,68 @@
+"""
+訂單流程追蹤系統 - 搜索鍵
+把客戶名稱、產品名稱等文字折疊成統一的搜索形式，寫入時預先計算，查詢時只需折疊關鍵字：
+- 全形轉半形、大小寫折疊（NFKC + casefold，總是可用）
+- 繁體轉簡體（需要 opencc，未安裝時跳過）
+- 拼音全拼和首字母（需要 pypinyin，未安裝時跳過）
+"""
+import unicodedata
+
+try:
+    from opencc import OpenCC
+    _t2s = OpenCC('t2s')
+    HAS_OPENCC = True
+except ImportError:
+    _t2s = None
+    HAS_OPENCC = False
+
+try:
+    from pypinyin import lazy_pinyin, Style
+    HAS_PYPINYIN = True
+except ImportError:
+    lazy_pinyin = None
+    Style = None
+    HAS_PYPINYIN = False
+
+# 搜索鍵中各部分之間的分隔符（關鍵字中不會出現，避免跨字段匹配）
+KEY_SEPARATOR = '\n'
+
+
+def fold_text(text):
+    """全形轉半形、大小寫折疊、繁體轉簡體"""
+    if not text:
+        return ''
+    folded = unicodedata.normalize('NFKC', text).casefold()
+    if _t2s is not None:
+        folded = _t2s.convert(folded)
+    return folded.strip()
+
+
+def pinyin_forms(text):
+    """拼音全拼和首字母（非漢字原樣保留）；沒有漢字或未安裝 pypinyin 時返回空列表"""
+    if not HAS_PYPINYIN or not text or not any('一' <= ch <= '鿿' for ch in text):
+        return []
+    full = ''.join(lazy_pinyin(text)).casefold()
+    initials = ''.join(lazy_pinyin(text, style=Style.FIRST_LETTER)).casefold()
+    return [full.replace(' ', ''), initials.replace(' ', '')]
+
+
+def text_variants(text):
+    """一段文字的所有搜索形式（去重，保持順序）"""
+    folded = fold_text(text)
+    if not folded:
+        return []
+    variants = [folded] + pinyin_forms(folded)
+    return list(dict.fromkeys(v for v in variants if v))
+
+
+def build_search_key(*values):
+    """多個字段 -> 一個搜索鍵（各字段的所有搜索形式用分隔符連接）"""
+    parts = []
+    for value in values:
+        parts.extend(text_variants(value))
+    return KEY_SEPARATOR.join(dict.fromkeys(parts))
+
+
+def fold_query(keyword):
+    """查詢關鍵字的折疊形式（與 build_search_key 中的文字形式對應；拼音輸入本身就是小寫字母）"""
+    return fold_text(keyword)
@@ -736,8 +736,257 @@ const stageNames = {
     '生产中': '生产中'
 };
 
+// ==================== 首頁 paged 模式：服務端篩選 ====================
+// 頁面只渲染進行中訂單的第一頁；篩選條件變化時向 /tracking/orders/fragment 取服務端渲染的行
+
+let fragmentRequestSeq = 0;   // 只採用最後一次請求的結果
+let fragmentTimer = null;
+
+function isPagedIndex() {
+    const tbody = document.getElementById('ordersTableBody');
+    return !!tbody && tbody.dataset.mode === 'paged';
+}
+
+// 延遲合併：連續輸入或初始化時多次 applyFilters 只發一次請求
+function scheduleOrderFragmentLoad() {
+    clearTimeout(fragmentTimer);
+    fragmentTimer = setTimeout(() => loadOrderFragment(), 200);
+}
+
+async function loadOrderFragment(cursor) {
+    const tbody = document.getElementById('ordersTableBody');
+    if (!tbody) return;
+    
+    const lights = currentFilter.lights || { red: true, yellow: true, green: true };
+    const params = new URLSearchParams({
+        stage_group: currentFilter.stageGroup || 'all',
+        substatus: currentFilter.substatus || 'all',
+        search: (currentFilter.search || '').trim(),
+        show_completed: currentFilter.showCompleted ? '1' : '0',
+        show_cancelled: currentFilter.showCancelled ? '1' : '0'
+    });
+    if (!(lights.red && lights.yellow && lights.green)) {
+        params.set('lights', ['red', 'yellow', 'green'].filter(l => lights[l]).join(','));
+    }
+    if (cursor) {
+        params.set('cursor', cursor);
+    } else {
+        params.set('include_counts', '1');  // 第一頁順便刷新計數
+    }
+    
+    const seq = ++fragmentRequestSeq;
+    try {
+        const response = await fetch(`/tracking/orders/fragment?${params.toString()}`);
+        const result = await response.json();
+        if (seq !== fragmentRequestSeq) return;
+        if (!result.success) {
+            showToast('加载失败', result.error || '未知错误', 'error');
+            return;
+        }
+        
+        if (cursor) {
+            tbody.insertAdjacentHTML('beforeend', result.html);
+        } else {
+            tbody.innerHTML = result.html;
+        }
+        initQuickActionsForAllRows();
+        if (typeof convertSimplifiedToTraditional === 'function') {
+            convertSimplifiedToTraditional();
+        }
+        
+        const loadMore = document.getElementById('loadMoreOrders');
+        if (loadMore) {
+            loadMore.style.display = result.has_more ? '' : 'none';
+            const button = loadMore.querySelector('button');
+            if (button) button.dataset.cursor = result.next_cursor || '';
+        }
+        const emptyState = document.getElementById('emptyState');
+        if (emptyState) {
+            emptyState.style.display = tbody.querySelector('tr[data-order-number]') ? 'none' : 'block';
+        }
+        if (result.counts) {
+            applyBoardCounts(result.counts);
+        }
+    } catch (error) {
+        console.error('加载订单失败:', error);
+        showToast('加载失败', '网络错误，请稍后再试', 'error');
+    }
+}
+
+function loadMoreOrderRows(button) {
+    if (button && button.dataset.cursor) {
+        loadOrderFragment(button.dataset.cursor);
+    }
+}
+
+// 用服務端匯總的計數更新統計卡片和篩選按鈕（paged 模式下頁面上的行不是全部訂單）
+function applyBoardCounts(counts) {
+    const updateCount = (selector, count) => {
+        const elem = document.querySelector(selector);
+        if (elem) elem.textContent = count || 0;
+    };
+    const statuses = counts.statuses || {};
+    const groups = counts.groups || {};
+    const lights = counts.lights || {};
+    
+    updateCount('#totalOrders', counts.active);
+    updateCount('.stage-btn[onclick*="\'all\'"] .stage-count', counts.active);
+    ['red', 'yellow', 'green'].forEach(light => {
+        const name = light.charAt(0).toUpperCase() + light.slice(1);
+        updateCount(`#${light}Orders`, lights[light]);
+        updateCount(`#lightCount${name}`, lights[light]);
+    });
+    
+    updateCount('#draftCount', groups.draft);
+    updateCount('#samplingCount', groups.sampling);
+    updateCount('#productionCount', groups.production);
+    updateCount('#waitingConfirmCount', groups.waiting_confirm);
+    updateCount('#completedCount', statuses.COMPLETED);
+    updateCount('#cancelledCount', statuses.CANCELLED);
+    
+    const subCounts = {
+        '#new_and_quote-all-count': groups.new_and_quote,
+        '#new_and_quote-new-count': statuses.NEW_ORDER,
+        '#new_and_quote-quoting-count': statuses.QUOTE_CONFIRMING,
+        '#draft-all-count': groups.draft,
+        '#draft-making-count': statuses.DRAFT_MAKING,
+        '#draft-confirm-count': statuses.DRAFT_CONFIRMING,
+        '#draft-revise-count': statuses.DRAFT_REVISING,
+        '#sampling-all-count': groups.sampling,
+        '#sampling-pending-count': statuses.PENDING_SAMPLE,
+        '#sampling-making-count': statuses.SAMPLING,
+        '#sampling-confirm-count': statuses.SAMPLE_CONFIRMING,
+        '#sampling-revise-count': statuses.SAMPLE_REVISING,
+        '#production-all-count': groups.production,
+        '#production-pending-count': statuses.PENDING_PRODUCTION,
+        '#production-making-count': statuses.PRODUCING
+    };
+    Object.keys(subCounts).forEach(selector => updateCount(selector, subCounts[selector]));
+}
+
+// ==================== 看板推送（SSE）====================
+// 訂閱 /tracking/api/events
+// paged 模式：stats-changed 直接更新計數；order-changed / resync 重新取當前篩選的第一頁
+// full 模式：order-changed 按訂單號取服務端渲染的行就地替換（新訂單插到最前，已刪除的移除），
+// 再按當前篩選重新篩選、從頁面上的行重新計數；resync（漏了推送）時重新載入頁面
+// 頁面在後台時只記下來，切回前台再刷新
+
+let boardRefreshPending = false;
+let boardReloadPending = false;
+const pendingOrderNumbers = new Set();
+
+function refreshBoardFromEvent() {
+    if (document.hidden) {
+        boardRefreshPending = true;
+        return;
+    }
+    scheduleOrderFragmentLoad();
+}
+
+function reloadBoardFromEvent() {
+    if (document.hidden) {
+        boardReloadPending = true;
+        return;
+    }
+    location.reload();
+}
+
+function patchRowsFromEvent(event) {
+    let data;
+    try {
+        data = JSON.parse(event.data);
+    } catch (error) {
+        console.error('推送的訂單數據無效:', error);
+        return;
+    }
+    (data.order_numbers || []).forEach(number => pendingOrderNumbers.add(number));
+    if (data.old_order_number) pendingOrderNumbers.add(data.old_order_number);
+    if (!document.hidden) patchPendingOrderRows();
+}
+
+async function patchPendingOrderRows() {
+    const tbody = document.getElementById('ordersTableBody');
+    const numbers = Array.from(pendingOrderNumbers);
+    pendingOrderNumbers.clear();
+    if (!tbody || !numbers.length) return;
+    
+    try {
+        const params = new URLSearchParams({ order_numbers: numbers.join(',') });
+        const response = await fetch(`/tracking/orders/fragment?${params.toString()}`);
+        const result = await response.json();
+        if (!result.success) {
+            reloadBoardFromEvent();
+            return;
+        }
+        
+        const fresh = document.createElement('tbody');
+        fresh.innerHTML = result.html;
+        const rows = {};
+        fresh.querySelectorAll('tr[data-order-number]').forEach(row => {
+            rows[row.dataset.orderNumber] = row;
+        });
+        numbers.forEach(number => {
+            const existing = Array.from(tbody.querySelectorAll('tr[data-order-number]'))
+                .find(row => row.dataset.orderNumber === number);
+            const row = rows[number];
+            if (existing && row) {
+                existing.replaceWith(row);
+            } else if (existing) {
+                existing.remove();
+            } else if (row) {
+                tbody.prepend(row);
+            }
+        });
+        
+        initQuickActionsForAllRows();
+        if (typeof convertSimplifiedToTraditional === 'function') {
+            convertSimplifiedToTraditional();
+        }
+        applyFilters();
+        updateFilterCounts();
+    } catch (error) {
+        console.error('刷新订单行失败:', error);
+    }
+}
+
+function connectBoardEvents() {
+    if (!window.EventSource || !document.getElementById('ordersTableBody')) return;
+    const paged = isPagedIndex();
+    const source = new EventSource('/tracking/api/events');
+    source.addEventListener('order-changed', paged ? refreshBoardFromEvent : patchRowsFromEvent);
+    source.addEventListener('resync', paged ? refreshBoardFromEvent : reloadBoardFromEvent);
+    if (paged) {
+        source.addEventListener('stats-changed', event => {
+            try {
+                applyBoardCounts(JSON.parse(event.data));
+            } catch (error) {
+                console.error('推送的統計數據無效:', error);
+            }
+        });
+    }
+    document.addEventListener('visibilitychange', () => {
+        if (document.hidden) return;
+        if (boardReloadPending) {
+            location.reload();
+        } else if (boardRefreshPending) {
+            boardRefreshPending = false;
+            scheduleOrderFragmentLoad();
+        } else if (pendingOrderNumbers.size) {
+            patchPendingOrderRows();
+        }
+    });
+}
+
+document.addEventListener('DOMContentLoaded', connectBoardEvents);
+
 // 筛选函数（参考 v10.html 逻辑）
 function applyFilters() {
+    // paged 模式：篩選交給服務端
+    if (isPagedIndex()) {
+        scheduleOrderFragmentLoad();
+        return;
+    }
+    
     const rows = document.querySelectorAll('#ordersTableBody tr');
     let visibleCount = 0;
     
@@ -1342,11 +1591,18 @@ function showNewOrderModal() {
     // 預計交貨日期留空（因為訂單確認後還有很多流程要走，此時無法確定）
     document.getElementById('editExpectedDeliveryDate').value = '';
     
-    // 获取下一个询价编号提示
-    fetch('/tracking/api/orders/next-quote-number')
+    // 预留下一个询价编号（不填订单号时创建订单会使用这个编号；取消时释放）
+    releaseReservedQuoteNumber(modal);
+    fetch('/tracking/api/orders/next-quote-number', { method: 'POST' })
         .then(res => res.json())
         .then(data => {
             if (data.success) {
+                modal.setAttribute('data-reserved-number', data.next_number);
+                if (!modal.classList.contains('show')) {
+                    // 预留返回前对话框已关闭
+                    releaseReservedQuoteNumber(modal);
+                    return;
+                }
                 const hint = document.getElementById('editOrderNumberHint');
                 if (hint) {
                     hint.textContent = `💡 不填订单号将创建询价/修图需求（将自动生成：${data.next_number}）`;
@@ -3995,11 +4251,25 @@ function toggleOrderNumberEdit() {
 /**
  * 关闭编辑订单 Modal
  */
+/**
+ * 释放新增订单时预留的询价编号（号码留给下一次新增；已用于创建订单的不受影响）
+ */
+function releaseReservedQuoteNumber(modal) {
+    const number = modal.getAttribute('data-reserved-number');
+    if (!number) return;
+    modal.removeAttribute('data-reserved-number');
+    fetch(`/tracking/api/orders/next-quote-number/${encodeURIComponent(number)}`, {
+        method: 'DELETE',
+        keepalive: true
+    }).catch(err => console.error('释放询价编号失败:', err));
+}
+
 function closeEditOrderModal() {
     const modal = document.getElementById('editOrderModal');
     if (modal) {
         modal.classList.remove('show');
         modal.removeAttribute('data-mode');
+        releaseReservedQuoteNumber(modal);
     }
     
     // 重置订单号编辑状态
@@ -4055,7 +4325,10 @@ function confirmEditOrder() {
     };
     
     if (isNewMode) {
-        // 新增订单
+        // 新增订单（不填订单号时使用预留的询价编号）
+        if (!orderNumber) {
+            orderData.reserved_number = modal.getAttribute('data-reserved-number') || '';
+        }
         fetch('/tracking/api/orders', {
             method: 'POST',
         headers: { 
@@ -4068,6 +4341,9 @@ function confirmEditOrder() {
     .then(data => {
         if (data.success) {
                 showToast('创建成功', '订单已创建');
+                if (orderData.reserved_number) {
+                    modal.removeAttribute('data-reserved-number');    // 编号已用于这个订单
+                }
                 closeEditOrderModal();
                 
                 // 刷新页面
@@ -4290,6 +4566,12 @@ function updateOrderRowAfterUndo(orderNumber, orderData) {
  * 更新筛选按钮的计数（统一使用 STATUS_SYSTEM.js）
  */
 function updateFilterCounts() {
+    // paged 模式：頁面上只有部分訂單，計數隨下一次 fragment 請求從服務端刷新
+    if (typeof isPagedIndex === 'function' && isPagedIndex()) {
+        scheduleOrderFragmentLoad();
+        return;
+    }
+    
     const allRows = document.querySelectorAll('#ordersTableBody tr[data-order-number]');
     
     // 统计各状态的数量（使用 STATUS_SYSTEM.js 的阶段分组）
@@ -0,0 +1,136 @@
+"""
+訂單流程追蹤系統 - 統計服務
+總數、進行中數、各燈號 / 各狀態 / 各階段計數：燈號保存在訂單表（LIGHTS_AT_READ_TIME=0）且不按客戶分組時
+讀觸發器維護的 order_counters 表，否則在看板數據源上做一次 GROUP BY（燈號與看板一致）；
+首頁、看板片段和 /api/stats 共用，同一請求內的結果緩存在 flask.g 上
+"""
+from flask import g, has_app_context
+
+from .models import ORDERS_READ_SOURCE
+from .config import LIGHTS_AT_READ_TIME
+from .status_definitions import STATUS_KEYS, normalize_status_key
+from .status_definitions import STAGE_GROUPS as STAGE_GROUP_KEYS
+
+# flask.g 上保存統計緩存的屬性名
+_G_ATTR = '_tracking_order_stats'
+
+BOARD_LIGHTS = ('red', 'yellow', 'green')
+
+# 可選的分組維度：名稱 -> orders 表字段
+STATS_BREAKDOWNS = {
+    'factory': 'factory',
+    'customer': 'customer_name',
+}
+
+# order_counters 表能提供的分組維度
+COUNTER_BREAKDOWNS = frozenset(['factory'])
+
+_DONE_KEYS = (STATUS_KEYS['COMPLETED'], STATUS_KEYS['CANCELLED'])
+
+
+def _empty_bucket():
+    return {'total': 0, 'active': 0, 'lights': {light: 0 for light in BOARD_LIGHTS}}
+
+
+def _add_to_bucket(bucket, status_key, light, count):
+    bucket['total'] += count
+    if status_key in _DONE_KEYS:
+        return
+    bucket['active'] += count
+    if light in bucket['lights']:
+        bucket['lights'][light] += count
+
+
+def _check_breakdowns(breakdowns):
+    for name in breakdowns:
+        if name not in STATS_BREAKDOWNS:
+            raise ValueError(f'未知的統計維度: {name}')
+    return tuple(name for name in STATS_BREAKDOWNS if name in breakdowns)
+
+
+def _summarize(rows, breakdowns):
+    """(current_status, status_light, [維度...], count) 行 -> 統計結果"""
+    summary = _empty_bucket()
+    statuses = {key: 0 for key in STATUS_KEYS}
+    by_dimension = {name: {} for name in breakdowns}
+    for row in rows:
+        key = normalize_status_key(row['current_status'])
+        count = row['count']
+        statuses[key] = statuses.get(key, 0) + count
+        _add_to_bucket(summary, key, row['status_light'], count)
+        for name in breakdowns:
+            value = row[STATS_BREAKDOWNS[name]] or ''
+            bucket = by_dimension[name].setdefault(value, _empty_bucket())
+            _add_to_bucket(bucket, key, row['status_light'], count)
+
+    result = dict(summary)
+    result['statuses'] = statuses
+    result['groups'] = {
+        name: sum(statuses.get(key, 0) for key in group['status_keys'])
+        for name, group in STAGE_GROUP_KEYS.items()
+    }
+    for name in breakdowns:
+        result[f'by_{name}'] = by_dimension[name]
+    return result
+
+
+def scan_order_stats(conn, breakdowns=()):
+    """在看板數據源上做一次 GROUP BY 計算統計（O(訂單數)）"""
+    breakdowns = _check_breakdowns(breakdowns)
+    columns = ['current_status', 'status_light'] + [STATS_BREAKDOWNS[name] for name in breakdowns]
+    column_list = ', '.join(columns)
+    rows = conn.execute(f'''
+        SELECT {column_list}, COUNT(*) AS count
+        FROM {ORDERS_READ_SOURCE}
+        GROUP BY {column_list}
+    ''').fetchall()
+    return _summarize(rows, breakdowns)
+
+
+def counter_order_stats(conn, breakdowns=()):
+    """
+    讀 order_counters 計算統計（O(分組數)，只讀）
+    計數表按保存的燈號分組，只與讀 orders 表的看板一致；讀取時計算燈號的模式下到期訂單的燈號
+    要等巡檢才更新，compute_order_stats 在這個模式下不用計數表
+    """
+    breakdowns = _check_breakdowns(breakdowns)
+    if not COUNTER_BREAKDOWNS.issuperset(breakdowns):
+        raise ValueError(f'order_counters 不支持按 {", ".join(breakdowns)} 分組')
+    rows = conn.execute('''
+        SELECT current_status, status_light, factory, count FROM order_counters
+    ''').fetchall()
+    return _summarize(rows, breakdowns)
+
+
+def compute_order_stats(conn, breakdowns=()):
+    """
+    訂單統計：
+    total 總數、active 進行中、lights 進行中各燈號、statuses 各狀態、groups 各階段分組
+    breakdowns 中的每個維度（factory / customer）額外返回 by_<維度>：{值: {total, active, lights}}
+    燈號保存在訂單表且只需要 order_counters 能提供的維度時讀計數表，否則掃描看板數據源
+    """
+    breakdowns = _check_breakdowns(breakdowns)
+    if not LIGHTS_AT_READ_TIME and COUNTER_BREAKDOWNS.issuperset(breakdowns):
+        return counter_order_stats(conn, breakdowns)
+    return scan_order_stats(conn, breakdowns)
+
+
+def get_order_stats(conn, breakdowns=()):
+    """
+    請求內緩存的 compute_order_stats
+    已經算過包含所需維度的結果時直接復用（不帶維度的請求可以復用帶維度的結果）
+    """
+    wanted = frozenset(breakdowns)
+    if not has_app_context():
+        return compute_order_stats(conn, wanted)
+    cache = getattr(g, _G_ATTR, None)
+    if cache is None:
+        cache = {}
+        setattr(g, _G_ATTR, cache)
+    for computed, stats in cache.items():
+        if wanted <= computed:
+            return stats
+    stats = compute_order_stats(conn, wanted)
+    cache[wanted] = stats
+    return stats
+
@@ -11,7 +11,8 @@ from .status_definitions import (
     STATUS_FLOW_ORDER,
     QUICK_ACTIONS_MAP,
     get_status_label,
-    get_stage_group,
+    get_stage_group as get_stage_group_by_key,
+    normalize_status_key,
     get_statuses_by_stage_group,
     is_status_in_group,
     STATUS  # 向后兼容：旧的 STATUS 字典（key -> 简体中文）
@@ -48,16 +49,8 @@ def get_stage_group(status):
     - 新格式：status 是 key（如 'NEW_ORDER'）
     - 旧格式：status 是中文文字（如 '新订单'）
     """
-    # 如果是 key，直接用新函数
-    if status in STATUS_KEYS.values():
-        return get_stage_group(status)
-    
-    # 如果是中文，先找到对应的 key
-    for key, label_zh_cn in STATUS.items():
-        if label_zh_cn == status:
-            return get_stage_group(key)
-    
-    return 'all'
+    # key 或中文（包括旧的"确认中"写法）统一转成 key 再查
+    return get_stage_group_by_key(normalize_status_key(status))
 
 def get_statuses_by_stage_group(stage_group):
     """
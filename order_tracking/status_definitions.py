@@ -259,3 +259,25 @@ def is_status_in_group(status_key, group_name):
 # 这个字典用于保持向后兼容，让现有代码可以继续工作
 # 但新代码应该直接使用 STATUS_KEYS 和 get_status_label()
 STATUS = {key: get_status_label(key, 'zh_cn') for key in STATUS_KEYS.keys()}
+
+# ==================== 旧数据兼容：中文状态 -> key ====================
+# 早期版本直接在数据库中存中文（简体/繁体）；MIGRATE_STATUS_NAMES.sql 之前还用过"确认中"的写法
+LEGACY_STATUS_ALIASES = {
+    '报价确认中': 'QUOTE_CONFIRMING',
+    '報價確認中': 'QUOTE_CONFIRMING',
+    '图稿确认中': 'DRAFT_CONFIRMING',
+    '圖稿確認中': 'DRAFT_CONFIRMING',
+    '打样确认中': 'SAMPLE_CONFIRMING',
+    '打樣確認中': 'SAMPLE_CONFIRMING',
+}
+
+STATUS_LABEL_TO_KEY = dict(LEGACY_STATUS_ALIASES)
+for _key, _labels in STATUS_LABELS.items():
+    STATUS_LABEL_TO_KEY[_labels['zh_cn']] = _key
+    STATUS_LABEL_TO_KEY[_labels['zh_tw']] = _key
+
+def normalize_status_key(status):
+    """状态值（key 或中文）转成 key，无法识别时原样返回"""
+    if status in STATUS_KEYS:
+        return status
+    return STATUS_LABEL_TO_KEY.get(status, status)
@@ -0,0 +1,85 @@
+"""
+測試登入驗證緩存：Token LRU（容量、過期），用戶狀態緩存在停權 / 拒絕 / 恢復後立即失效
+"""
+import sys
+import os
+import time
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import get_db, migrate_database
+from order_tracking.auth_cache import TokenCache, token_cache, user_status_cache
+
+
+def test_token_cache():
+    """LRU 淘汰最久未用的 Token；過期的 Token 不返回"""
+    cache = TokenCache(max_size=2)
+    now = time.time()
+    cache.put('a', {'user_id': 1, 'exp': now + 60})
+    cache.put('b', {'user_id': 2, 'exp': now + 60})
+    assert cache.get('a')['user_id'] == 1
+    cache.put('c', {'user_id': 3, 'exp': now + 60})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    cache.put('expired', {'user_id': 4, 'exp': now - 1})
+    assert cache.get('expired') is None
+    assert cache.stats()['size'] <= 2
+
+    disabled = TokenCache(max_size=0)
+    disabled.put('a', {'user_id': 1})
+    assert disabled.get('a') is None
+
+
+@pytest.fixture
+def auth_caches():
+    """測試前後清空 Token 和用戶狀態緩存"""
+    user_status_cache.invalidate()
+    token_cache.clear()
+    yield
+    user_status_cache.invalidate()
+    token_cache.clear()
+
+
+def test_user_status_invalidation(app, client, auth_caches):
+    """API 客戶端的 Token 驗證走緩存；停權 / 拒絕立即生效，恢復後可繼續使用"""
+    migrate_database()
+    conn = get_db()
+    viewer_id = conn.execute("SELECT id FROM users WHERE username = 'viewer'").fetchone()['id']
+    conn.close()
+
+    api = app.test_client()
+    token = api.post('/tracking/login', json={'username': 'viewer', 'password': 'viewer123'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def call():
+        response = api.get('/tracking/api/stats', headers=headers)
+        return response.status_code, (response.get_json() or {}).get('code')
+
+    hits = token_cache.stats()['hits']
+    assert call() == (200, None)
+    assert call() == (200, None)
+    assert token_cache.stats()['hits'] > hits
+
+    assert client.post(f'/tracking/api/users/{viewer_id}/suspend').status_code == 200
+    assert call() == (403, 'SUSPENDED')
+    assert client.post(f'/tracking/api/users/{viewer_id}/restore').status_code == 200
+    assert call() == (200, None)
+    assert client.post(f'/tracking/api/users/{viewer_id}/reject').status_code == 200
+    assert call() == (403, 'REJECTED')
+
+    # 其他進程直接改數據庫：TTL 內仍用緩存，失效後讀到新狀態
+    conn = get_db()
+    conn.execute("UPDATE users SET status = 'active' WHERE id = ?", (viewer_id,))
+    conn.commit()
+    conn.close()
+    assert call() == (403, 'REJECTED')
+    user_status_cache.invalidate()
+    assert call() == (200, None)
+    assert api.get('/tracking/api/stats', headers={'Authorization': 'Bearer bad'}).status_code == 401
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
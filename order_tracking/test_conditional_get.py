@@ -0,0 +1,76 @@
+"""
+測試條件請求：列表 / 詳情 / 統計 / 搜索 API 返回 ETag，未變化時 304，
+orders 或 status_history 寫入後 ETag 改變，只補算 search_key 不算變化
+"""
+import sys
+import os
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import get_db, get_data_generation, fill_search_keys
+
+
+def test_conditional_get(client):
+    """304 不返回內容；寫入後重新返回 200 和新的 ETag"""
+    conn = get_db()
+    conn.execute('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES ('E1', '條件客戶', '2026-01-01', 'PRODUCING', '2026-01-01')
+    ''')
+    conn.commit()
+    fill_search_keys(conn)
+    conn.close()
+
+    urls = ['/tracking/api/orders', '/tracking/api/orders/E1', '/tracking/api/stats',
+            '/tracking/api/search?q=條件客戶']
+    etags = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200 and response.get_json()['success'], url
+        assert 'no-cache' in response.headers['Cache-Control']
+        etags[url] = response.headers['ETag']
+        response = client.get(url, headers={'If-None-Match': etags[url]})
+        assert response.status_code == 304 and response.data == b'', url
+        assert response.headers['ETag'] == etags[url]
+
+    # 不存在的訂單照常 404，不帶 ETag
+    response = client.get('/tracking/api/orders/NOPE')
+    assert response.status_code == 404 and 'ETag' not in response.headers
+
+    # 只補算 search_key：版本不變
+    conn = get_db()
+    before = get_data_generation(conn)
+    conn.execute("UPDATE orders SET search_key = NULL")
+    conn.commit()
+    assert fill_search_keys(conn) == 1
+    assert get_data_generation(conn) == before
+    conn.close()
+    assert client.get(urls[0], headers={'If-None-Match': etags[urls[0]]}).status_code == 304
+
+    # 寫入後所有 API 的 ETag 都失效
+    response = client.post('/tracking/api/orders/quick-update',
+                           json={'order_number': 'E1', 'action': 'cancel'})
+    assert response.status_code == 200
+    for url in urls:
+        response = client.get(url, headers={'If-None-Match': etags[url]})
+        assert response.status_code == 200 and response.headers['ETag'] != etags[url], url
+
+    # 沒有 If-None-Match 時按 If-Modified-Since 判斷
+    conn = get_db()
+    conn.execute("UPDATE data_generation SET changed_at = '2020-01-01 00:00:00'")
+    conn.commit()
+    conn.close()
+    last_modified = client.get(urls[0]).headers['Last-Modified']
+    assert client.get(urls[0], headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get(urls[0], headers={'If-Modified-Since': 'Mon, 01 Jan 2018 00:00:00 GMT'}).status_code == 200
+
+    # 未登入時不會拿到 304
+    client.post('/tracking/logout')
+    assert client.get(urls[0], headers={'If-None-Match': '*'}).status_code == 401
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,104 @@
+"""
+測試客戶名稱自動完成索引：與逐個比對的結果一致（不分大小寫 / 全形半形 / 繁簡，拼音），排序規則，
+增量更新後與重新載入的結果一致
+"""
+import sys
+import os
+import random
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.db import pool
+from order_tracking.models import get_db
+from order_tracking.customer_index import CustomerNameIndex, normalize_name
+from order_tracking.search_keys import text_variants
+
+NAMES = ['深圳華強電子', '深圳华强电子', 'ＡＣＭＥ Trading', 'Acme Toys', 'acme', '廣州恒通', '恒通貿易',
+         'Blue Ocean Ltd', 'ｂｌｕｅ ｓｋｙ', '佛山美嘉', '美嘉 Home', 'O\'Neil & Co', '東莞精密五金']
+
+
+def brute_force(counts, query):
+    q = normalize_name(query)
+    if not q:
+        return set()
+    return {name for name in counts if any(q in key for key in text_variants(name))}
+
+
+def test_customer_index(tracking_db):
+    """隨機數據：查詢結果、排序、增量更新"""
+    rng = random.Random(15)
+    conn = get_db()
+    names = NAMES + [f'{rng.choice(NAMES)}{i}' for i in range(200)]
+    orders = [(f'CI{i:05d}', rng.choice(names)) for i in range(1500)]
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date) VALUES (?, ?, '2026-01-01')
+    ''', orders)
+    conn.commit()
+
+    index = CustomerNameIndex()
+    index.load(conn)
+    counts = {}
+    for _, name in orders:
+        counts[name] = counts.get(name, 0) + 1
+
+    def check(queries):
+        for query in queries:
+            expected = brute_force(counts, query)
+            found = index.search(query, limit=len(counts) + 1)
+            assert set(found) == expected, query
+            assert len(found) == len(set(found))
+            # 前綴匹配在前；同類中訂單多的在前
+            q = normalize_name(query)
+            ranks = [(0 if any(k.startswith(q) for k in text_variants(n)) else 1, -counts[n])
+                     for n in found]
+            assert ranks == sorted(ranks), query
+
+    queries = ['acme', 'ＡＣＭＥ', 'Ａcme t', 'blue', 'BLUE S', '华强', '華強', '恒通', '精密五金',
+               '1', '12', '美嘉 h', "o'neil", '不存在']
+    for _ in range(200):
+        name = rng.choice(names)
+        start = rng.randrange(len(name))
+        queries.append(name[start:start + rng.randint(1, 6)])
+    check(queries)
+    assert index.search('', 10) == []
+    assert len(index.search('a', 3)) == 3
+
+    # 增量更新：新增、改名、刪除後與全量載入一致
+    for step in range(300):
+        action = rng.random()
+        if action < 0.4:
+            name = rng.choice(names + [f'新客戶{step}'])
+            index.order_added(name)
+            counts[name] = counts.get(name, 0) + 1
+        elif action < 0.8 and counts:
+            old = rng.choice(sorted(counts))
+            new = rng.choice(names + [f'改名客戶{step}'])
+            index.order_renamed(old, new)
+            counts[old] -= 1
+            if not counts[old]:
+                del counts[old]
+            counts[new] = counts.get(new, 0) + 1
+        elif counts:
+            name = rng.choice(sorted(counts))
+            index.order_removed(name)
+            counts[name] -= 1
+            if not counts[name]:
+                del counts[name]
+    check(queries + ['新客戶', '改名'])
+
+    rebuilt = CustomerNameIndex()
+    rebuilt._loaded_path = pool.database_path
+    for name, count in counts.items():
+        rebuilt._add(name, count)
+    for query in queries:
+        assert index.search(query, 20) == rebuilt.search(query, 20), query
+    assert index._sorted == sorted(index._sorted)
+    assert all(names for names in index._grams.values())
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,68 @@
+"""
+測試數據庫連接池：命中/未命中計數、歸還時回滾、空閒上限；init_db 成功後才標記表結構就緒
+"""
+import sys
+import os
+import sqlite3
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking import models
+from order_tracking.db import ConnectionPool, PooledConnection
+
+
+def test_connection_pool(tmp_path):
+    """測試連接池基本行為"""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=2)
+
+    # 第一次取連接：未命中；歸還後再取：命中
+    conn = PooledConnection(pool, pool.acquire())
+    conn.execute('CREATE TABLE t (v INTEGER)')
+    conn.commit()
+    conn.close()
+    conn = PooledConnection(pool, pool.acquire())
+    assert pool.hits == 1 and pool.misses == 1
+
+    # 未提交的寫入在歸還時回滾
+    conn.execute('INSERT INTO t VALUES (1)')
+    conn.close()
+    conn = PooledConnection(pool, pool.acquire())
+    assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    conn.close()
+
+    # 超過空閒上限的連接直接關閉
+    raws = [pool.acquire() for _ in range(3)]
+    for raw in raws:
+        pool.release(raw)
+    stats = pool.stats()
+    assert stats['idle'] == 2
+    assert stats['discarded'] == 1
+
+    pool.clear()
+    print(f"連接池統計: {stats}")
+
+
+def test_schema_ready_after_init(isolated_database, monkeypatch):
+    """init_db 中途失敗時不標記為已初始化，下次 get_db 重新初始化"""
+    saved_create = models.create_sequences
+
+    def broken(conn):
+        raise sqlite3.OperationalError('disk I/O error')
+    monkeypatch.setattr(models, 'create_sequences', broken)
+    with pytest.raises(sqlite3.OperationalError):
+        models.get_db()
+    assert isolated_database not in models._schema_ready
+
+    monkeypatch.setattr(models, 'create_sequences', saved_create)
+    conn = models.get_db()
+    assert isolated_database in models._schema_ready
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'sequences'").fetchone()
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,95 @@
+"""
+測試看板推送：fan-out 分發到每個訂閱者、每批 order-changed 附帶一次 stats-changed、
+緩衝區溢出時改發 resync、/api/events 在寫入 API 之後推送事件，full 模式按推送的訂單號取行
+"""
+import sys
+import os
+import re
+import json
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import get_db
+from order_tracking.events import EventBroker, order_events
+from order_tracking.config import ORDERS_MAX_PAGE_SIZE
+
+
+def test_event_broker():
+    """每個訂閱者都收到同一批事件；慢的訂閱者溢出後收到 resync"""
+    stats_calls = []
+    broker = EventBroker(buffer_size=3, max_subscribers=2, stats_provider=lambda: stats_calls.append(1) or {'total': 1})
+    fast, slow = broker.subscribe(), broker.subscribe()
+    assert broker.subscribe() is None
+
+    broker.publish('order-changed', {'order_numbers': ['A']})
+    assert fast.wait(5) == [('order-changed', {'order_numbers': ['A']}), ('stats-changed', {'total': 1})]
+    broker.publish('order-changed', {'order_numbers': ['B']})
+    assert [event for event, _ in fast.wait(5)] == ['order-changed', 'stats-changed']
+    assert len(stats_calls) == 2
+
+    # slow 一直沒有讀：第二批放不下
+    assert slow.wait(5) == [('resync', {})]
+    assert slow.wait(0.01) == []
+    broker.unsubscribe(slow)
+    assert broker.stats()['subscribers'] == 1
+
+
+def test_events_endpoint(client):
+    """快速更新之後推送 order-changed 和 stats-changed"""
+    conn = get_db()
+    conn.execute('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES ('P1', '推送客戶', '2026-01-01', 'PRODUCING', '2026-01-01')
+    ''')
+    conn.commit()
+    conn.close()
+
+    response = client.get('/tracking/api/events', buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    stream = response.response
+    assert next(stream).startswith(b'retry:')
+
+    assert client.post('/tracking/api/orders/quick-update',
+                       json={'order_number': 'P1', 'action': 'cancel'}).status_code == 200
+    messages = {}
+    while len(messages) < 2:
+        chunk = next(stream).decode('utf-8')
+        if chunk.startswith(':'):
+            continue
+        event, data = chunk.strip().split('\n')
+        messages[event[len('event: '):]] = json.loads(data[len('data: '):])
+    assert messages['order-changed']['order_numbers'] == ['P1']
+    assert messages['order-changed']['action'] == 'quick_update'
+    assert messages['stats-changed']['statuses']['CANCELLED'] == 1 and messages['stats-changed']['active'] == 0
+
+    response.close()
+    assert order_events.stats()['subscribers'] == 0
+
+
+def test_fragment_by_order_numbers(client):
+    """full 模式收到 order-changed 後按訂單號取行：不篩選（已取消的也返回），不存在的訂單沒有行"""
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES (?, '推送客戶', '2026-01-01', ?, '2026-01-01')
+    ''', [('P1', 'PRODUCING'), ('P2', 'CANCELLED'), ('P3', 'PRODUCING')])
+    conn.commit()
+    conn.close()
+
+    def fragment(numbers):
+        response = client.get('/tracking/orders/fragment', query_string={'order_numbers': ','.join(numbers)})
+        return response.status_code, response.get_json()
+
+    status, body = fragment(['P2', 'NOPE', 'P1'])
+    assert status == 200 and body['count'] == 2 and not body['has_more']
+    assert sorted(re.findall(r'<tr\b[^>]*?data-order-number="([^"]+)"', body['html'])) == ['P1', 'P2']
+    assert fragment([])[1]['count'] == 0
+    status, body = fragment([f'N{i}' for i in range(ORDERS_MAX_PAGE_SIZE + 1)])
+    assert status == 400 and body['code'] == 'TOO_MANY_ORDERS'
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,75 @@
+"""
+測試字段投影：/api/orders、/api/search 默認只返回看板卡片的列，詳情默認不含內部列，
+fields= 只接受白名單中的列；列表的排序鍵總是返回（游標翻頁不受影響）
+"""
+import sys
+import os
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import get_db, order_columns, BOARD_CARD_FIELDS, ORDER_DETAIL_FIELDS
+
+
+def test_field_projection(client):
+    """默認投影、自選字段、非法字段"""
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date,
+                            notes)
+        VALUES (?, '投影客戶', ?, 'PRODUCING', '2026-01-01', ?)
+    ''', [(f'F{i}', f'2026-01-0{i + 1}', '很長的備註' * 200) for i in range(3)])
+    conn.commit()
+    conn.close()
+
+    def get(url):
+        response = client.get(url)
+        return response.status_code, response.get_json()
+
+    # 列表 / 搜索默認只有卡片的列
+    status, body = get('/tracking/api/orders')
+    assert status == 200 and set(body['data'][0]) == set(BOARD_CARD_FIELDS)
+    for url in ('/tracking/api/search', '/tracking/api/search?q=投影客戶'):
+        status, body = get(url)
+        assert status == 200 and set(body['orders'][0]) == set(BOARD_CARD_FIELDS), url
+
+    # 自選字段：排序鍵總是帶上，游標翻頁正常
+    seen = []
+    url = '/tracking/api/orders?fields=notes,customer_name&limit=1'
+    while url:
+        status, body = get(url)
+        assert status == 200
+        assert set(body['data'][0]) == {'order_number', 'status_light', 'status_days', 'order_date', 'id',
+                                        'notes', 'customer_name'}
+        seen.append(body['data'][0]['order_number'])
+        url = (f'/tracking/api/orders?fields=notes,customer_name&limit=1&cursor={body["next_cursor"]}'
+               if body['has_more'] else None)
+    assert seen == ['F2', 'F1', 'F0']
+
+    # 詳情默認帶備註，不帶內部搜索鍵
+    status, body = get('/tracking/api/orders/F1')
+    assert set(body['data']) == set(ORDER_DETAIL_FIELDS) | {'history'} and 'search_key' not in body['data']
+    status, body = get('/tracking/api/orders/F1?fields=customer_name')
+    assert set(body['data']) == {'order_number', 'customer_name', 'history'}
+    status, body = get('/tracking/api/orders/F1?fields=*')
+    assert set(body['data']) == set(ORDER_DETAIL_FIELDS) | {'history'}
+
+    # 白名單以外的列
+    for url in ('/tracking/api/orders?fields=search_key', '/tracking/api/orders/F1?fields=password_hash',
+                '/tracking/api/search?fields=id,1;DROP'):
+        status, body = get(url)
+        assert status == 400 and body['code'] == 'INVALID_FIELDS', url
+
+    # 只取索引裡的列時走覆蓋索引，不讀表（也不讀備註的溢出頁）
+    conn = get_db()
+    plan = ' '.join(row['detail'] for row in conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT {order_columns(('order_number',))} FROM orders WHERE order_number = ?",
+        ('F1',)))
+    assert 'COVERING INDEX' in plan, plan
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
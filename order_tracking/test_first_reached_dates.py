@@ -0,0 +1,78 @@
+"""
+測試首頁階段日期：get_first_reached_dates 與舊的逐單查詢 status_history 結果一致
+（包括多次進入同一狀態、歷史日期亂序、從未進入該狀態的訂單）
+"""
+import sys
+import os
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import (get_db, get_first_reached_dates, record_milestone,
+                                   backfill_order_milestones)
+from order_tracking.status_definitions import STATUS_KEYS
+
+# 每個訂單的歷史（狀態, 日期），按寫入順序；D3 補錄了一條更早的發圖記錄
+HISTORIES = {
+    'D0': [('NEW_ORDER', '2026-01-01')],
+    'D1': [('NEW_ORDER', '2026-01-01'), ('DRAFT_CONFIRMING', '2026-01-05')],
+    'D2': [('NEW_ORDER', '2026-01-02'), ('DRAFT_CONFIRMING', '2026-01-06'), ('DRAFT_REVISING', '2026-01-08'),
+           ('DRAFT_CONFIRMING', '2026-01-10'), ('PENDING_PRODUCTION', '2026-01-12')],
+    'D3': [('NEW_ORDER', '2026-01-03'), ('DRAFT_CONFIRMING', '2026-01-09'), ('DRAFT_CONFIRMING', '2026-01-04')],
+    'D4': [],
+}
+
+
+def legacy_first_date(conn, order_number, status_key):
+    """舊寫法：每個訂單單獨查 status_history"""
+    row = conn.execute('''
+        SELECT action_date FROM status_history
+        WHERE order_number = ? AND to_status = ?
+        ORDER BY action_date ASC LIMIT 1
+    ''', (order_number, status_key)).fetchone()
+    return row['action_date'] if row else None
+
+
+def test_first_reached_dates(tracking_db):
+    """寫入路徑維護的里程碑和全量回填都與逐單查詢一致"""
+    conn = get_db()
+    for order_number, history in HISTORIES.items():
+        order_id = conn.execute('''
+            INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+            VALUES (?, '階段客戶', '2026-01-01', ?, '2026-01-01')
+        ''', (order_number, history[-1][0] if history else 'NEW_ORDER')).lastrowid
+        prev = None
+        for status_key, action_date in history:
+            conn.execute('''
+                INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator)
+                VALUES (?, ?, ?, ?, ?, 'test')
+            ''', (order_id, order_number, prev, status_key, action_date))
+            record_milestone(conn, order_id, status_key, action_date)
+            prev = status_key
+    conn.commit()
+
+    status_keys = [STATUS_KEYS['DRAFT_CONFIRMING'], STATUS_KEYS['NEW_ORDER'], STATUS_KEYS['PENDING_PRODUCTION']]
+
+    def check():
+        first_dates = get_first_reached_dates(conn, status_keys)
+        for order_number in HISTORIES:
+            for status_key in status_keys:
+                expected = legacy_first_date(conn, order_number, status_key)
+                assert first_dates.get(order_number, {}).get(status_key) == expected, (order_number, status_key)
+        return first_dates
+
+    first_dates = check()
+    assert first_dates['D3'][STATUS_KEYS['DRAFT_CONFIRMING']] == '2026-01-04'
+    assert STATUS_KEYS['DRAFT_CONFIRMING'] not in first_dates['D0'] and 'D4' not in first_dates
+    assert get_first_reached_dates(conn, []) == {}
+
+    # 全量回填（舊數據庫升級）得到相同結果
+    backfill_order_milestones(conn)
+    check()
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,146 @@
+"""
+測試首頁 paged 模式：/orders/fragment 沿游標翻頁的訂單行與 full 模式首頁按前端規則（applyFilters）篩選的結果一致，
+paged 首頁渲染第一頁和游標，include_counts 返回的計數（applyBoardCounts 使用）與訂單行一致
+"""
+import sys
+import os
+import re
+from datetime import date, timedelta
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import get_db, refresh_all_status_lights
+from order_tracking.config import INDEX_PAGE_SIZE
+from order_tracking.status_definitions import STATUS_KEYS, STAGE_GROUPS, get_status_label
+
+ROW_PATTERN = re.compile(r'data-order-number="([^"]+)"\s+data-customer-name="([^"]*)"\s+'
+                         r'data-status="([^"]*)"\s+data-light="([^"]*)"')
+DONE_GROUPS = {'completed': 'COMPLETED', 'cancelled': 'CANCELLED'}
+
+
+def parse_rows(html):
+    return [{'order_number': m.group(1), 'customer_name': m.group(2), 'status': m.group(3), 'light': m.group(4)}
+            for m in ROW_PATTERN.finditer(html)]
+
+
+def js_filter(rows, stage_group='all', substatus='all', lights=None, search='',
+              show_completed=True, show_cancelled=False):
+    """tracking.js applyFilters 的規則（full 模式在前端篩選）"""
+    shown = {'completed': show_completed, 'cancelled': show_cancelled}
+    result = []
+    for row in rows:
+        status = row['status']
+        if stage_group == 'all':
+            done = [group for group, key in DONE_GROUPS.items() if key == status]
+            if done and not shown[done[0]]:
+                continue
+        elif status not in STAGE_GROUPS[stage_group]['status_keys'] or not shown.get(stage_group, True):
+            continue
+        if substatus != 'all' and status not in (substatus, STATUS_KEYS.get(substatus)) and \
+                get_status_label(status, 'zh_cn') != substatus:
+            continue
+        if search and search.lower() not in row['order_number'].lower() + '\n' + row['customer_name'].lower():
+            continue
+        if row['light'] and lights is not None and row['light'] not in lights:
+            continue
+        result.append(row['order_number'])
+    return result
+
+
+def test_index_fragment(client):
+    """各篩選條件下 fragment 與 full 模式一致"""
+    conn = get_db()
+    today = date.today()
+    statuses = list(STATUS_KEYS)
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date,
+                            expected_delivery_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(f'G{i:03d}', '深圳華強貿易' if i % 3 else '東莞恒通禮品',
+           (today - timedelta(days=30 + i % 5)).isoformat(), statuses[i % len(statuses)],
+           (today - timedelta(days=i % 12)).isoformat(),
+           (today + timedelta(days=2)).isoformat() if i % 7 == 0 else None)
+          for i in range(INDEX_PAGE_SIZE * 2 + 30)])
+    conn.commit()
+    # 保存的燈號與讀取時計算的一致（計數表讀保存的燈號）
+    refresh_all_status_lights(conn)
+    conn.close()
+
+    response = client.get('/tracking/?mode=full')
+    assert response.status_code == 200
+    full_rows = parse_rows(response.get_data(as_text=True))
+    assert len(full_rows) == INDEX_PAGE_SIZE * 2 + 30
+    assert {row['light'] for row in full_rows} == {'red', 'yellow', 'green'}
+
+    def fragment_pages(**params):
+        """沿 next_cursor 取完所有頁"""
+        pages = []
+        while True:
+            response = client.get('/tracking/orders/fragment', query_string=params)
+            body = response.get_json()
+            assert response.status_code == 200 and body['success'], body
+            rows = parse_rows(body['html'])
+            assert body['count'] == len(rows) <= INDEX_PAGE_SIZE
+            pages.append(rows)
+            if not body['has_more']:
+                assert body['next_cursor'] is None
+                return pages
+            assert len(rows) == INDEX_PAGE_SIZE
+            params['cursor'] = body['next_cursor']
+
+    cases = [
+        {},
+        {'show_completed': False},
+        {'show_completed': False, 'show_cancelled': True},
+        {'stage_group': 'waiting_confirm'},
+        {'stage_group': 'draft', 'substatus': 'DRAFT_CONFIRMING'},
+        {'stage_group': 'sampling', 'substatus': get_status_label('SAMPLING', 'zh_cn')},
+        {'stage_group': 'production', 'lights': ['red']},
+        {'lights': ['yellow', 'green']},
+        {'lights': []},
+        {'stage_group': 'completed'},
+        {'stage_group': 'completed', 'show_completed': False},
+        {'stage_group': 'cancelled', 'show_cancelled': True},
+        {'search': '華強貿易', 'lights': ['red', 'green']},
+    ]
+    for case in cases:
+        params = {key: (','.join(value) if key == 'lights' else value) for key, value in case.items()}
+        for key in ('show_completed', 'show_cancelled'):
+            if key in params:
+                params[key] = '1' if params[key] else '0'
+        pages = fragment_pages(**params)
+        numbers = [row['order_number'] for page in pages for row in page]
+        assert len(numbers) == len(set(numbers)), case
+        assert sorted(numbers) == sorted(js_filter(full_rows, **case)), case
+    assert len(fragment_pages()) == -(-len(js_filter(full_rows)) // INDEX_PAGE_SIZE) > 1
+
+    # paged 首頁：只渲染進行中訂單的第一頁，「加載更多」帶下一頁的游標
+    first = client.get('/tracking/orders/fragment?show_completed=0').get_json()
+    html = client.get('/tracking/?mode=paged').get_data(as_text=True)
+    assert [row['order_number'] for row in parse_rows(html)] == \
+        [row['order_number'] for row in parse_rows(first['html'])]
+    assert f'data-cursor="{first["next_cursor"]}"' in html
+    assert fragment_pages(show_completed='0', cursor=first['next_cursor'])[0][0]['order_number'] not in \
+        [row['order_number'] for row in parse_rows(first['html'])]
+
+    # 看板計數（applyBoardCounts）：進行中、各燈號、各階段、各狀態
+    counts = client.get('/tracking/orders/fragment?include_counts=1').get_json()['counts']
+    active = [row for row in full_rows if row['status'] not in DONE_GROUPS.values()]
+    assert counts['active'] == len(active) and counts['total'] == len(full_rows)
+    for light in ('red', 'yellow', 'green'):
+        assert counts['lights'][light] == sum(row['light'] == light for row in active), light
+    for key in STATUS_KEYS:
+        assert counts['statuses'][key] == sum(row['status'] == key for row in full_rows), key
+    for name, group in STAGE_GROUPS.items():
+        assert counts['groups'][name] == sum(row['status'] in group['status_keys'] for row in full_rows), name
+    assert 'counts' not in client.get('/tracking/orders/fragment').get_json()
+
+    response = client.get('/tracking/orders/fragment?cursor=not-a-cursor')
+    assert response.status_code == 400 and response.get_json()['code'] == 'INVALID_CURSOR'
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
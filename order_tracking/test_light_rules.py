@@ -0,0 +1,416 @@
+"""
+測試編譯後的燈號查表：與原來的 if/elif 寫法逐一對比（隨機生成訂單）
+"""
+import sys
+import os
+import random
+import shutil
+from datetime import datetime, date, timedelta
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking import models
+from order_tracking.db import pool
+from order_tracking.models import (calculate_status_light, compile_light_rules, get_db, init_db,
+                                   update_status_light, refresh_all_status_lights, sweep_status_lights,
+                                   next_light_change_date, ORDERS_LIVE_VIEW, ORDERS_READ_SOURCE)
+from order_tracking.config import LIGHT_RULES, LIGHTS_AT_READ_TIME
+from order_tracking.status_config import STATUS
+from order_tracking.status_definitions import STATUS_KEYS, STATUS_LABELS
+
+CASES = 20000
+
+
+def legacy_calculate_status_light(order, today, light_rules=LIGHT_RULES):
+    """原來的 calculate_status_light（原樣保留，只把 today 和 LIGHT_RULES 改成參數）"""
+    current_status = order['current_status']
+    last_change = order['last_status_change_date']
+    
+    if not last_change:
+        return 'green'
+    
+    if isinstance(last_change, str):
+        last_change = datetime.strptime(last_change, '%Y-%m-%d').date()
+    
+    days = (today - last_change).days
+    
+    # 檢查是否超過預計交貨日期
+    if order['expected_delivery_date']:
+        delivery = order['expected_delivery_date']
+        if isinstance(delivery, str):
+            delivery = datetime.strptime(delivery, '%Y-%m-%d').date()
+        if today >= delivery:
+            return 'red'
+        if (delivery - today).days <= light_rules['delivery_warning_days']:
+            return 'yellow'
+    
+    # 正規化狀態：如果是中文，轉換成 key；如果已經是 key，直接使用
+    status_key = current_status
+    if current_status not in STATUS_KEYS.values():
+        # 可能是舊的中文狀態，嘗試找到對應的 key
+        for key, label_zh_cn in STATUS.items():
+            if label_zh_cn == current_status:
+                status_key = key
+                break
+        # 如果找不到，可能是未知狀態，返回綠燈
+        if status_key not in STATUS_KEYS.values():
+            return 'green'
+    
+    # 根據狀態 key 和等待天數判斷
+    if status_key == STATUS_KEYS['NEW_ORDER']:
+        rules = light_rules['new_order']
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['QUOTE_CONFIRMING']:
+        rules = light_rules['draft_confirm']  # 报价待确认使用图稿确认规则
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['DRAFT_MAKING']:
+        # 图稿制作中：内部制作阶段，阈值沿用图稿阶段规则
+        rules = light_rules['draft_confirm']
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['DRAFT_CONFIRMING']:
+        rules = light_rules['draft_confirm']
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['DRAFT_REVISING']:
+        rules = light_rules['draft_confirm']  # 图稿修改中使用图稿确认规则
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['PENDING_SAMPLE']:
+        rules = light_rules['ready_sample']
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['SAMPLING']:
+        rules = light_rules['sampling_process']
+        if rules['red_days'] and days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['SAMPLE_CONFIRMING']:
+        rules = light_rules['sampling_confirm']
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['SAMPLE_REVISING']:
+        rules = light_rules['sampling_confirm']  # 打样修改中使用打样确认规则
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['PENDING_PRODUCTION']:
+        rules = light_rules['ready_production']
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    elif status_key == STATUS_KEYS['PRODUCING']:
+        rules = light_rules['ready_production']  # 生产中待生产规则
+        if days >= rules['red_days']:
+            return 'red'
+        elif days >= rules['yellow_days']:
+            return 'yellow'
+    
+    return 'green'
+
+
+def random_date_value(rng, today):
+    """隨機日期：None / 空字串 / date / 補零或不補零的字串 / 格式錯誤的字串"""
+    kind = rng.random()
+    if kind < 0.1:
+        return rng.choice([None, ''])
+    d = today + timedelta(days=rng.randint(-40, 40))
+    if kind < 0.3:
+        return d
+    if kind < 0.35:
+        return f'{d.year}-{d.month}-{d.day}'
+    if kind < 0.37:
+        return d.strftime('%Y/%m/%d')
+    return d.isoformat()
+
+
+def random_rules(rng):
+    """隨機閾值（包括 0 和打樣中紅燈留空）"""
+    rules = {}
+    for name, value in LIGHT_RULES.items():
+        if isinstance(value, dict):
+            yellow = rng.randint(0, 10)
+            red = rng.choice([None, 0, yellow + rng.randint(0, 10)]) if name == 'sampling_process' \
+                else rng.choice([0, yellow + rng.randint(0, 10)])
+            rules[name] = dict(value, yellow_days=yellow, red_days=red)
+        else:
+            rules[name] = rng.randint(0, 5)
+    return rules
+
+
+def outcome(fn, *args):
+    """返回燈號，或拋出的異常類型（格式錯誤的日期兩邊都應該報錯）"""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return type(e)
+
+
+def check(rng, light_rules, cases):
+    statuses = list(STATUS_KEYS.values()) + list(STATUS.values()) + \
+        [labels['zh_tw'] for labels in STATUS_LABELS.values()] + ['UNKNOWN', '', None]
+    for _ in range(cases):
+        today = date(2026, 1, 1) + timedelta(days=rng.randint(0, 730))
+        order = {
+            'current_status': rng.choice(statuses),
+            'last_status_change_date': random_date_value(rng, today),
+            'expected_delivery_date': random_date_value(rng, today) if rng.random() < 0.3 else None,
+        }
+        expected = outcome(legacy_calculate_status_light, order, today, light_rules)
+        actual = outcome(calculate_status_light, order, today)
+        assert actual == expected, f'{order} @ {today}: 預期 {expected}，實際 {actual}'
+
+
+def test_light_rule_table_matches_legacy():
+    """默認配置下與原邏輯一致"""
+    check(random.Random(20260101), LIGHT_RULES, CASES)
+
+
+def test_light_rule_table_matches_legacy_random_rules(monkeypatch):
+    """隨機閾值下與原邏輯一致"""
+    rng = random.Random(7)
+    for _ in range(20):
+        light_rules = random_rules(rng)
+        monkeypatch.setattr(models, 'LIGHT_RULE_TABLE', compile_light_rules(light_rules))
+        monkeypatch.setattr(models, 'DELIVERY_WARNING_DAYS', light_rules['delivery_warning_days'])
+        check(rng, light_rules, CASES // 20)
+
+
+
+def test_bulk_refresh_matches_per_order_update(tracking_db, tmp_path):
+    """批量重算與逐單 update_status_light 結果一致，並統計各顏色變更數"""
+    rng = random.Random(11)
+    today = date.today()
+    statuses = list(STATUS_KEYS.values()) + list(STATUS.values())
+    row_path = str(tmp_path / 'row.db')
+    conn = get_db()
+    for i in range(500):
+        last_change = today + timedelta(days=rng.randint(-30, 3))
+        delivery = today + timedelta(days=rng.randint(-5, 20)) if rng.random() < 0.2 else None
+        conn.execute('''
+            INSERT INTO orders (order_number, customer_name, order_date, current_status,
+                                last_status_change_date, expected_delivery_date, status_light, status_days)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (f'LIGHT{i:04d}', '測試客戶', today.isoformat(), rng.choice(statuses),
+              last_change.isoformat() if rng.random() < 0.95 else None,
+              delivery.isoformat() if delivery else None,
+              rng.choice(['red', 'yellow', 'green']), rng.randint(0, 5)))
+    conn.commit()
+    before = {r['id']: r['status_light'] for r in conn.execute('SELECT id, status_light FROM orders')}
+    conn.close()
+    pool.clear()
+    shutil.copyfile(tracking_db, row_path)
+
+    conn = get_db()
+    stats = refresh_all_status_lights(conn)
+    bulk = conn.execute('''
+        SELECT id, status_light, status_days, last_status_change_date FROM orders ORDER BY id
+    ''').fetchall()
+    conn.close()
+
+    pool.reconfigure(database_path=row_path)
+    conn = get_db()
+    for order_id in before:
+        update_status_light(order_id, conn)
+    per_order = conn.execute('''
+        SELECT id, status_light, status_days, last_status_change_date FROM orders ORDER BY id
+    ''').fetchall()
+    conn.close()
+
+    assert [tuple(r) for r in bulk] == [tuple(r) for r in per_order]
+    assert stats['total'] == 500 and stats['errors'] == 0
+    assert stats['date_fixed'] > 0
+    expected_changed = {'red': 0, 'yellow': 0, 'green': 0}
+    for row in bulk:
+        if row['status_light'] != before[row['id']]:
+            expected_changed[row['status_light']] += 1
+    assert stats['changed'] == expected_changed
+    assert sum(stats['lights'].values()) == 500
+
+
+
+def test_next_light_change_date():
+    """下一次變化日期之前燈號不變、當天一定變化；返回 None 時之後都不變"""
+    rng = random.Random(3)
+    statuses = list(STATUS_KEYS.values()) + list(STATUS.values()) + ['UNKNOWN', None]
+    for _ in range(3000):
+        today = date(2026, 1, 1) + timedelta(days=rng.randint(0, 365))
+        order = {
+            'current_status': rng.choice(statuses),
+            'last_status_change_date': (today - timedelta(days=rng.randint(-3, 30))).isoformat()
+            if rng.random() < 0.95 else None,
+            'expected_delivery_date': (today + timedelta(days=rng.randint(-5, 30))).isoformat()
+            if rng.random() < 0.3 else None,
+        }
+        current = calculate_status_light(order, today)
+        next_change = next_light_change_date(order, today)
+        horizon = next_change if next_change else today + timedelta(days=90)
+        day = today + timedelta(days=1)
+        while day < horizon:
+            assert calculate_status_light(order, day) == current, (order, today, day)
+            day += timedelta(days=1)
+        if next_change:
+            assert next_change > today
+            assert calculate_status_light(order, next_change) != current, (order, today, next_change)
+
+
+def test_sweep_only_touches_due_orders(tracking_db, tmp_path):
+    """巡檢後的燈號與全表重算一致，但只重算到期的訂單"""
+    rng = random.Random(5)
+    start = date(2026, 3, 1)
+    statuses = list(STATUS_KEYS.values())
+    full_path = str(tmp_path / 'full.db')
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES (?, '測試客戶', ?, ?, ?)
+    ''', [(f'SWEEP{i:04d}', start.isoformat(), rng.choice(statuses),
+           (start - timedelta(days=rng.randint(0, 20))).isoformat()) for i in range(400)])
+    conn.commit()
+    refresh_all_status_lights(conn, today=start)
+    conn.close()
+    pool.clear()
+    shutil.copyfile(tracking_db, full_path)
+
+    swept = 0
+    conn = get_db()
+    for offset in range(1, 15):
+        swept += sweep_status_lights(conn, today=start + timedelta(days=offset))['total']
+    sweep_lights = conn.execute('SELECT id, status_light FROM orders ORDER BY id').fetchall()
+    conn.close()
+
+    pool.reconfigure(database_path=full_path)
+    conn = get_db()
+    refresh_all_status_lights(conn, today=start + timedelta(days=14))
+    full_lights = conn.execute('SELECT id, status_light FROM orders ORDER BY id').fetchall()
+    conn.close()
+
+    assert [tuple(r) for r in sweep_lights] == [tuple(r) for r in full_lights]
+    assert swept < 400 * 14 / 4
+
+
+
+def test_orders_live_view_matches_python(tracking_db):
+    """orders_live 視圖在 SQL 中算出的燈號、天數與 calculate_status_light / update_status_light 一致"""
+    rng = random.Random(9)
+    today = date.today()
+    statuses = list(STATUS_KEYS.values()) + list(STATUS.values()) + \
+        [labels['zh_tw'] for labels in STATUS_LABELS.values()] + ['UNKNOWN']
+    conn = get_db()
+    orders = []
+    for i in range(2000):
+        last_change = rng.choice([None, '', (today - timedelta(days=rng.randint(-5, 40))).isoformat()])
+        delivery = rng.choice([None, '', (today + timedelta(days=rng.randint(-10, 10))).isoformat()])
+        orders.append((f'LIVE{i:05d}', rng.choice(statuses), last_change, delivery))
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status,
+                            last_status_change_date, expected_delivery_date, status_light, status_days)
+        VALUES (?, '測試客戶', '2026-01-01', ?, ?, ?, 'green', 0)
+    ''', orders)
+    conn.commit()
+    rows = conn.execute(f'SELECT * FROM {ORDERS_LIVE_VIEW} ORDER BY id').fetchall()
+    conn.close()
+
+    assert len(rows) == len(orders)
+    for row in rows:
+        assert row['status_light'] == calculate_status_light(row, today), dict(row)
+        expected_days = 0
+        if row['last_status_change_date']:
+            expected_days = max(0, (today - date.fromisoformat(row['last_status_change_date'])).days)
+        assert row['status_days'] == expected_days, dict(row)
+
+
+
+def test_init_db_refreshes_lights_when_rules_change(tracking_db, monkeypatch):
+    """LIGHT_RULES 改了之後 init_db 全表重算存儲的燈號和下一次變化日期；規則不變時不重算"""
+    today = date.today()
+    conn = get_db()
+    conn.execute('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES ('RULE1', '測試客戶', '2026-01-01', ?, ?)
+    ''', (STATUS_KEYS['PRODUCING'], (today - timedelta(days=1)).isoformat()))
+    conn.commit()
+    refresh_all_status_lights(conn)
+    before = tuple(conn.execute(
+        "SELECT status_light, next_light_change_date, updated_at FROM orders WHERE order_number = 'RULE1'").fetchone())
+    conn.close()
+    assert before[0] == 'green'
+
+    init_db()
+    conn = get_db()
+    assert tuple(conn.execute(
+        "SELECT status_light, next_light_change_date, updated_at FROM orders WHERE order_number = 'RULE1'"
+    ).fetchone()) == before
+    conn.close()
+
+    table = dict(models.LIGHT_RULE_TABLE)
+    table[STATUS_KEYS['PRODUCING']] = (1, 2)
+    monkeypatch.setattr(models, 'LIGHT_RULE_TABLE', table)
+    init_db()
+    conn = get_db()
+    row = conn.execute("SELECT * FROM orders WHERE order_number = 'RULE1'").fetchone()
+    assert row['status_light'] == 'yellow'
+    assert row['next_light_change_date'] == (today + timedelta(days=1)).isoformat()
+    live = conn.execute(f"SELECT status_light FROM {ORDERS_LIVE_VIEW} WHERE order_number = 'RULE1'").fetchone()
+    assert live['status_light'] == 'yellow'
+    conn.close()
+
+
+
+def test_order_detail_matches_board(client):
+    """詳情與看板讀同一個數據源：存儲的燈號過時時兩者都返回讀取時算出的燈號"""
+    stale_change = (date.today() - timedelta(days=30)).isoformat()
+    conn = get_db()
+    conn.execute('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date,
+                            status_light, status_days)
+        VALUES ('STALE1', '測試客戶', '2026-01-01', ?, ?, 'green', 0)
+    ''', (STATUS_KEYS['PRODUCING'], stale_change))
+    conn.commit()
+    expected = conn.execute(f'''
+        SELECT status_light, status_days FROM {ORDERS_READ_SOURCE} WHERE order_number = 'STALE1'
+    ''').fetchone()
+    conn.close()
+    if LIGHTS_AT_READ_TIME:
+        assert expected['status_light'] == 'red' and expected['status_days'] == 30
+
+    detail = client.get('/tracking/api/orders/STALE1').get_json()['data']
+    board = client.get('/tracking/api/orders').get_json()['data']
+    assert [(o['status_light'], o['status_days']) for o in board] == [tuple(expected)]
+    assert (detail['status_light'], detail['status_days']) == tuple(expected)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
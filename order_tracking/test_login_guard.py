@@ -0,0 +1,100 @@
+"""
+測試登入保護：滑動窗口限流（用戶名按失敗次數、IP 按嘗試次數），超限時不驗證密碼直接 429，
+登入成功時舊參數的密碼哈希按當前配置重新計算
+"""
+import sys
+import os
+import importlib
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from order_tracking.models import get_db
+from order_tracking.login_guard import SlidingWindowLimiter, LoginGuard, login_guard, needs_rehash, hash_password
+
+# 包裡的 login_guard 名稱是實例，模塊從 sys.modules 取
+guard_module = importlib.import_module('order_tracking.login_guard')
+
+
+def test_sliding_window():
+    """窗口內達到上限後拒絕，最早的記錄滑出窗口後恢復"""
+    limiter = SlidingWindowLimiter(limit=3, window=10)
+    for t in (0, 1, 2):
+        assert limiter.retry_after('k', now=t) == 0
+        limiter.hit('k', now=t)
+    assert limiter.retry_after('k', now=5) == 5
+    assert limiter.retry_after('other', now=5) == 0
+    assert limiter.retry_after('k', now=10.5) == 0
+    limiter.reset('k')
+    assert limiter.retry_after('k', now=2) == 0
+
+    # 用戶名不分大小寫；成功登入清除失敗計數；IP 計的是嘗試次數
+    guard = LoginGuard(user_limit=2, user_window=60, ip_limit=4, ip_window=60)
+    assert guard.check('Alice', '1.1.1.1', now=0) == 0
+    guard.failed('Alice', now=0)
+    guard.failed('alice', now=1)
+    assert guard.check('ALICE', '2.2.2.2', now=2) > 0
+    guard.succeeded('alice')
+    assert guard.check('alice', '1.1.1.1', now=3) == 0
+    assert guard.check('bob', '1.1.1.1', now=3) == 0
+    assert guard.check('carol', '1.1.1.1', now=3) == 0
+    assert guard.check('dave', '1.1.1.1', now=3) > 0
+
+    # 鍵太多時清掉過期的
+    small = SlidingWindowLimiter(limit=1, window=1, max_keys=2)
+    small.hit('a', now=0)
+    small.hit('b', now=0)
+    small.hit('c', now=5)
+    assert small.retry_after('c', now=5) > 0 and len(small._hits) == 1
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    """當前哈希方法設為 pbkdf2:sha256:1000，測試前後清空登入限流記錄"""
+    monkeypatch.setattr(guard_module, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    login_guard.clear()
+    yield login_guard
+    login_guard.clear()
+
+
+def test_login_rate_limit_and_rehash(app, guard):
+    """超限時 429（不驗證密碼）；pbkdf2 舊哈希登入後改為當前配置的方法"""
+    conn = get_db()
+    conn.execute("UPDATE users SET password_hash = ? WHERE username = 'viewer'",
+                 (generate_password_hash('viewer123', method='pbkdf2:sha256:500'),))
+    conn.commit()
+    conn.close()
+    client = app.test_client()
+
+    def login(username, password):
+        response = client.post('/tracking/login', json={'username': username, 'password': password})
+        return response.status_code, response.get_json().get('code')
+
+    def viewer_hash():
+        conn = get_db()
+        value = conn.execute("SELECT password_hash FROM users WHERE username = 'viewer'").fetchone()[0]
+        conn.close()
+        return value
+
+    assert needs_rehash(viewer_hash())
+    assert login('viewer', 'viewer123')[0] == 200
+    assert viewer_hash().startswith('pbkdf2:sha256:1000$') and not needs_rehash(viewer_hash())
+    assert login('viewer', 'viewer123')[0] == 200
+
+    for _ in range(login_guard.users.limit):
+        assert login('admin', 'wrong') == (401, 'INVALID_CREDENTIALS')
+    # 已超限：正確密碼也不驗證
+    response = client.post('/tracking/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 429 and response.headers['Retry-After']
+    assert response.get_json()['code'] == 'TOO_MANY_ATTEMPTS'
+    # 其他用戶名不受影響
+    assert login('viewer', 'viewer123')[0] == 200
+    assert hash_password('x').startswith('pbkdf2:sha256:1000$')
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
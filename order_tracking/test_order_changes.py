@@ -0,0 +1,85 @@
+"""
+測試增量同步：orders / status_history 的寫入、改單號、刪除都記錄到 order_changes，
+游標之後只返回變化過的訂單；清理後早於清理位置的游標要求全量重載
+"""
+import sys
+import os
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import get_db, fill_search_keys, latest_order_change, prune_order_changes
+
+
+def test_order_changes(client):
+    """新增、更新、改單號、刪除後按游標取增量"""
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES (?, '同步客戶', '2026-01-01', 'PRODUCING', '2026-01-01')
+    ''', [(f'C{i}',) for i in range(5)])
+    conn.commit()
+    fill_search_keys(conn)
+    conn.close()
+
+    def changes(since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = client.get('/tracking/api/orders/changes', query_string=params)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+
+    start = changes()
+    assert start['reset'] and start['cursor'] == '5'
+    body = changes(start['cursor'])
+    assert not body['reset'] and body['upserted'] == [] and body['cursor'] == start['cursor']
+
+    # 補算 search_key 不算變化
+    conn = get_db()
+    conn.execute('UPDATE orders SET search_key = NULL')
+    conn.commit()
+    assert fill_search_keys(conn) == 5
+    assert latest_order_change(conn) == 5
+    conn.close()
+
+    assert client.post('/tracking/api/orders/quick-update',
+                       json={'order_number': 'C1', 'action': 'cancel'}).status_code == 200
+    assert client.post('/tracking/api/orders/C2/change-number',
+                       json={'new_order_number': 'C2X', 'customer_name': '同步客戶',
+                             'order_date': '2026-01-01'}).get_json()['success']
+    assert client.delete('/tracking/api/orders/C3', json={'confirm_order_number': 'C3'}).status_code == 200
+
+    body = changes(start['cursor'])
+    assert sorted(body['upserted']) == ['C1', 'C2X'] and sorted(body['deleted']) == ['C2', 'C3']
+    assert {order['order_number'] for order in body['orders']} == {'C1', 'C2X'}
+    assert not body['has_more']
+
+    # 分頁：游標接著取，不重複不遺漏
+    seen = []
+    cursor = start['cursor']
+    while True:
+        body = changes(cursor, limit=1)
+        seen += body['upserted'] + body['deleted']
+        cursor = body['cursor']
+        if not body['has_more']:
+            break
+    assert sorted(seen) == ['C1', 'C2', 'C2X', 'C3']
+    assert changes(cursor)['upserted'] == []
+
+    # 清理已刪除訂單的舊記錄之後，早於清理位置的游標需要全量重載
+    conn = get_db()
+    conn.execute("UPDATE order_changes SET changed_at = '2000-01-01 00:00:00'")
+    assert prune_order_changes(conn) == 2
+    conn.commit()
+    conn.close()
+    assert changes(start['cursor'])['reset']
+    assert not changes(cursor)['reset']
+
+    response = client.get('/tracking/api/orders/changes?since=abc')
+    assert response.status_code == 400 and response.get_json()['code'] == 'INVALID_CURSOR'
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
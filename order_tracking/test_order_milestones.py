@@ -0,0 +1,94 @@
+"""
+測試訂單階段里程碑：新建、快速更新、更新狀態、撤銷、編輯歷史、訂單導入和全量回填之後，
+order_milestones 與 status_history 的 MIN / MAX / COUNT 一致
+"""
+import sys
+import os
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import import_orders
+from order_tracking.models import get_db, backfill_order_milestones
+
+
+def milestones(conn):
+    return {(row['order_id'], row['status_key']): (row['first_at'], row['last_at'], row['count'])
+            for row in conn.execute('SELECT order_id, status_key, first_at, last_at, count FROM order_milestones')}
+
+
+def expected_milestones(conn):
+    return {(row['order_id'], row['to_status']): (row['first_at'], row['last_at'], row['count'])
+            for row in conn.execute('''
+                SELECT order_id, to_status, MIN(action_date) AS first_at, MAX(action_date) AS last_at, COUNT(*) AS count
+                FROM status_history GROUP BY order_id, to_status
+            ''')}
+
+
+def test_order_milestones(client):
+    """各寫入路徑之後里程碑與歷史一致"""
+
+    def check():
+        conn = get_db()
+        actual, expected = milestones(conn), expected_milestones(conn)
+        conn.close()
+        assert actual == expected, (actual, expected)
+        return actual
+
+    def post(url, payload):
+        response = client.post(url, json=payload)
+        assert response.status_code in (200, 201), response.get_json()
+        return response.get_json()
+
+    order_id = post('/tracking/api/orders', {'order_number': 'M1', 'customer_name': '里程碑客戶',
+                                             'order_date': '2026-01-01'})['data']['id']
+    check()
+
+    for action, action_date in (('draft_sent', '2026-01-05'), ('draft_revise', '2026-01-07'),
+                                ('draft_modified', '2026-01-09')):
+        post('/tracking/api/orders/quick-update', {'order_number': 'M1', 'action': action, 'date': action_date})
+    post('/tracking/api/orders/M1/status', {'new_status': 'PENDING_SAMPLE', 'action_date': '2026-01-12'})
+    result = check()
+    assert result[(order_id, 'DRAFT_CONFIRMING')] == ('2026-01-05', '2026-01-09', 2)
+    assert result[(order_id, 'PENDING_SAMPLE')] == ('2026-01-12', '2026-01-12', 1)
+
+    # 撤銷最後一步：該狀態的里程碑刪除；再撤銷一次：發圖次數減一
+    post('/tracking/api/orders/M1/undo-last-step', {'reason': '測試'})
+    assert (order_id, 'PENDING_SAMPLE') not in check()
+    post('/tracking/api/orders/M1/undo-last-step', {})
+    assert check()[(order_id, 'DRAFT_CONFIRMING')] == ('2026-01-05', '2026-01-05', 1)
+
+    # 編輯歷史日期
+    conn = get_db()
+    history_id = conn.execute('''
+        SELECT id FROM status_history WHERE order_number = 'M1' AND to_status = 'DRAFT_CONFIRMING'
+    ''').fetchone()['id']
+    conn.close()
+    response = client.put(f'/tracking/api/orders/M1/history/{history_id}',
+                          json={'action_date': '2026-01-03', 'notes': '補錄'})
+    assert response.status_code == 200
+    assert check()[(order_id, 'DRAFT_CONFIRMING')] == ('2026-01-03', '2026-01-03', 1)
+
+    # 訂單導入腳本：歷史和里程碑在同一事務中寫入
+    import_orders.import_orders()
+    conn = get_db()
+    imported = conn.execute("SELECT COUNT(*) AS count FROM orders WHERE order_number != 'M1'").fetchone()
+    conn.close()
+    assert imported['count'] > 0
+    result = check()
+    assert result[(2, 'DRAFT_CONFIRMING')] == ('2024-05-30', '2024-05-30', 1)
+
+    # 全量回填：修復被改壞的里程碑
+    conn = get_db()
+    conn.execute("UPDATE order_milestones SET count = 99, first_at = '2000-01-01'")
+    conn.execute("DELETE FROM order_milestones WHERE status_key = 'NEW_ORDER'")
+    conn.commit()
+    conn.close()
+    count = backfill_order_milestones()
+    assert count == len(check())
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
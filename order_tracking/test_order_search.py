@@ -0,0 +1,123 @@
+"""
+測試訂單全文搜索：FTS5 trigram 結果與 LIKE '%關鍵字%' 一致（隨機關鍵字），增刪改後觸發器保持索引同步
+"""
+import sys
+import os
+import random
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking import models
+from order_tracking.models import (get_db, order_search_clause, search_orders, fill_search_keys,
+                                   use_fts_search, ORDERS_FTS_COLUMNS, ORDERS_FTS_TABLE, FTS_MIN_QUERY_LENGTH)
+from order_tracking.search_keys import fold_query
+
+ORDERS = 2000
+CUSTOMERS = ['深圳華強', '廣州恒通貿易', 'Acme Trading', 'acme toys', '東莞"精密"五金', '佛山美嘉', 'Blue Ocean Ltd']
+PRODUCTS = ['不鏽鋼保溫杯', '硅膠手機殼', 'PVC 鑰匙扣', '帆布袋', 'Enamel Pin']
+FACTORIES = ['一廠', '二廠', 'Factory-A', None]
+
+
+def random_order(rng, i):
+    return (
+        f'KC{rng.randint(2020, 2026)}{i:05d}',
+        rng.choice(CUSTOMERS),
+        rng.choice(PRODUCTS),
+        f'P-{rng.randint(100, 999)}',
+        rng.choice([None, f'PT{rng.randint(10, 99)}']),
+        rng.choice(FACTORIES),
+        rng.choice([None, '', '加急 客戶要求提前', 'repeat order 返單'])
+    )
+
+
+def like_ids(conn, keyword, columns=ORDERS_FTS_COLUMNS):
+    where = ' OR '.join(f'{col} LIKE ?' for col in columns)
+    return {row[0] for row in conn.execute(f'SELECT id FROM orders WHERE {where}',
+                                           [f'%{keyword}%'] * len(columns))}
+
+
+def search_key_ids(conn, keyword):
+    """原文 LIKE 命中的訂單 + 搜索鍵命中折疊後關鍵字的訂單（走索引時折疊後不足 3 個字符不查搜索鍵）"""
+    ids = like_ids(conn, keyword)
+    folded = fold_query(keyword)
+    if use_fts_search(keyword) and len(folded) < FTS_MIN_QUERY_LENGTH:
+        return ids
+    return ids | {row[0] for row in conn.execute('SELECT id FROM orders WHERE search_key LIKE ?',
+                                                   (f'%{folded}%',))}
+
+
+def clause_ids(conn, keyword, columns=ORDERS_FTS_COLUMNS):
+    where, params = order_search_clause(keyword, columns)
+    return {row[0] for row in conn.execute(f'SELECT id FROM orders WHERE {where}', params)}
+
+
+def random_keywords(conn, rng, count):
+    """從現有數據中截取子串作為關鍵字（長度 1~8），再加幾個不存在的"""
+    rows = conn.execute(f"SELECT {', '.join(ORDERS_FTS_COLUMNS)} FROM orders").fetchall()
+    keywords = ['不存在的關鍵字', 'zzz', '"精密"', 'ACME']
+    while len(keywords) < count:
+        value = rng.choice([v for v in rng.choice(rows) if v])
+        start = rng.randrange(len(value))
+        keywords.append(value[start:start + rng.randint(1, 8)].strip() or value)
+    return keywords
+
+
+def test_fts_matches_like(tracking_db):
+    """全文索引與 LIKE 結果一致，增刪改後依然一致"""
+    assert models.ORDER_SEARCH_FTS, '當前 SQLite 不支持 FTS5 trigram'
+    rng = random.Random(14)
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, product_name, product_code, pattern_code,
+                            factory, notes, order_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, '2026-01-01')
+    ''', [random_order(rng, i) for i in range(ORDERS)])
+    conn.commit()
+    fill_search_keys(conn)
+
+    def check_all():
+        for keyword in random_keywords(conn, rng, 120):
+            assert clause_ids(conn, keyword) == like_ids(conn, keyword), keyword
+            assert clause_ids(conn, keyword, ['customer_name']) == \
+                like_ids(conn, keyword, ['customer_name']), keyword
+            found = {row['id'] for row in search_orders(conn, keyword, limit=ORDERS)}
+            assert found == search_key_ids(conn, keyword), keyword
+            assert clause_ids(conn, keyword, None) == found, keyword
+        conn.execute(f"INSERT INTO {ORDERS_FTS_TABLE} ({ORDERS_FTS_TABLE}) VALUES ('integrity-check')")
+
+    check_all()
+
+    # 增刪改後觸發器同步索引
+    ids = [row[0] for row in conn.execute('SELECT id FROM orders')]
+    for step in range(500):
+        action = rng.random()
+        if action < 0.6:
+            conn.execute('UPDATE orders SET customer_name = ?, notes = ? WHERE id = ?',
+                         (rng.choice(CUSTOMERS) + rng.choice(['', '分公司']), f'備註{step}', rng.choice(ids)))
+        elif action < 0.8:
+            conn.execute('DELETE FROM orders WHERE id = ?', (rng.choice(ids),))
+        else:
+            values = random_order(rng, ORDERS + step)
+            conn.execute('''
+                INSERT INTO orders (order_number, customer_name, product_name, product_code, pattern_code,
+                                    factory, notes, order_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, '2026-01-01')
+            ''', values)
+    conn.commit()
+    check_all()
+
+    # 單號命中排在只有備註命中的訂單前面（bm25 列權重）
+    conn.execute('''
+        INSERT INTO orders (order_number, customer_name, notes, order_date)
+        VALUES ('RANK001', '排序測試', NULL, '2020-01-01'), ('RANK999', '排序測試', 'see RANK001', '2026-12-31')
+    ''')
+    conn.commit()
+    assert [row['order_number'] for row in search_orders(conn, 'RANK001')] == ['RANK001', 'RANK999']
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
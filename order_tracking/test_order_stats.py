@@ -0,0 +1,217 @@
+"""
+測試統計服務：單次 GROUP BY / 計數表的結果與逐項 COUNT(*) 一致，分組計數加總等於總數，請求內緩存復用；
+觸發器在隨機增刪改後保持計數表準確，一致性檢查能發現並修復偏差；讀統計不寫數據庫，燈號計數與看板一致
+"""
+import sys
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from order_tracking.models import (get_db, refresh_all_status_lights, check_order_counters,
+                                   get_data_generation, ORDERS_READ_SOURCE)
+from order_tracking import stats as stats_module
+from order_tracking.config import LIGHTS_AT_READ_TIME
+from order_tracking.stats import compute_order_stats, get_order_stats, scan_order_stats, counter_order_stats
+from order_tracking.status_config import STATUS
+from order_tracking.status_definitions import STATUS_KEYS, STATUS_LABELS
+
+ORDERS = 3000
+
+
+def seed_orders(conn, rng):
+    """隨機訂單：狀態混用 key / 簡體 / 繁體，部分工廠為空；寫入後按今天重算燈號"""
+    today = date.today()
+    statuses = list(STATUS_KEYS.values()) + list(STATUS.values()) + \
+        [labels['zh_tw'] for labels in STATUS_LABELS.values()]
+    rows = []
+    for i in range(ORDERS):
+        rows.append((
+            f'STAT{i:05d}',
+            f'客戶{rng.randint(0, 30)}',
+            rng.choice(statuses),
+            (today - timedelta(days=rng.randint(0, 40))).isoformat(),
+            rng.choice([None, '', '工廠A', '工廠B', '工廠C']),
+            rng.choice(['red', 'yellow', 'green'])
+        ))
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status,
+                            last_status_change_date, factory, status_light)
+        VALUES (?, ?, '2026-01-01', ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    refresh_all_status_lights(conn)
+
+
+def legacy_stats(conn):
+    """原來 /api/stats 的逐項 COUNT(*)"""
+    done = (STATUS_KEYS['COMPLETED'], STATUS['COMPLETED'], STATUS_LABELS['COMPLETED']['zh_tw'],
+            STATUS_KEYS['CANCELLED'], STATUS['CANCELLED'], STATUS_LABELS['CANCELLED']['zh_tw'])
+    not_done = f"current_status NOT IN ({', '.join(['?'] * len(done))})"
+    count = lambda sql, params=(): conn.execute(sql, params).fetchone()[0]
+    return {
+        'total': count('SELECT COUNT(*) FROM orders'),
+        'active': count(f'SELECT COUNT(*) FROM orders WHERE {not_done}', done),
+        'lights': {
+            light: count(f'SELECT COUNT(*) FROM {ORDERS_READ_SOURCE} WHERE status_light = ? AND {not_done}',
+                         (light,) + done)
+            for light in ('red', 'yellow', 'green')
+        }
+    }
+
+
+def test_order_stats(tracking_db):
+    """單次掃描統計與逐項查詢一致"""
+    rng = random.Random(11)
+    conn = get_db()
+    seed_orders(conn, rng)
+
+    stats = compute_order_stats(conn, ('factory', 'customer'))
+    expected = legacy_stats(conn)
+    # 計數表與掃描結果一致
+    assert counter_order_stats(conn, ('factory',)) == scan_order_stats(conn, ('factory',))
+    assert compute_order_stats(conn) == scan_order_stats(conn)
+    assert stats['total'] == expected['total'] == ORDERS
+    assert stats['active'] == expected['active']
+    assert stats['lights'] == expected['lights']
+    assert sum(stats['statuses'].values()) == ORDERS
+
+    # 各分組維度加總等於總數
+    for name in ('factory', 'customer'):
+        buckets = stats[f'by_{name}'].values()
+        assert sum(b['total'] for b in buckets) == stats['total']
+        assert sum(b['active'] for b in buckets) == stats['active']
+        for light in ('red', 'yellow', 'green'):
+            assert sum(b['lights'][light] for b in buckets) == stats['lights'][light]
+    # NULL 和空字符串工廠歸到同一組
+    expected_blank = conn.execute(
+        "SELECT COUNT(*) FROM orders WHERE factory IS NULL OR factory = ''").fetchone()[0]
+    assert stats['by_factory'][''] == compute_order_stats(conn, ('factory',))['by_factory']['']
+    assert stats['by_factory']['']['total'] == expected_blank
+
+    try:
+        compute_order_stats(conn, ('warehouse',))
+        assert False, '未知維度應報錯'
+    except ValueError:
+        pass
+    try:
+        counter_order_stats(conn, ('customer',))
+        assert False, '計數表不支持按客戶分組'
+    except ValueError:
+        pass
+    conn.close()
+
+    # 請求內緩存：帶維度的結果可給不帶維度的調用復用
+    app = Flask(__name__)
+    with app.app_context():
+        conn = get_db()
+        first = get_order_stats(conn, ['factory'])
+        assert get_order_stats(conn) is first
+        assert get_order_stats(conn, ['customer']) is not first
+        conn.close()
+
+
+def test_order_counters_triggers(tracking_db):
+    """隨機增刪改訂單後計數表仍準確；手工改壞後能檢查出偏差並修復"""
+    rng = random.Random(12)
+    conn = get_db()
+    seed_orders(conn, rng)
+
+    statuses = list(STATUS_KEYS.values()) + [STATUS['PRODUCING'], '']
+    ids = [row['id'] for row in conn.execute('SELECT id FROM orders')]
+    for step in range(2000):
+        order_id = rng.choice(ids)
+        action = rng.random()
+        if action < 0.5:
+            conn.execute('UPDATE orders SET current_status = ? WHERE id = ?',
+                         (rng.choice(statuses), order_id))
+        elif action < 0.7:
+            conn.execute('UPDATE orders SET factory = ?, status_light = ? WHERE id = ?',
+                         (rng.choice([None, '', '工廠A', '工廠D']),
+                          rng.choice(['', 'red', 'green']), order_id))
+        elif action < 0.8:
+            # 不涉及計數列的更新不應改變計數
+            conn.execute('UPDATE orders SET notes = ? WHERE id = ?', (f'note{step}', order_id))
+        elif action < 0.9:
+            conn.execute('DELETE FROM orders WHERE id = ?', (order_id,))
+        else:
+            conn.execute('''
+                INSERT INTO orders (order_number, customer_name, order_date, current_status, factory)
+                VALUES (?, '新客戶', '2026-01-01', ?, ?)
+            ''', (f'NEW{step:05d}', rng.choice(statuses[:-1]), rng.choice([None, '工廠A'])))
+            ids.append(conn.execute('SELECT last_insert_rowid()').fetchone()[0])
+    conn.commit()
+
+    report = check_order_counters(conn)
+    assert report['drift'] == [], report['drift'][:5]
+    total = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+    assert conn.execute('SELECT SUM(count) FROM order_counters').fetchone()[0] == total
+    assert conn.execute('SELECT COUNT(*) FROM order_counters WHERE count <= 0').fetchone()[0] == 0
+
+    # 手工改壞計數表：檢查報告偏差，修復後一致
+    conn.execute('''
+        UPDATE order_counters SET count = count + 5
+        WHERE current_status = (SELECT MIN(current_status) FROM order_counters)
+    ''')
+    conn.commit()
+    report = check_order_counters(conn)
+    assert report['drift'] and all(d['actual'] == d['expected'] + 5 for d in report['drift'])
+    report = check_order_counters(conn, repair=True)
+    assert report['repaired']
+    assert check_order_counters(conn)['drift'] == []
+    assert check_order_counters(conn)['stale_lights'] == 0
+    conn.close()
+
+
+def test_stats_read_only(client, monkeypatch):
+    """/api/stats 和首頁不執行巡檢：數據版本不變、ETag 有效；燈號計數與看板顯示的燈號一致"""
+    conn = get_db()
+    # 保存的燈號是綠燈，但已過 next_light_change_date，按今天應為紅燈
+    long_ago = (date.today() - timedelta(days=60)).isoformat()
+    conn.execute('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date,
+                            status_light, next_light_change_date)
+        VALUES ('DUE1', '巡檢客戶', ?, 'DRAFT_CONFIRMING', ?, 'green', ?)
+    ''', (long_ago, long_ago, long_ago))
+    conn.commit()
+    generation = get_data_generation(conn)[0]
+    # 讀取時計算燈號時不用計數表（計數表裡還是保存的綠燈）
+    assert compute_order_stats(conn) == scan_order_stats(conn)
+    assert counter_order_stats(conn)['lights']['green'] == 1
+    conn.close()
+
+    def board_light():
+        orders = client.get('/tracking/api/orders').get_json()['data']
+        assert [order['order_number'] for order in orders] == ['DUE1']
+        return orders[0]['status_light']
+
+    response = client.get('/tracking/api/stats')
+    light = board_light()
+    assert light == ('red' if LIGHTS_AT_READ_TIME else 'green')
+    assert response.get_json()['data']['lights'][light] == 1
+    assert client.get('/tracking/').status_code == 200
+    assert client.get('/tracking/api/stats', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    conn = get_db()
+    assert get_data_generation(conn)[0] == generation
+    assert conn.execute("SELECT status_light FROM orders WHERE order_number = 'DUE1'").fetchone()[0] == 'green'
+    conn.close()
+
+    # 燈號保存在訂單表時讀計數表，巡檢之後計數更新
+    monkeypatch.setattr(stats_module, 'LIGHTS_AT_READ_TIME', False)
+    conn = get_db()
+    assert compute_order_stats(conn) == counter_order_stats(conn)
+    conn.close()
+    assert client.post('/tracking/api/admin/refresh-lights?sweep=1').get_json()['data']['updated'] == 1
+    swept = client.get('/tracking/api/stats', headers={'If-None-Match': response.headers['ETag']})
+    assert swept.status_code == 200 and swept.get_json()['data']['lights']['red'] == 1
+    assert board_light() == 'red'
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
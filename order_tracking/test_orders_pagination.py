@@ -0,0 +1,111 @@
+"""
+測試 /api/orders 的 keyset 分頁：不帶 limit / cursor 時返回全部，limit 默認值和上限，
+沿 next_cursor 翻到底不重複不遺漏（排序鍵大量相同），has_more、include_total、無效游標
+"""
+import sys
+import os
+import base64
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import order_tracking as tracking
+from order_tracking.models import get_db, ORDERS_LIVE_VIEW
+from order_tracking.config import ORDERS_PAGE_SIZE, ORDERS_MAX_PAGE_SIZE
+
+ACTIVE_STATUSES = ['PRODUCING', 'DRAFT_CONFIRMING', 'NEW_ORDER']
+STATUS_DATES = ['2026-01-01', '2026-02-01', '2026-03-01']
+ACTIVE_COUNT = ORDERS_MAX_PAGE_SIZE + 20
+
+
+def test_orders_pagination(client):
+    """分頁結果與不分頁的完整列表一致"""
+    conn = get_db()
+    # (燈號, 天數, 訂單日期) 只有少數幾種組合，同一組合內靠 id 區分
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date)
+        VALUES (?, '分頁客戶', ?, ?, ?)
+    ''', [(f'P{i:04d}', '2026-01-01' if i % 2 else '2025-12-01', ACTIVE_STATUSES[i % 3], STATUS_DATES[i % 3])
+          for i in range(ACTIVE_COUNT)]
+         + [(f'X{i}', '2026-01-01', 'COMPLETED' if i % 2 else 'CANCELLED', '2026-01-01') for i in range(10)])
+    conn.commit()
+    conn.close()
+
+    def get(**params):
+        response = client.get('/tracking/api/orders', query_string=params)
+        return response.status_code, response.get_json()
+
+    # 不帶 limit / cursor：不分頁（已完成 / 已取消不在全部中）
+    status, body = get()
+    assert status == 200 and body['count'] == ACTIVE_COUNT
+    assert not body['has_more'] and body['next_cursor'] is None and 'total' not in body
+    everything = [order['order_number'] for order in body['data']]
+    assert len(set(everything)) == ACTIVE_COUNT
+
+    # limit 下限 1、上限 ORDERS_MAX_PAGE_SIZE；只帶 cursor 時每頁 ORDERS_PAGE_SIZE 筆
+    assert get(limit=0)[1]['count'] == 1
+    status, body = get(limit=ORDERS_MAX_PAGE_SIZE * 10)
+    assert body['count'] == ORDERS_MAX_PAGE_SIZE and body['has_more']
+    status, body = get(cursor=get(limit=3)[1]['next_cursor'])
+    assert body['count'] == ORDERS_PAGE_SIZE
+    assert [order['order_number'] for order in body['data']] == everything[3:3 + ORDERS_PAGE_SIZE]
+
+    # 沿 next_cursor 翻到底：順序與不分頁相同，不重複不遺漏
+    seen = []
+    params = {'limit': 37}
+    while True:
+        status, body = get(**params)
+        assert status == 200 and body['count'] == len(body['data'])
+        seen += [order['order_number'] for order in body['data']]
+        if not body['has_more']:
+            assert body['next_cursor'] is None
+            break
+        assert body['count'] == 37
+        params['cursor'] = body['next_cursor']
+    assert seen == everything
+
+    # 剛好取完時 has_more 為 false
+    cursor = get(limit=ACTIVE_COUNT - 20)[1]['next_cursor']
+    status, body = get(limit=20, cursor=cursor)
+    assert body['count'] == 20 and not body['has_more'] and body['next_cursor'] is None
+
+    # include_total：符合篩選條件的總數，不受 limit 影響
+    status, body = get(limit=5, include_total=1)
+    assert body['total'] == ACTIVE_COUNT and body['count'] == 5
+    status, body = get(tab='draft', limit=5, include_total='true')
+    assert body['total'] == ACTIVE_COUNT // 3
+    assert all(order['current_status'] == 'DRAFT_CONFIRMING' for order in body['data'])
+
+    # 無效參數
+    wrong_length = base64.urlsafe_b64encode(b'["red",1]').decode('ascii')
+    for cursor in ('abc!', 'bm90IGpzb24', wrong_length):
+        status, body = get(cursor=cursor)
+        assert status == 400 and body['code'] == 'INVALID_CURSOR', cursor
+    status, body = get(limit='ten')
+    assert status == 400 and body['code'] == 'INVALID_LIMIT'
+
+
+
+def test_board_page_query_plan(tracking_db, monkeypatch):
+    """讀 orders 表時分頁走 idx_orders_board_sort 不排序；讀 orders_live 視圖時每頁排序一次（LIGHTS_AT_READ_TIME 的取捨）"""
+    conn = get_db()
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    def plan(source):
+        monkeypatch.setattr(tracking, 'ORDERS_READ_SOURCE', source)
+        statements.clear()
+        tracking.fetch_board_page(conn, '1=1', [], 10, after=['red', 5, '2026-01-01', 100])
+        return ' '.join(row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {statements[-1]}'))
+
+    stored = plan('orders')
+    assert 'idx_orders_board_sort' in stored and 'TEMP B-TREE' not in stored, stored
+    assert 'TEMP B-TREE' in plan(ORDERS_LIVE_VIEW)
+    conn.set_trace_callback(None)
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,108 @@
+"""
+測試批量快速更新：逐項結果、同一訂單多次轉移按順序、與單筆快速更新寫入的結果一致、單筆與批量共用校驗、每項一條操作日誌、計數表沒有偏差
+"""
+import sys
+import os
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking.models import get_db, check_order_counters
+from order_tracking.config import QUICK_UPDATE_BATCH_MAX
+
+
+def order_state(conn, order_number):
+    order = dict(conn.execute('''
+        SELECT current_status, last_status_change_date, status_light, status_days, next_light_change_date
+        FROM orders WHERE order_number = ?
+    ''', (order_number,)).fetchone())
+    order['history'] = [tuple(row) for row in conn.execute('''
+        SELECT from_status, to_status, action_date, operator, notes FROM status_history
+        WHERE order_number = ? ORDER BY id
+    ''', (order_number,))]
+    order['milestones'] = [tuple(row) for row in conn.execute('''
+        SELECT m.status_key, m.first_at, m.last_at, m.count FROM order_milestones m
+        JOIN orders o ON o.id = m.order_id WHERE o.order_number = ? ORDER BY m.status_key
+    ''', (order_number,))]
+    return order
+
+
+def test_quick_update_batch(client):
+    """批量與單筆結果一致，不合法的項跳過"""
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, order_date, current_status, last_status_change_date,
+                            expected_delivery_date, factory)
+        VALUES (?, '批量客戶', '2026-01-01', ?, '2026-01-01', ?, '一廠')
+    ''', [(f'B{i}', 'PRODUCING' if i < 4 else 'PENDING_SAMPLE', '2030-01-01' if i % 2 else None)
+          for i in range(6)] + [(f'S{i}', 'PRODUCING' if i < 4 else 'PENDING_SAMPLE', '2030-01-01' if i % 2 else None)
+                                for i in range(6)])
+    conn.commit()
+    conn.close()
+
+    def items(prefix):
+        return [
+            {'order_number': f'{prefix}0', 'action': 'production_complete', 'date': '2026-03-01'},
+            {'order_number': f'{prefix}1', 'action': 'production_complete', 'date': '2026-03-02', 'notes': '出貨'},
+            {'order_number': f'{prefix}2', 'action': 'cancel'},
+            {'order_number': f'{prefix}4', 'action': 'sampling_start', 'date': '2026-03-01'},
+            {'order_number': f'{prefix}4', 'action': 'sampling_sent', 'date': '2026-03-05'},
+            {'order_number': f'{prefix}5', 'action': 'sampling_start', 'date': '2026-03-01'},
+        ]
+
+    for item in items('S'):
+        response = client.post('/tracking/api/orders/quick-update', json=item)
+        assert response.status_code == 200, response.get_json()
+
+    bad = [
+        {'order_number': 'NOPE', 'action': 'cancel'},
+        {'order_number': 'B3', 'action': 'fly'},
+        {'order_number': 'B3', 'action': 'quote_to_order'},
+        {'order_number': 'B3', 'action': 'cancel', 'date': '2026-13-40'},
+        {'action': 'cancel'},
+        'B3',
+    ]
+    # 單筆快速更新用同一套校驗：錯誤碼與批量相同，不寫入
+    single_codes = ['ORDER_NOT_FOUND', 'INVALID_ACTION', 'USE_CONVERT', 'INVALID_DATE', 'MISSING_PARAMS']
+    for item, code in zip(bad, single_codes):
+        response = client.post('/tracking/api/orders/quick-update', json=item)
+        assert response.status_code in (400, 404) and response.get_json()['code'] == code, item
+
+    response = client.post('/tracking/api/orders/quick-update/batch', json={'items': items('B') + bad})
+    body = response.get_json()
+    assert response.status_code == 200 and body['success'], body
+    assert body['updated'] == 6 and body['failed'] == len(bad)
+    codes = [r.get('code') for r in body['results']]
+    assert codes == [None] * 6 + ['ORDER_NOT_FOUND', 'INVALID_ACTION', 'USE_CONVERT', 'INVALID_DATE',
+                                  'MISSING_PARAMS', 'INVALID_ITEM']
+    assert body['results'][4]['old_status'] == 'SAMPLING'
+
+    conn = get_db()
+    for i in range(6):
+        assert order_state(conn, f'B{i}') == order_state(conn, f'S{i}'), i
+    assert order_state(conn, 'B3')['history'] == []
+    # 單筆和批量每項都有一條操作日誌，與歷史一一對應
+    audit = [tuple(row) for row in conn.execute('''
+        SELECT action_type, order_number, old_status, new_status, operator, reason FROM audit_log ORDER BY id
+    ''')]
+    assert audit == [('status_update', row['order_number'], row['from_status'], row['to_status'], 'admin',
+                      row['notes'])
+                     for row in conn.execute('''
+                         SELECT order_number, from_status, to_status, notes FROM status_history
+                         ORDER BY id
+                     ''')]
+    assert len(audit) == 12
+    assert check_order_counters(conn)['drift'] == []
+    conn.close()
+
+    # 整個請求不合法
+    assert client.post('/tracking/api/orders/quick-update/batch', json={'items': []}).status_code == 400
+    too_many = [{'order_number': 'B0', 'action': 'cancel'}] * (QUICK_UPDATE_BATCH_MAX + 1)
+    response = client.post('/tracking/api/orders/quick-update/batch', json=too_many)
+    assert response.get_json()['code'] == 'TOO_MANY_ITEMS'
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,78 @@
+"""
+測試響應編碼：orjson / 標準庫編碼器直接編碼 sqlite3.Row，數據與 jsonify 一致且中文不轉義；
+JSON 響應超過閾值時按 Accept-Encoding 壓縮，304 和小響應不壓縮
+"""
+import sys
+import os
+import gzip
+import json
+import sqlite3
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+
+from order_tracking.models import get_db
+from order_tracking.fast_json import ENCODERS
+from order_tracking.config import COMPRESS_MIN_SIZE
+
+
+def test_encoders_match_jsonify():
+    """各編碼器輸出的數據與 jsonify(dict(row)) 相同"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE t (id INTEGER, name TEXT, qty REAL, note TEXT)')
+    conn.executemany('INSERT INTO t VALUES (?, ?, ?, ?)', [(1, '深圳華強', 1.5, None), (2, 'Enamel "Pin"', 3, '返單')])
+    rows = conn.execute('SELECT * FROM t').fetchall()
+    payload = {'data': rows, 'count': 2, 'day': date(2026, 3, 1), 'price': Decimal('1.20')}
+
+    app = Flask(__name__)
+    with app.app_context():
+        expected = jsonify(dict(payload, data=[dict(row) for row in rows])).get_json()
+    for name, dumps in ENCODERS.items():
+        body = dumps(payload)
+        assert json.loads(body) == expected, name
+        assert '深圳華強'.encode('utf-8') in body, name
+
+
+def test_response_compression(client):
+    """大列表 gzip 壓縮，解壓後內容不變；不接受壓縮、304 和小響應原樣返回"""
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, product_name, order_date, current_status,
+                            last_status_change_date)
+        VALUES (?, '東莞恒通禮品', '不鏽鋼保溫杯', '2026-01-01', 'PRODUCING', '2026-01-01')
+    ''', [(f'Z{i}',) for i in range(50)])
+    conn.commit()
+    conn.close()
+
+    plain = client.get('/tracking/api/orders')
+    assert 'Content-Encoding' not in plain.headers and len(plain.data) > COMPRESS_MIN_SIZE
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert plain.get_json()['count'] == 50
+
+    compressed = client.get('/tracking/api/orders', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert int(compressed.headers['Content-Length']) == len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+
+    response = client.get('/tracking/api/orders', headers={'Accept-Encoding': 'gzip',
+                                                            'If-None-Match': plain.headers['ETag']})
+    assert response.status_code == 304 and 'Content-Encoding' not in response.headers
+
+    # 全局搜索（最近訂單）同樣走 json_response + 壓縮
+    response = client.get('/tracking/api/search', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data))['total'] == 50
+
+    small = client.get('/tracking/api/auth/me', headers={'Accept-Encoding': 'gzip'})
+    assert small.status_code == 200 and 'Content-Encoding' not in small.headers
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
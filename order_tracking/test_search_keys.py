@@ -0,0 +1,114 @@
+"""
+測試搜索鍵：全形半形 / 大小寫折疊總是生效；安裝了 opencc / pypinyin 時繁簡和拼音互查；
+新建 / 編輯 / 改單號時在同一事務中寫入搜索鍵，搜索只讀不寫；直接用 SQL 改名時觸發器清空，啟動時補算
+"""
+import sys
+import os
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking import models
+from order_tracking.models import (init_db, get_db, search_orders, order_search_clause, fill_search_keys,
+                                   get_data_generation)
+from order_tracking.search_keys import build_search_key, fold_query, HAS_OPENCC, HAS_PYPINYIN
+
+
+def found_numbers(conn, keyword):
+    return {row['order_number'] for row in search_orders(conn, keyword)}
+
+
+def pending_numbers(conn):
+    return [row[0] for row in conn.execute('SELECT order_number FROM orders WHERE search_key IS NULL ORDER BY id')]
+
+
+def test_search_keys(client, monkeypatch):
+    """搜索鍵命中、FTS 與 LIKE 兩條路徑一致、改名後重新計算"""
+    if not HAS_OPENCC and not HAS_PYPINYIN:
+        assert build_search_key('ＡＣＭＥ貿易', None, ' Factory-A ') == 'acme貿易\nfactory-a'
+    assert fold_query(' ＡＢＣ ') == 'abc'
+    saved_fts = models.ORDER_SEARCH_FTS
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO orders (order_number, customer_name, product_name, factory, order_date)
+        VALUES (?, ?, ?, ?, '2026-01-01')
+    ''', [('SK001', 'ＡＣＭＥ貿易', '保溫杯', '一廠'),
+          ('SK002', '深圳華強電子', 'Enamel Pin', 'Factory-A'),
+          ('SK003', '廣州恒通', '帆布袋', None)])
+    conn.commit()
+    # 直接用 SQL 寫入的訂單沒有搜索鍵，搜索不會補算（讀取路徑不寫入）
+    assert found_numbers(conn, 'ｆａｃｔｏｒｙ') == set()
+    assert pending_numbers(conn) == ['SK001', 'SK002', 'SK003']
+    assert fill_search_keys(conn) == 3
+
+    for use_fts in (True, False):
+        monkeypatch.setattr(models, 'ORDER_SEARCH_FTS', saved_fts and use_fts)
+        assert found_numbers(conn, 'acme貿') == {'SK001'}
+        assert found_numbers(conn, 'ACME') == {'SK001'}
+        assert found_numbers(conn, 'ｆａｃｔｏｒｙ') == {'SK002'}
+        if HAS_OPENCC:
+            assert found_numbers(conn, '华强电') == {'SK002'}
+        if HAS_PYPINYIN:
+            assert found_numbers(conn, 'huaqiang') == {'SK002'}
+            assert found_numbers(conn, 'szhq') == {'SK002'}
+            assert found_numbers(conn, 'bwb') == {'SK001'}
+        # 看板篩選用的子句與 search_orders 一致
+        where, params = order_search_clause('acme貿')
+        assert [row[0] for row in conn.execute(
+            f'SELECT order_number FROM orders WHERE {where}', params)] == ['SK001']
+
+    # 直接用 SQL 改名：觸發器清空搜索鍵，只改其他字段時保留；下次啟動時補算
+    conn.execute("UPDATE orders SET notes = '備註' WHERE order_number = 'SK003'")
+    conn.execute("UPDATE orders SET customer_name = 'Ｂｌｕｅ Ocean' WHERE order_number = 'SK001'")
+    conn.commit()
+    assert pending_numbers(conn) == ['SK001']
+    assert found_numbers(conn, 'acme貿') == set()
+    conn.close()
+    init_db()
+    conn = get_db()
+    assert pending_numbers(conn) == []
+    assert found_numbers(conn, 'ｂｌｕｅ oc') == {'SK001'}
+    conn.close()
+
+    # 應用的寫入路徑：新建、編輯、改單號後搜索鍵立即可用
+
+    def search(keyword):
+        response = client.get('/tracking/api/search', query_string={'q': keyword})
+        assert response.status_code == 200, response.get_json()
+        return {order['order_number'] for order in response.get_json()['orders']}
+
+    response = client.post('/tracking/api/orders', json={
+        'order_number': 'SK004', 'customer_name': 'ＲＥＤ Star 禮品', 'order_date': '2026-01-02'})
+    assert response.status_code in (200, 201), response.get_json()
+    response = client.put('/tracking/api/orders/SK002', json={'factory': 'Ｆａｃｔｏｒｙ-Ｂ'})
+    assert response.status_code == 200, response.get_json()
+    response = client.post('/tracking/api/orders/SK003/change-number', json={
+        'new_order_number': 'SK005', 'customer_name': 'ＧＲＥＥＮ 恒通', 'order_date': '2026-01-01'})
+    assert response.status_code == 200, response.get_json()
+    conn = get_db()
+    assert pending_numbers(conn) == []
+    generation = get_data_generation(conn)
+    conn.close()
+    assert search('red star') == {'SK004'}
+    assert search('factory-b') == {'SK002'}
+    assert search('green 恒') == {'SK005'}
+    conn = get_db()
+    conn.execute("UPDATE orders SET search_key = NULL WHERE order_number = 'SK002'")
+    conn.commit()
+    conn.close()
+    for keyword in ('Factory', '恒通', '華強'):
+        client.get('/tracking/api/search', query_string={'q': keyword})
+        client.get('/tracking/api/orders', query_string={'search': keyword})
+        client.get('/tracking/orders/fragment', query_string={'search': keyword})
+
+    # 搜索不寫數據庫：待補算的搜索鍵保持原樣，數據版本不變
+    conn = get_db()
+    assert pending_numbers(conn) == ['SK002']
+    assert get_data_generation(conn) == generation
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,127 @@
+"""
+測試編號序列：從已有數據接續、多線程並發分配不重複、按塊預取、預留的詢價編號只能本人使用一次、
+取消或過期的預留重新發放、修圖編號每天重新編號
+"""
+import sys
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_tracking import models
+from order_tracking.conftest import login
+from order_tracking.models import (get_db, allocate_quote_number, reserve_quote_number, take_quote_number,
+                                   release_quote_number, generate_revision_number, next_sequence_values,
+                                   SequenceAllocator, QUOTE_SEQUENCE)
+
+THREADS = 8
+PER_THREAD = 40
+INSERT_ORDER = "INSERT INTO orders (order_number, customer_name, order_date) VALUES (?, '測試', '2026-01-01')"
+
+
+def allocate_concurrently(allocator):
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        values = [allocator.allocate('concurrent') for _ in range(PER_THREAD)]
+        with lock:
+            results.extend(values)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_sequences(app, monkeypatch):
+    """序列分配、預留和修圖編號"""
+    monkeypatch.setattr(models, 'sequence_allocator', SequenceAllocator(block_size=1))
+    conn = get_db()
+    # 建表前生成的編號（KC + 5 位數字）作為起點，手工輸入的其他格式不影響
+    conn.executemany(INSERT_ORDER, [('KC00007',), ('KC00003',), ('KC2026000123',), ('YU00099',)])
+    today = datetime.now().strftime('%Y%m%d')
+    conn.execute('''
+        INSERT INTO revisions (revision_number, customer_name, request_date) VALUES (?, '測試', '2026-01-01')
+    ''', (f'REV-{today}-004',))
+    conn.commit()
+
+    assert allocate_quote_number(conn) == 'KC00008'
+    assert allocate_quote_number(conn) == 'KC00009'
+    # 已被手工輸入佔用的號碼跳過
+    conn.execute(INSERT_ORDER, ('KC00010',))
+    conn.commit()
+    assert allocate_quote_number(conn) == 'KC00011'
+    assert generate_revision_number() == f'REV-{today}-005'
+    assert generate_revision_number() == f'REV-{today}-006'
+
+    # next_sequence_values 在調用者的事務中執行：回滾後號碼沒有被消耗
+    next_sequence_values(conn, QUOTE_SEQUENCE, 5)
+    conn.rollback()
+    assert allocate_quote_number(conn) == 'KC00012'
+
+    # 預留：本人帶上編號時使用，別人或第二次使用時重新分配
+    reserved = reserve_quote_number(conn, 'alice')
+    assert reserved == 'KC00013'
+    assert take_quote_number(conn, reserved, 'bob') == 'KC00014'
+    assert take_quote_number(conn, reserved, 'alice') == reserved
+    assert conn.in_transaction    # 預留記錄與訂單一起提交
+    conn.execute(INSERT_ORDER, (reserved,))
+    conn.commit()
+    assert take_quote_number(conn, reserved, 'alice') == 'KC00015'
+    assert take_quote_number(conn, None, 'alice') == 'KC00016'
+
+    # 取消時釋放：只能釋放本人的預留，釋放後下一次預留或新建重新發放
+    released = reserve_quote_number(conn, 'alice')
+    assert released == 'KC00017'
+    assert not release_quote_number(conn, released, 'bob')
+    assert release_quote_number(conn, released, 'alice')
+    assert not release_quote_number(conn, released, 'alice')
+    assert reserve_quote_number(conn, 'bob') == released
+    assert take_quote_number(conn, released, 'alice') == 'KC00018'
+    assert release_quote_number(conn, released, 'bob')
+    assert take_quote_number(conn, None, 'carol') == released
+    assert conn.in_transaction
+    conn.execute(INSERT_ORDER, (released,))
+    conn.commit()
+    # 過期（例如直接關閉頁面）的預留重新發放，原預留人新建時另外分配
+    expired = reserve_quote_number(conn, 'alice')
+    assert expired == 'KC00019'
+    conn.execute("UPDATE number_reservations SET reserved_at = datetime('now', '-2 days')")
+    conn.commit()
+    assert reserve_quote_number(conn, 'bob') == expired
+    assert take_quote_number(conn, expired, 'alice') == 'KC00020'
+    # 釋放後被手工輸入佔用的號碼不再發放
+    release_quote_number(conn, expired, 'bob')
+    conn.execute(INSERT_ORDER, (expired,))
+    conn.commit()
+    assert reserve_quote_number(conn, 'carol') == 'KC00021'
+    assert [row[0] for row in conn.execute('SELECT number FROM number_reservations')] == ['KC00021']
+
+    # 接口：POST 預留（GET 不再分配號碼），DELETE 釋放
+    client = login(app.test_client(), username='carol')
+    client.get('/tracking/api/orders/next-quote-number')
+    assert conn.execute('SELECT COUNT(*) FROM number_reservations').fetchone()[0] == 1
+    number = client.post('/tracking/api/orders/next-quote-number').get_json()['next_number']
+    assert number == 'KC00022'
+    assert client.delete(f'/tracking/api/orders/next-quote-number/{number}').get_json()['released']
+    assert client.post('/tracking/api/orders/next-quote-number').get_json()['next_number'] == number
+
+    # 並發分配：逐個分配時號碼連續；按塊預取時不重複
+    values = allocate_concurrently(SequenceAllocator(block_size=1))
+    assert sorted(values) == list(range(1, THREADS * PER_THREAD + 1))
+    blocks = [SequenceAllocator(block_size=16) for _ in range(2)]
+    values = allocate_concurrently(blocks[0]) + allocate_concurrently(blocks[1])
+    assert len(values) == len(set(values)) == 2 * THREADS * PER_THREAD
+    assert min(values) > THREADS * PER_THREAD
+    conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
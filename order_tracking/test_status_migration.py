@@ -0,0 +1,117 @@
+"""
+測試舊中文狀態值遷移：分段執行、中斷後續跑、驗證報告、里程碑和計數表同步；
+以及關閉 LEGACY_STATUS_VALUES 後查詢只用 key
+"""
+import sys
+import os
+import random
+
+import pytest
+
+# 添加項目路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import order_tracking
+from order_tracking.models import (get_db, migrate_status_values, verify_status_migration,
+                                   check_order_counters)
+from order_tracking.status_definitions import (STATUS_KEYS, STATUS_LABELS, LEGACY_STATUS_ALIASES,
+                                               normalize_status_key)
+
+ORDERS = 500
+
+
+class Interrupted(Exception):
+    pass
+
+
+def seed(conn, rng):
+    """訂單、歷史、審計記錄中的狀態混用 key / 簡體 / 繁體 / 舊寫法，另加一個無法識別的值"""
+    values = list(STATUS_KEYS.values()) + list(LEGACY_STATUS_ALIASES)
+    for labels in STATUS_LABELS.values():
+        values += [labels['zh_cn'], labels['zh_tw']]
+    for i in range(ORDERS):
+        status = rng.choice(values) if i else '未知狀態'
+        cursor = conn.execute('''
+            INSERT INTO orders (order_number, customer_name, order_date, current_status)
+            VALUES (?, '客戶', '2026-01-01', ?)
+        ''', (f'MIG{i:05d}', status))
+        prev = None
+        for step in range(3):
+            to_status = status if step == 2 else rng.choice(values)
+            conn.execute('''
+                INSERT INTO status_history (order_id, order_number, from_status, to_status, action_date, operator)
+                VALUES (?, ?, ?, ?, ?, 'test')
+            ''', (cursor.lastrowid, f'MIG{i:05d}', prev, to_status, f'2026-01-0{step + 1}'))
+            prev = to_status
+        conn.execute('''
+            INSERT INTO audit_log (action_type, order_number, old_status, new_status, operator)
+            VALUES ('status_change', ?, ?, ?, 'test')
+        ''', (f'MIG{i:05d}', rng.choice(values + [None]), status))
+    conn.commit()
+
+
+def test_status_migration(tracking_db):
+    """分段遷移、中斷續跑、驗證"""
+    rng = random.Random(13)
+    conn = get_db()
+    seed(conn, rng)
+    before = {row['order_number']: normalize_status_key(row['current_status'])
+              for row in conn.execute('SELECT order_number, current_status FROM orders')}
+    assert not verify_status_migration(conn)['complete']
+
+    # 處理兩段後中斷
+    calls = []
+    def interrupt(table, last_id, max_id, updated):
+        calls.append((table, last_id))
+        if len(calls) == 2:
+            raise Interrupted()
+    try:
+        migrate_status_values(conn, chunk_size=100, progress=interrupt)
+        assert False, '應該中斷'
+    except Interrupted:
+        pass
+    progress = conn.execute(
+        "SELECT last_id, finished_at FROM status_migration_progress WHERE table_name = 'orders'").fetchone()
+    assert progress['last_id'] == 200 and progress['finished_at'] is None
+
+    # 續跑：從 id 200 之後開始，全部完成
+    seen = []
+    result = migrate_status_values(conn, chunk_size=100,
+                                   progress=lambda table, last_id, *_: seen.append((table, last_id)))
+    assert ('orders', 100) not in seen and ('orders', 300) in seen
+    assert all(stats['finished'] for stats in result.values())
+
+    report = verify_status_migration(conn)
+    assert report['complete'], report['legacy']
+    assert report['unknown'] == {'orders.current_status': {'未知狀態': 1},
+                                 'status_history.to_status': {'未知狀態': 1},
+                                 'audit_log.new_status': {'未知狀態': 1}}
+
+    # 狀態含義不變；里程碑和計數表跟著更新
+    after = {row['order_number']: row['current_status']
+             for row in conn.execute('SELECT order_number, current_status FROM orders')}
+    assert after == before
+    milestone_keys = {row[0] for row in conn.execute('SELECT DISTINCT status_key FROM order_milestones')}
+    assert milestone_keys <= set(STATUS_KEYS.values()) | {'未知狀態'}
+    assert check_order_counters(conn)['drift'] == []
+
+    # 已完成的表再次執行不會重掃
+    again = migrate_status_values(conn, chunk_size=100)
+    assert all(stats['updated'] == 0 for stats in again.values())
+    conn.close()
+
+
+def test_key_only_predicates(monkeypatch):
+    """LEGACY_STATUS_VALUES 關閉後狀態查詢只用 key"""
+    monkeypatch.setattr(order_tracking, 'LEGACY_STATUS_VALUES', True)
+    values = order_tracking.status_values_for_query(['DRAFT_CONFIRMING'])
+    assert values == ['DRAFT_CONFIRMING', '图稿待确认', '圖稿待確認', '图稿确认中', '圖稿確認中']
+    monkeypatch.setattr(order_tracking, 'LEGACY_STATUS_VALUES', False)
+    assert order_tracking.status_values_for_query(['DRAFT_CONFIRMING', 'COMPLETED']) == \
+        ['DRAFT_CONFIRMING', 'COMPLETED']
+    where, params = order_tracking.build_board_filter(stage_group='draft')
+    assert params == ['DRAFT_MAKING', 'DRAFT_CONFIRMING', 'DRAFT_REVISING']
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))